@@ -0,0 +1,197 @@
+#region imports
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from Circuit import CompiledCircuit
+from MNASolver import MNASystem
+from ResistorNetwork import ResistorNetwork
+#endregion
+
+#region function definitions
+NETLIST_EXTENSIONS = ('.txt', '.net', '.cir', '.sp', '.spice')
+SOLVERS = {'mna': None,  # solved step by step below, so the phases can be timed
+           'reduced': ResistorNetwork.AnalyzeCircuitReduced,
+           'loops': ResistorNetwork.AnalyzeCircuitLoops,
+           'hierarchical': ResistorNetwork.AnalyzeCircuitHierarchical}
+
+
+def FindNetlists(patterns):
+    """
+    :param patterns: directories (searched recursively for files with a NETLIST_EXTENSIONS extension), glob
+                     patterns ('**' matches any number of directories) or file names
+    :return: sorted list of the netlist files; a name that matches nothing is kept, so it is reported as an error
+    """
+    files = set()
+    for p in patterns:
+        if os.path.isdir(p):
+            for root, dirs, names in os.walk(p):
+                files.update(os.path.join(root, n) for n in names if n.lower().endswith(NETLIST_EXTENSIONS))
+            continue
+        matches = [m for m in glob.glob(p, recursive=True) if os.path.isfile(m)]
+        files.update(matches if matches or glob.has_magic(p) else [p])
+    return sorted(files)
+
+
+def AnalyzeFile(filename, solver='mna', cache=False):
+    """
+    Reads and solves one netlist with ResistorNetwork.  Errors are recorded rather than raised, so one bad
+    file does not stop a batch.
+    :param filename: path of the netlist
+    :param solver: a key of SOLVERS
+    :param cache: if True, use the compiled netlist cache (see NetlistParser.ParseNetlist)
+    :return: dict with file, ok, and either error or nodes, resistors, sources, seconds, residualKCL (A),
+             residualKVL (V), currents and sourceCurrents (by element name), voltages (by node name); profile
+             holds the seconds spent in each phase (parse, and assemble, factor and solve for the mna solver)
+    """
+    record = dict(file=filename, ok=False)
+    profile = {}
+    start = last = time.perf_counter()
+
+    def lap(phase):
+        nonlocal last
+        now = time.perf_counter()
+        profile[phase] = now - last
+        last = now
+
+    try:
+        net = ResistorNetwork()
+        net.BuildNetworkFromFile(filename, cache)
+        lap('parse')
+        if SOLVERS[solver] is None:
+            system = MNASystem(CompiledCircuit.FromNetwork(net), factor=False)
+            lap('assemble')
+            system.Factor()
+            lap('factor')
+            sol = system.Solve()
+            lap('solve')
+        else:
+            sol = SOLVERS[solver](net)
+            lap('solve')
+        kcl, kvl = sol.Residual()
+        c = sol.Circuit
+        record.update(ok=True, nodes=c.NumNodes, resistors=len(c.R), sources=len(c.V), residualKCL=kcl,
+                      residualKVL=kvl, currents=dict(zip([r.Name for r in net.Resistors], sol.ResistorCurrents.tolist())),
+                      sourceCurrents=dict(zip([v.Name for v in net.VSources], sol.SourceCurrents.tolist())),
+                      voltages=dict(zip(c.NodeNames, sol.NodeVoltages.tolist())))
+    except Exception as e:  # any failure is reported for this file only
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = time.perf_counter() - start
+    record['profile'] = profile
+    return record
+
+
+def RunBatch(files, solver='mna', workers=None, cache=False, chunksize=None):
+    """
+    Analyzes many netlists on a pool of processes.
+    :param files: netlist paths
+    :param solver: a key of SOLVERS
+    :param workers: number of processes; all CPUs if None, and no pool for 1
+    :param cache: use the compiled netlist cache
+    :param chunksize: files sent to a process at a time; chosen from the number of files if None
+    :return: generator of the AnalyzeFile records, in the order of files, as they finish
+    """
+    analyze = partial(AnalyzeFile, solver=solver, cache=cache)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) < 2:
+        yield from map(analyze, files)
+        return
+    chunksize = chunksize or max(1, len(files) // (4 * workers))
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(analyze, files, chunksize=chunksize)
+
+
+def WriteJSONL(records, f):
+    """
+    Writes one JSON object per record and line.
+    :param records: AnalyzeFile records
+    :param f: open text file
+    :return: generator passing the records on once they are written
+    """
+    for r in records:
+        f.write(json.dumps(r) + '\n')
+        yield r
+
+
+def WriteCSV(records, f, profile=False):
+    """
+    Writes the records in long form, one row per value: file, quantity, name, value.  The quantities are
+    I (resistor current), Isource, V (node voltage), seconds, residualKCL, residualKVL, error, and with profile
+    the phase times (quantity 'time', name the phase).
+    :param records: AnalyzeFile records
+    :param f: open text file
+    :param profile: write the phase times
+    :return: generator passing the records on once they are written
+    """
+    w = csv.writer(f)
+    w.writerow(['file', 'quantity', 'name', 'value'])
+    for r in records:
+        name = r['file']
+        if r['ok']:
+            w.writerows([name, 'I', k, v] for k, v in r['currents'].items())
+            w.writerows([name, 'Isource', k, v] for k, v in r['sourceCurrents'].items())
+            w.writerows([name, 'V', k, v] for k, v in r['voltages'].items())
+            w.writerows([name, q, '', r[q]] for q in ('residualKCL', 'residualKVL'))
+        else:
+            w.writerow([name, 'error', '', r['error']])
+        w.writerow([name, 'seconds', '', r['seconds']])
+        if profile:
+            w.writerows([name, 'time', phase, t] for phase, t in r['profile'].items())
+        yield r
+
+
+def main():
+    """
+    Analyzes many netlist files (directories, glob patterns or file names) in parallel and writes the branch
+    currents, node voltages, solve time and residual of each as JSON Lines or CSV.  The exit code is 1 if any
+    netlist failed to parse or solve.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('paths', nargs='+', help='netlist files, directories or glob patterns')
+    parser.add_argument('--output', '-o', default='-', help='output file, - for standard output')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='output format; from the output extension if omitted')
+    parser.add_argument('--solver', choices=list(SOLVERS), default='mna')
+    parser.add_argument('--workers', type=int, help='processes; all CPUs by default')
+    parser.add_argument('--chunksize', type=int, help='files per task sent to a process')
+    parser.add_argument('--cache', action='store_true', help='reuse compiled netlists (.npz next to each file)')
+    parser.add_argument('--profile', action='store_true', help='report the time spent in each phase')
+    args = parser.parse_args()
+
+    files = FindNetlists(args.paths)
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    start = time.perf_counter()
+    failed, totals = [], {}
+    try:
+        records = RunBatch(files, args.solver, args.workers, args.cache, args.chunksize)
+        if not args.profile:
+            records = ({k: v for k, v in r.items() if k != 'profile'} for r in records)
+        for r in (WriteCSV(records, out, args.profile) if fmt == 'csv' else WriteJSONL(records, out)):
+            if not r['ok']:
+                failed.append(r)
+            for phase, t in r.get('profile', {}).items():
+                totals[phase] = totals.get(phase, 0.0) + t
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(files)} netlists, {len(failed)} failed, {elapsed:.2f} s", file=sys.stderr)
+    for r in failed[:20]:
+        print(f"  {r['file']}: {r['error']}", file=sys.stderr)
+    if args.profile and totals:
+        work = sum(totals.values())
+        for phase, t in totals.items():
+            print(f"  {phase:>8} {t:10.3f} s ({100 * t / work:5.1f}%)", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+#endregion
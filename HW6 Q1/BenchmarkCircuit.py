@@ -0,0 +1,143 @@
+#region imports
+import argparse
+import os
+import sys
+import tempfile
+from BenchmarkTools import MaxRssMB, TimePhase, Compare, SaveResults, LoadResults
+from NetlistGenerators import GENERATORS, WriteNetlist
+from NetlistParser import ParseNetlist
+from ResistorNetwork import ResistorNetwork
+from MNASolver import MNASystem
+from Reduction import SolveReduced
+from LoopAnalysis import LoopBasis, SolveBranchCurrents
+#endregion
+
+#region function definitions
+def _SolveMNA(c, timed):
+    """
+    Solves by MNA in three timed phases.
+    :param c: a CompiledCircuit
+    :param timed: timed(phase, fn) runs and records one phase and returns its result
+    :return: the CircuitSolution
+    """
+    system = timed('assemble', lambda: MNASystem(c, factor=False))
+    timed('factor', system.Factor)
+    return timed('solve', system.Solve)
+
+
+def _SolveLoops(c, timed):
+    """
+    Solves by branch current analysis, finding the loops (assemble) and solving (solve) as separate phases.
+    """
+    basis = timed('assemble', lambda: LoopBasis(c))
+    return timed('solve', lambda: SolveBranchCurrents(c, basis))
+
+
+SOLVERS = {'mna': _SolveMNA,
+           'reduced': lambda c, timed: timed('solve', lambda: SolveReduced(c)),
+           'loops': _SolveLoops}
+DEFAULT_SOLVERS = ['mna', 'loops']  # 'reduced' is slower than 'mna' on every generator, so it is run on request only
+
+
+def RunBenchmarks(generators, sizes, solvers=None, repeat=1, trace=False, objectLimit=200000, directory=None):
+    """
+    Runs every phase for every generator and size: generate, write and parse the netlist (parse again from
+    the compiled cache as parseCached), build the ResistorNetwork objects, assemble, factor and solve with each
+    solver, and evaluate the <Loop> blocks (loopDrops).  The solvers work on the parsed CompiledCircuit, as
+    numbered by the file.
+    :param generators: names of the generators in NetlistGenerators.GENERATORS
+    :param sizes: approximate element counts
+    :param solvers: names of the solvers in SOLVERS; DEFAULT_SOLVERS if None
+    :param repeat: runs per phase (fastest reported)
+    :param trace: record tracemalloc peaks per phase
+    :param objectLimit: largest network for the object phases (build and loopDrops)
+    :param directory: where the netlists are written; a temporary directory, removed afterwards, if None
+    :return: list of result records
+    """
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = directory or tmp
+        for gen in generators:
+            for size in sizes:
+                elements = nodes = 0
+
+                def record(phase, solver, seconds, peak, **extra):
+                    records.append(dict(generator=gen, size=size, elements=elements, nodes=nodes, phase=phase,
+                                        solver=solver, seconds=seconds, peakMB=peak, maxRssMB=MaxRssMB(), **extra))
+                    print(f"{gen:>8} {elements:>9} {phase:>11} {solver:>8} {seconds:10.4f} s", flush=True)
+
+                def timed(solver):
+                    def run(phase, fn):
+                        t, result, peak = TimePhase(fn, repeat, trace)
+                        record(phase, solver, t, peak)
+                        return result
+                    return run
+
+                t, circuit, peak = TimePhase(lambda: GENERATORS[gen](size), 1, trace)
+                elements, nodes = len(circuit.R) + len(circuit.V), circuit.NumNodes
+                record('generate', '-', t, peak, loops=len(circuit.Loops))
+                filename = os.path.join(directory, f'{gen}_{size}.txt')
+                timed('-')('write', lambda: WriteNetlist(circuit, filename, f'{gen}, {elements} elements'))
+                c = timed('-')('parse', lambda: ParseNetlist(filename))
+                ParseNetlist(filename, cache=True)  # writes the cache
+                timed('-')('parseCached', lambda: ParseNetlist(filename, cache=True))
+
+                currents = None
+                for name in (solvers or DEFAULT_SOLVERS):
+                    sol = SOLVERS[name](c, timed(name))
+                    kcl, kvl = sol.Residual()
+                    records[-1].update(residualKCL=kcl, residualKVL=kvl)
+                    currents = sol.ResistorCurrents if currents is None else currents
+
+                if elements <= objectLimit:
+                    net = ResistorNetwork()
+                    timed('-')('build', lambda: net.BuildNetworkFromCircuit(c))
+                    if currents is not None:
+                        for r, i in zip(net.Resistors, currents.tolist()):
+                            r.Current = i
+                        timed('-')('loopDrops', net.GetLoopVoltageDrops)
+                for f in (filename, filename + '.npz'):
+                    if directory == tmp and os.path.exists(f):
+                        os.remove(f)
+    return records
+
+
+def main():
+    """
+    Benchmarks parsing and solving synthetic resistor networks (ladders, 2D meshes and random graphs) and
+    records the results as JSON.  Use --compare with a previous result file to fail (exit code 1) on timing
+    regressions.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--generators', nargs='+', default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000, 100000, 1000000])
+    parser.add_argument('--solvers', nargs='+', default=DEFAULT_SOLVERS, choices=list(SOLVERS))
+    parser.add_argument('--repeat', type=int, default=1, help='runs per phase, fastest reported')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks per phase')
+    parser.add_argument('--object-limit', type=int, default=200000, help='largest network for build/loopDrops')
+    parser.add_argument('--netlist-dir', help='keep the generated netlists in this directory')
+    parser.add_argument('--output', default='bench_circuit.json')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio')
+    args = parser.parse_args()
+
+    if args.netlist_dir:
+        os.makedirs(args.netlist_dir, exist_ok=True)
+    records = RunBenchmarks(args.generators, args.sizes, args.solvers, args.repeat, args.trace_memory,
+                            args.object_limit, args.netlist_dir)
+    SaveResults(records, args.output)
+
+    if args.compare:
+        key = lambda r: (r['generator'], r['size'], r['phase'], r['solver'])
+        regressions = Compare(records, LoadResults(args.compare), args.threshold, key)
+        for r, b, ratio in regressions:
+            print(f"Regression: {r['generator']} {r['size']} {r['phase']} {r['solver']}: "
+                  f"{b:.4f} s -> {r['seconds']:.4f} s ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold}x')
+
+
+if __name__ == "__main__":
+    main()
+#endregion
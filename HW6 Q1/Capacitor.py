@@ -0,0 +1,22 @@
+class Capacitor:
+    """
+    A class representing a capacitor.
+
+    Attributes:
+    - Capacitance (float): The capacitance in farads.
+    - V (float): The voltage across the capacitor (first node minus second node) in volts.
+    - Name (str): The name of the capacitor, based on the connected node names.
+    """
+
+    def __init__(self, C=1.0e-6, v0=0.0, name='ab'):
+        """
+        Initializes a capacitor with a given capacitance, initial voltage, and name.
+
+        Parameters:
+        - C (float, optional): Capacitance in farads (default is 1 uF).
+        - v0 (float, optional): Initial voltage in volts (default is 0.0).
+        - name (str, optional): Name of the capacitor (default is 'ab').
+        """
+        self.Capacitance = C  # Stores the capacitance value
+        self.V = v0  # Stores the (initial) voltage
+        self.Name = name  # Stores the capacitor's name
@@ -0,0 +1,153 @@
+#region imports
+import copy
+import re
+import numpy as np
+#endregion
+
+#region function definitions
+SPICE_SCALE = {'t': 1e12, 'g': 1e9, 'meg': 1e6, 'k': 1e3, 'mil': 25.4e-6, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9,
+               'p': 1e-12, 'f': 1e-15}
+_SpiceValue = re.compile(r'([-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)(meg|mil|[tgkmunpf])?[a-z]*$')
+
+
+def SpiceNumber(txt):
+    """
+    Reads a number with an optional SPICE scale suffix, e.g. '4.7k', '10meg' or '2.2kohm'.
+    :param txt: lower case text
+    :return: the value as a float
+    """
+    m = _SpiceValue.match(txt)
+    if m is None:
+        raise ValueError(txt)
+    return float(m.group(1)) * SPICE_SCALE.get(m.group(2), 1.0)
+
+
+def SplitElementName(name):
+    """
+    Finds the two nodes an element connects from its name. Names are either two single-letter
+    node names ('ad') or two node names joined by a hyphen ('n12-n13'), in the element's direction.
+    :param name: element name
+    :return: (first node, second node)
+    """
+    if '-' in name:
+        a, b = name.split('-', 1)
+        return a.strip(), b.strip()
+    if len(name) == 2:
+        return name[0], name[1]
+    raise ValueError(f"Element name '{name}' does not name two nodes")
+
+
+def ElementName(a, b):
+    """
+    The inverse of SplitElementName.
+    :param a: first node name
+    :param b: second node name
+    :return: 'ab' for single-letter node names, otherwise 'a-b'
+    """
+    return a + b if len(a) == 1 and len(b) == 1 else f"{a}-{b}"
+#endregion
+
+#region class definitions
+class CompiledCircuit():
+    """
+    Compact array form of a resistor network: nodes are numbered, and each element refers to its
+    two nodes by index.  Resistor currents are positive from the first node to the second node, and a
+    source raises the voltage from its first node to its second node (the file convention).  Capacitors and
+    inductors are only used by the transient analysis; the DC solvers ignore them.  Subcircuit instances are
+    only used by the hierarchical solver (Subcircuits.py) and by Flatten, which expands them into elements.
+    """
+    #region constructor
+    def __init__(self, NodeNames, RNames, RA, RB, R, VNames, VA, VB, V, Loops=None, VWaveforms=None,
+                 CNames=(), CA=(), CB=(), C=(), C0=(), LNames=(), LA=(), LB=(), L=(), L0=(), Subcircuits=None,
+                 Instances=None):
+        """
+        :param NodeNames: list of node names; the position of a name is its index
+        :param RNames: list of resistor names
+        :param RA: first node index of each resistor
+        :param RB: second node index of each resistor
+        :param R: resistance of each resistor in ohms
+        :param VNames: list of voltage source names
+        :param VA: first node index of each source
+        :param VB: second node index of each source
+        :param V: voltage of each source, V(second node) - V(first node)
+        :param Loops: optional list of (loop name, [node names]) for the loop based solvers
+        :param VWaveforms: optional waveform text of each source (see Waveform), None for a DC source
+        :param CNames: list of capacitor names
+        :param CA: first node index of each capacitor
+        :param CB: second node index of each capacitor
+        :param C: capacitance of each capacitor in farads
+        :param C0: initial voltage of each capacitor, V(first node) - V(second node)
+        :param LNames: list of inductor names
+        :param LA: first node index of each inductor
+        :param LB: second node index of each inductor
+        :param L: inductance of each inductor in henries
+        :param L0: initial current of each inductor, from its first node to its second
+        :param Subcircuits: optional dict of subcircuit name -> (port node indices of the body, body CompiledCircuit);
+                            the bodies' own instances refer to the same definitions
+        :param Instances: optional list of (instance name, subcircuit name, node index of each port)
+        """
+        self.NodeNames = list(NodeNames)
+        self.NodeIndex = {n: i for i, n in enumerate(self.NodeNames)}
+        self.RNames = list(RNames)
+        self.RA = np.asarray(RA, dtype=np.int64)
+        self.RB = np.asarray(RB, dtype=np.int64)
+        self.R = np.asarray(R, dtype=float)
+        self.VNames = list(VNames)
+        self.VA = np.asarray(VA, dtype=np.int64)
+        self.VB = np.asarray(VB, dtype=np.int64)
+        self.V = np.asarray(V, dtype=float)
+        self.Loops = [] if Loops is None else Loops
+        self.VWaveforms = [None] * len(self.VNames) if VWaveforms is None else list(VWaveforms)
+        self.CNames = list(CNames)
+        self.CA = np.asarray(CA, dtype=np.int64)
+        self.CB = np.asarray(CB, dtype=np.int64)
+        self.C = np.asarray(C, dtype=float)
+        self.C0 = np.zeros(len(self.CNames)) if len(C0) == 0 else np.asarray(C0, dtype=float)
+        self.LNames = list(LNames)
+        self.LA = np.asarray(LA, dtype=np.int64)
+        self.LB = np.asarray(LB, dtype=np.int64)
+        self.L = np.asarray(L, dtype=float)
+        self.L0 = np.zeros(len(self.LNames)) if len(L0) == 0 else np.asarray(L0, dtype=float)
+        self.Subcircuits = {} if Subcircuits is None else Subcircuits
+        self.Instances = [] if Instances is None else Instances
+    #endregion
+
+    #region methods
+    @classmethod
+    def FromNetwork(cls, net):
+        """
+        Compiles the Resistors, VSources, Capacitors and Inductors of a ResistorNetwork.  Nodes are numbered in
+        order of first appearance.
+        :param net: a ResistorNetwork, e.g. after BuildNetworkFromFile
+        :return: a CompiledCircuit
+        """
+        index = {}  # node name -> node index
+        caps, inds = getattr(net, 'Capacitors', []), getattr(net, 'Inductors', [])
+        RA, RB, VA, VB, CA, CB, LA, LB = [], [], [], [], [], [], [], []
+        for elements, A, B in ((net.Resistors, RA, RB), (net.VSources, VA, VB), (caps, CA, CB), (inds, LA, LB)):
+            for e in elements:
+                a, b = SplitElementName(e.Name)
+                A.append(index.setdefault(a, len(index)))
+                B.append(index.setdefault(b, len(index)))
+        return cls(list(index), [r.Name for r in net.Resistors], RA, RB, [r.Resistance for r in net.Resistors],
+                   [v.Name for v in net.VSources], VA, VB, [v.Voltage for v in net.VSources],
+                   [(getattr(L, 'Name', ''), list(L.Nodes)) for L in net.Loops],
+                   [getattr(v, 'Waveform', None) for v in net.VSources],
+                   [c.Name for c in caps], CA, CB, [c.Capacitance for c in caps], [c.V for c in caps],
+                   [i.Name for i in inds], LA, LB, [i.Inductance for i in inds], [i.Current for i in inds])
+
+    def WithResistances(self, R):
+        """
+        A copy of the circuit with new resistances; the other arrays are shared.
+        :param R: resistance of each resistor in ohms
+        :return: a CompiledCircuit
+        """
+        circuit = copy.copy(self)
+        circuit.R = np.asarray(R, dtype=float)
+        return circuit
+
+    @property
+    def NumNodes(self):
+        return len(self.NodeNames)
+    #endregion
+#endregion
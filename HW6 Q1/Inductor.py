@@ -0,0 +1,22 @@
+class Inductor:
+    """
+    A class representing an inductor.
+
+    Attributes:
+    - Inductance (float): The inductance in henries.
+    - Current (float): The current through the inductor from its first node to its second in amps.
+    - Name (str): The name of the inductor, based on the connected node names.
+    """
+
+    def __init__(self, L=1.0e-3, i0=0.0, name='ab'):
+        """
+        Initializes an inductor with a given inductance, initial current, and name.
+
+        Parameters:
+        - L (float, optional): Inductance in henries (default is 1 mH).
+        - i0 (float, optional): Initial current in amps (default is 0.0).
+        - name (str, optional): Name of the inductor (default is 'ab').
+        """
+        self.Inductance = L  # Stores the inductance value
+        self.Current = i0  # Stores the (initial) current
+        self.Name = name  # Stores the inductor's name
@@ -0,0 +1,168 @@
+#region imports
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order
+from scipy.sparse.linalg import splu
+from MNASolver import CircuitSolution, GroundNodes
+#endregion
+
+#region class definitions
+class LoopBasis():
+    """
+    Fundamental cycle basis of a circuit graph.  Every element (resistors first, then sources) is an edge
+    from its first node to its second.  A breadth-first spanning forest is grown from the reference node of
+    every connected part (see MNASolver.PartReferences); each element that is not in the forest (a chord)
+    closes one loop with the forest path between its nodes, so there are (elements - nodes + parts)
+    independent loops.
+    """
+    #region constructor
+    def __init__(self, circuit):
+        """
+        Builds the spanning forest and the loop x element matrix of traversal signs.
+        :param circuit: a CompiledCircuit
+        """
+        self.Circuit = circuit
+        c = circuit
+        n = c.NumNodes
+        self.A = np.concatenate([c.RA, c.VA])  # first node of every element
+        self.B = np.concatenate([c.RB, c.VB])  # second node of every element
+        nE = len(self.A)
+
+        # Breadth-first forest: a virtual node n joins the root of every part, so one search covers them all
+        roots = np.flatnonzero(GroundNodes(c))
+        key = np.minimum(self.A, self.B) * (n + 1) + np.maximum(self.A, self.B)
+        adj = sparse.coo_matrix((np.ones(2 * nE + len(roots)), (np.concatenate([self.A, self.B, np.full(len(roots), n)]),
+                                                                np.concatenate([self.B, self.A, roots]))),
+                                shape=(n + 1, n + 1)).tocsr()
+        order, pred = breadth_first_order(adj, n, directed=True, return_predecessors=True)
+        self.Order = order[1:]
+        parent = pred[:n].copy()
+        parent[parent == n] = -1
+        self.Parent = parent
+
+        # The element that joins each node to its parent (the first one, if there are several)
+        hasParent = np.flatnonzero(parent >= 0)
+        sortKey = np.argsort(key, kind='stable')
+        childKey = np.minimum(hasParent, parent[hasParent]) * (n + 1) + np.maximum(hasParent, parent[hasParent])
+        self.ParentElement = np.full(n, -1)
+        self.ParentElement[hasParent] = sortKey[np.searchsorted(key[sortKey], childKey)]
+        self.Depth = np.zeros(n, dtype=np.int64)
+        for v in self.Order.tolist():  # parents come before their children in breadth-first order
+            if parent[v] >= 0:
+                self.Depth[v] = self.Depth[parent[v]] + 1
+
+        inTree = np.zeros(nE, dtype=bool)
+        inTree[self.ParentElement[hasParent]] = True
+        self.Chords = np.flatnonzero(~inTree)
+        self._Matrix = None
+    #endregion
+
+    #region methods
+    def _CycleMatrix(self):
+        """
+        Walks every chord's two nodes up the forest together until they meet, recording the forest elements
+        passed.  Each loop runs along its chord from the first node to the second and returns through the
+        forest; an element has sign +1 when the loop runs from its first node to its second, else -1.
+        :return: sparse CSR matrix of shape (loops, elements)
+        """
+        A, parent, pe, depth = self.A, self.Parent, self.ParentElement, self.Depth
+        nL = len(self.Chords)
+        rows, cols, signs = [np.arange(nL)], [self.Chords], [np.ones(nL)]
+        x = self.B[self.Chords].copy()  # walks up from the chord's second node towards the meeting node
+        y = self.A[self.Chords].copy()  # walks up from the chord's first node; the loop runs down this path
+        loop = np.arange(nL)
+        while True:
+            active = x != y
+            if not active.any():
+                break
+            loop, x, y = loop[active], x[active], y[active]
+            mx = depth[x] >= depth[y]
+            my = depth[y] >= depth[x]
+            for move, v, s in ((mx, x, 1.0), (my, y, -1.0)):
+                e = pe[v[move]]
+                rows.append(loop[move])
+                cols.append(e)
+                signs.append(np.where(A[e] == v[move], s, -s))  # going up from the child along the element?
+                v[move] = parent[v[move]]
+        return sparse.csr_matrix((np.concatenate(signs), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(nL, len(A)))
+
+    @property
+    def Matrix(self):
+        """
+        Loop x element matrix of traversal signs, built on first use; its size is the total length of all
+        loops, so large circuits should avoid it.
+        """
+        if self._Matrix is None:
+            self._Matrix = self._CycleMatrix()
+        return self._Matrix
+
+    @property
+    def NumLoops(self):
+        return len(self.Chords)
+
+    def LoopNodes(self, k):
+        """
+        Node names of a loop in traversal order.
+        :param k: loop index
+        :return: list of node names, starting at the first node of the loop's chord
+        """
+        e = self.Chords[k]
+        up, down = [self.B[e]], [self.A[e]]  # paths from the chord's nodes to where they meet
+        while up[-1] != down[-1]:
+            if self.Depth[up[-1]] >= self.Depth[down[-1]]:
+                up.append(self.Parent[up[-1]])
+            else:
+                down.append(self.Parent[down[-1]])
+        nodes = down[:1] + up + down[-2:0:-1]
+        if nodes[-1] == nodes[0]:
+            nodes.pop()
+        return [self.Circuit.NodeNames[v] for v in nodes]
+    #endregion
+#endregion
+
+#region function definitions
+def SolveBranchCurrents(circuit, basis=None):
+    """
+    Branch current analysis: every element's current is an unknown, with one KCL row per node that is not
+    a part's reference node and one KVL row per fundamental loop.  Written directly, each loop row holds the
+    whole forest path of its chord, which gets long on large circuits.  Instead the node voltages along the
+    forest are carried as extra unknowns, one per forest element, so every element contributes one short row,
+
+        sum over a node of +I (leaving) / -I (entering) = 0
+        V(first node) - V(second node) - R * I = -E   (E = 0 for resistors, R = 0 for sources)
+
+    The rows of the forest elements define the node voltages, and the row of each chord is then exactly the
+    KVL equation of its fundamental loop.  Everything is solved with one sparse LU factorization.
+    :param circuit: a CompiledCircuit
+    :param basis: LoopBasis of the circuit; discovered if None
+    :return: a CircuitSolution
+    """
+    c = circuit
+    basis = LoopBasis(c) if basis is None else basis
+    n, nR, nE = c.NumNodes, len(c.R), len(basis.A)
+    roots = basis.Parent < 0
+    nKCL = n - int(roots.sum())
+    pos = np.full(n, -1)
+    pos[~roots] = np.arange(nKCL)  # row of each KCL equation, and column of each node voltage unknown
+
+    # Unknowns [V, I] and rows [KCL, elements]: the matrix [[0, A], [A', -R]] is symmetric
+    e = nKCL + np.arange(nE)
+    R = np.concatenate([c.R, np.zeros(len(c.V))])
+    E = np.concatenate([np.zeros(nR), c.V])
+    a, b = pos[basis.A], pos[basis.B]
+    rows = np.concatenate([a, b, e, e, e])
+    cols = np.concatenate([e, e, a, b, e])
+    vals = np.concatenate([np.ones(nE), -np.ones(nE), np.ones(nE), -np.ones(nE), -R])
+    keep = (rows >= 0) & (cols >= 0) & (vals != 0.0)  # reference nodes have no KCL row and no voltage unknown
+    M = sparse.csc_matrix((vals[keep], (rows[keep], cols[keep])), shape=(nKCL + nE, nKCL + nE))
+    try:  # symmetric, so a symmetric fill-reducing ordering suits it
+        lu = splu(M, permc_spec="MMD_AT_PLUS_A", options=dict(SymmetricMode=True))
+    except RuntimeError:
+        raise ValueError("The loop equations are singular; check for loops of voltage sources") from None
+    x = lu.solve(np.concatenate([np.zeros(nKCL), -E]))
+    volts = np.zeros(n)
+    volts[~roots] = x[:nKCL]
+    x = x[nKCL:]
+    return CircuitSolution(c, volts, x[:nR], x[nR:])
+#endregion
@@ -0,0 +1,394 @@
+#region imports
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+#endregion
+
+#region class definitions
+class CircuitSolution():
+    """
+    Node voltages and element currents of a solved circuit.  Resistor currents are positive from the
+    first node of the name to the second; source currents are positive through the source from its first
+    node to its second.  One node of every connected part of the circuit is the 0 V reference.
+    """
+    #region constructor
+    def __init__(self, circuit, NodeVoltages, ResistorCurrents, SourceCurrents):
+        """
+        :param circuit: the CompiledCircuit that was solved
+        :param NodeVoltages: voltage of each node
+        :param ResistorCurrents: current of each resistor
+        :param SourceCurrents: current of each voltage source
+        """
+        self.Circuit = circuit
+        self.NodeVoltages = NodeVoltages
+        self.ResistorCurrents = ResistorCurrents
+        self.SourceCurrents = SourceCurrents
+    #endregion
+
+    #region methods
+    def NodeVoltage(self, name):
+        """
+        :param name: node name
+        :return: voltage of the node
+        """
+        return self.NodeVoltages[self.Circuit.NodeIndex[name]]
+
+    def Current(self, name):
+        """
+        Current of a resistor or voltage source by name.
+        :param name: element name
+        :return: current in amps
+        """
+        c = self.Circuit
+        if name in c.RNames:
+            return self.ResistorCurrents[c.RNames.index(name)]
+        return self.SourceCurrents[c.VNames.index(name)]
+
+    def Print(self):
+        """
+        Prints the element currents and node voltages.
+        """
+        c = self.Circuit
+        for name, i in zip(c.RNames, self.ResistorCurrents):
+            print("I_{} = {:0.3f}A".format(name, i))
+        for name, i in zip(c.VNames, self.SourceCurrents):
+            print("I_{} = {:0.3f}A (source)".format(name, i))
+        for name, v in zip(c.NodeNames, self.NodeVoltages):
+            print("V_{} = {:0.3f}V".format(name, v))
+
+    def Residual(self):
+        """
+        How far the solution is from satisfying the circuit equations: the current left over at any node
+        (KCL), and the error of any element voltage (Ohm's law for the resistors, the set voltage for the
+        sources).
+        :return: (largest KCL residual in A, largest element voltage residual in V)
+        """
+        c = self.Circuit
+        n = c.NumNodes
+        V, iR, iS = self.NodeVoltages, self.ResistorCurrents, self.SourceCurrents
+        leaving = (np.bincount(c.RA, iR, n) - np.bincount(c.RB, iR, n)
+                   + np.bincount(c.VA, iS, n) - np.bincount(c.VB, iS, n))
+        with np.errstate(invalid='ignore'):
+            ohm = V[c.RA] - V[c.RB] - c.R * iR
+        ohm[np.isinf(c.R)] = 0.0  # an open resistor sets no voltage, only a zero current
+        dV = np.concatenate([ohm, V[c.VB] - V[c.VA] - c.V])
+        return float(np.abs(leaving).max(initial=0.0)), float(np.abs(dV).max(initial=0.0))
+    #endregion
+
+
+class MNASystem():
+    """
+    Modified nodal analysis equations of a CompiledCircuit:
+
+        [ G   B ] [ V ]   [ 0  ]
+        [ B'  0 ] [ I ] = [ -E ]
+
+    G is the conductance matrix of the node voltages V, and each voltage source adds a current unknown I
+    with the constraint V(second node) - V(first node) = E.  Zero-ohm resistors are treated as 0 V sources.
+    The node with the most elements in every connected part of the circuit is grounded (0 V, see
+    PartReferences), and its row and column are dropped, so the matrix is symmetric and non-singular for any
+    circuit without loops of voltage sources and zero-ohm resistors.
+    """
+    #region constructor
+    def __init__(self, circuit, factor=True):
+        """
+        Assembles the sparse matrix and factors it.
+        :param circuit: a CompiledCircuit
+        :param factor: if False, only assemble; call Factor before solving
+        """
+        self.Circuit = circuit
+        c = circuit
+        n = c.NumNodes
+        self.Ground = GroundNodes(c)
+        self.Unknown = np.flatnonzero(~self.Ground)  # nodes with unknown voltage, in unknown order
+        pos = np.full(n, -1)
+        pos[self.Unknown] = np.arange(len(self.Unknown))
+        self.Position = pos  # row of each node's voltage, -1 for reference nodes
+        self._X = None  # solution for the circuit's own source voltages, kept for Modified and FaultSweep
+        self.Short = np.flatnonzero(c.R == 0.0)  # zero-ohm resistors, solved as 0 V sources
+        R = np.flatnonzero(c.R != 0.0)
+        nV = len(self.Unknown)
+        nS = len(c.V) + len(self.Short)
+        self.Size = nV + nS
+
+        # Conductance stamps of the resistors, then the +1/-1 stamps of the sources and shorts
+        a, b, one = pos[c.RA[R]], pos[c.RB[R]], np.ones(len(R))
+        rows = [a, b, a, b]
+        cols = [a, b, b, a]
+        signs = [one, one, -one, -one]
+        owner = [R] * 4
+        sa = pos[np.concatenate([c.VA, c.RA[self.Short]])]
+        sb = pos[np.concatenate([c.VB, c.RB[self.Short]])]
+        k = nV + np.arange(nS)
+        for nodes, sign in ((sa, 1.0), (sb, -1.0)):
+            rows += [nodes, k]
+            cols += [k, nodes]
+            signs += [np.full(nS, sign)] * 2
+            owner += [np.full(nS, -1)] * 2
+        rows, cols, signs, owner = (np.concatenate(v) for v in (rows, cols, signs, owner))
+        keep = (rows >= 0) & (cols >= 0)  # drop the stamps of grounded nodes
+        # Each matrix entry: sign times the conductance of its resistor, or just sign for the source stamps (owner -1)
+        self.Stamps = (rows[keep], cols[keep], signs[keep], owner[keep])
+        self.A = sparse.csc_matrix((self.StampValues(c.R), self.Stamps[:2]), shape=(self.Size, self.Size))
+        self.LU = None
+        if factor:
+            self.Factor()
+    #endregion
+
+    #region methods
+    def Factor(self):
+        """
+        Sparse LU factorization of the matrix, into self.LU.
+        :return: nothing
+        """
+        try:  # the matrix is symmetric, so a symmetric fill-reducing ordering suits it
+            self.LU = splu(self.A, permc_spec="MMD_AT_PLUS_A", options=dict(SymmetricMode=True))
+        except RuntimeError:
+            raise ValueError("The circuit equations are singular; check for loops of voltage sources and zero-ohm "
+                             "resistors") from None
+
+    def StampValues(self, R):
+        """
+        Values of the matrix stamps for a set of resistances (same sparsity pattern as self.A).
+        :param R: resistance of each resistor, shape (resistors,) or (cases, resistors); zero-ohm resistors of
+                  the circuit must stay zero
+        :return: value of each stamp, shape (stamps,) or (cases, stamps)
+        """
+        rows, cols, signs, owner = self.Stamps
+        R = np.asarray(R, dtype=float)
+        vals = np.array(np.broadcast_to(signs, R.shape[:-1] + signs.shape))
+        res = owner >= 0
+        vals[..., res] /= R[..., owner[res]]
+        return vals
+
+    def RHS(self, V=None, Loads=None):
+        """
+        Right-hand side for a set of source voltages and node loads.
+        :param V: source voltages, or an array of shape (number of sources, number of cases); the circuit's
+                  own voltages if None
+        :param Loads: optional current drawn out of each node to the reference node of its part, shape
+                      (number of nodes,) or (number of nodes, number of cases)
+        :return: right-hand side vector, or matrix with one column per case
+        """
+        V = self.Circuit.V if V is None else np.asarray(V, dtype=float)
+        Loads = None if Loads is None else np.asarray(Loads, dtype=float)
+        cases = np.broadcast_shapes(V.shape[1:], () if Loads is None else Loads.shape[1:])
+        column = lambda a: a.reshape(a.shape + (1,) * (len(cases) + 1 - a.ndim))  # a vector is used in every case
+        b = np.zeros((self.Size,) + cases)
+        nV = len(self.Unknown)
+        b[nV:nV + len(V)] = -column(V)
+        if Loads is not None:
+            b[:nV] = -column(Loads[self.Unknown])
+        return b
+
+    def Expand(self, x, R=None):
+        """
+        Turns a solution vector into node voltages and element currents.
+        :param x: solution vector from the factored matrix
+        :param R: resistances to find the resistor currents with, shape (resistors,) or like x with one column
+                  per case; the circuit's own if None
+        :return: a CircuitSolution
+        """
+        c = self.Circuit
+        R = c.R if R is None else R
+        nV = len(self.Unknown)
+        volts = np.zeros((c.NumNodes,) + x.shape[1:])
+        volts[self.Unknown] = x[:nV]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iR = (volts[c.RA] - volts[c.RB]) / R.reshape(R.shape + (1,) * (x.ndim - R.ndim))
+        iR[self.Short] = x[nV + len(c.V):]
+        return CircuitSolution(c, volts, iR, x[nV:nV + len(c.V)])
+
+    def Solve(self, V=None, Loads=None):
+        """
+        Solves the circuit for a set of source voltages with the stored factorization.
+        :param V: source voltages (see RHS); the circuit's own voltages if None
+        :param Loads: optional node loads (see RHS)
+        :return: a CircuitSolution
+        """
+        return self.Expand(self.LU.solve(self.RHS(V, Loads)))
+
+    def SolveBatch(self, V=None, Loads=None):
+        """
+        Solves many cases with the stored factorization.  The solution is linear in the source voltages and
+        loads, so the unit responses to each source and each loaded node are found in one multi-column solve
+        and every case is a weighted sum of them (one matrix product).  With fewer cases than inputs the
+        cases are solved directly instead, also as one multi-column solve.
+        :param V: source voltages, shape (cases, sources), or (sources,) to use the same voltages in every case
+        :param Loads: optional current drawn out of each node, shape (cases, nodes) or (nodes,)
+        :return: a CircuitSolution whose arrays have one row per case
+        """
+        c = self.Circuit
+        V = np.atleast_2d(c.V if V is None else np.asarray(V, dtype=float))
+        Loads = np.zeros((1, c.NumNodes)) if Loads is None else np.atleast_2d(np.asarray(Loads, dtype=float))
+        cases = max(len(V), len(Loads))
+        V = np.broadcast_to(V, (cases, len(c.V)))
+        Loads = np.broadcast_to(Loads, (cases, c.NumNodes))
+        loaded = self.Unknown[np.any(Loads[:, self.Unknown] != 0.0, axis=0)]  # loads at reference nodes do nothing
+        pos = self.Position
+        nIn = len(c.V) + len(loaded)
+        U = np.zeros((self.Size, nIn))  # right-hand side of each unit input
+        U[len(self.Unknown) + np.arange(len(c.V)), np.arange(len(c.V))] = -1.0
+        U[pos[loaded], len(c.V) + np.arange(len(loaded))] = -1.0
+        W = np.concatenate([V.T, Loads[:, loaded].T])  # weight of each unit input in each case
+        x = self.LU.solve(U) @ W if nIn < cases else self.LU.solve(U @ W)
+        sol = self.Expand(x)
+        return CircuitSolution(c, sol.NodeVoltages.T, sol.ResistorCurrents.T, sol.SourceCurrents.T)
+
+    def _BaseSolution(self):
+        """
+        :return: solution vector for the circuit's own source voltages, solved once
+        """
+        if self._X is None:
+            self._X = self.LU.solve(self.RHS())
+        return self._X
+
+    def _UpdateVectors(self, k):
+        """
+        Conductance update vectors: changing the conductance of resistor k by dg adds dg * u * u' to the
+        matrix, with u = +1 at its first node and -1 at its second (reference nodes have no row).
+        :param k: resistor indices
+        :return: dense array of shape (Size, len(k)), one u per column
+        """
+        c = self.Circuit
+        U = np.zeros((self.Size, len(k)))
+        j = np.arange(len(k))
+        for nodes, sign in ((c.RA[k], 1.0), (c.RB[k], -1.0)):
+            rows = self.Position[nodes]
+            U[rows[rows >= 0], j[rows >= 0]] = sign
+        return U
+
+    def _Resolved(self, changes):
+        """
+        Fallback for changes the low-rank update cannot make: factors the changed circuit afresh.
+        :param changes: dict of resistor index -> new resistance
+        :return: a CircuitSolution
+        """
+        R = self.Circuit.R.copy()
+        R[list(changes)] = list(changes.values())
+        return MNASystem(self.Circuit.WithResistances(R)).Solve()
+
+    def Modified(self, changes):
+        """
+        Solution with a few resistances changed, from the existing factorization (Woodbury identity):
+
+            x' = x - Z (C^-1 + U' Z)^-1 U' x,   Z = A^-1 U,  C = diag(change in conductance)
+
+        so k changed resistors cost k solves with the stored factors and a k x k dense solve.  A short
+        (R = 0) has C^-1 = 0 and an open (R = inf) has C^-1 = -R.  Resistors that are zero-ohm in the base
+        circuit are 0 V sources rather than conductances, and opening a resistor can split off a floating
+        part; both are solved by refactoring instead, the split-off part with its own reference node (see
+        PartReferences).
+        :param changes: dict of resistor index -> new resistance (0 for a short, np.inf for an open)
+        :return: a CircuitSolution for the changed circuit (its Circuit has the new resistances)
+        """
+        c = self.Circuit
+        changes = {int(k): float(r) for k, r in changes.items() if float(r) != c.R[k]}
+        x = self._BaseSolution()
+        if not changes:
+            return self.Expand(x)
+        k = np.array(list(changes))
+        Rnew = np.array(list(changes.values()))
+        if np.any(c.R[k] == 0.0):
+            return self._Resolved(changes)
+        with np.errstate(divide='ignore'):
+            Cinv = 1.0 / (1.0 / Rnew - 1.0 / c.R[k])  # 0 for a short, -R for an open
+        U = self._UpdateVectors(k)
+        Z = self.LU.solve(U)
+        S = np.diag(Cinv) + U.T @ Z
+        scale = np.sqrt(np.abs(Cinv) + np.abs(np.diag(U.T @ Z)))
+        if np.linalg.cond(S / np.outer(scale, scale)) > 1e10:
+            return self._Resolved(changes)  # e.g. opening the only path to part of the circuit
+        alpha = np.linalg.solve(S, U.T @ x)  # current through the added conductances
+        x = x - Z @ alpha
+        R = c.R.copy()
+        R[k] = Rnew
+        sol = self.Expand(x, R)
+        sol.ResistorCurrents[k] = alpha + U.T @ x / c.R[k]  # base conductance plus the added one; exact for shorts
+        return CircuitSolution(c.WithResistances(R), sol.NodeVoltages, sol.ResistorCurrents, sol.SourceCurrents)
+
+    def FaultSweep(self, resistors=None, R=0.0, blockSize=64):
+        """
+        Changes one resistor at a time (a short by default) and solves each case with a rank-1 update of the
+        stored factorization (Sherman-Morrison), blockSize resistors per multi-column solve.
+        :param resistors: resistor indices to change; all resistors if None
+        :param R: resistance each one is changed to (0 for a short, np.inf for an open)
+        :param blockSize: resistors per block of solves
+        :return: generator of (resistor index, CircuitSolution of the changed circuit), with None in place of the
+                 solution when the change leaves no solution (a short that closes a loop of voltage sources)
+        """
+        c = self.Circuit
+        resistors = np.arange(len(c.R)) if resistors is None else np.asarray(resistors)
+        x = self._BaseSolution()
+        for i in range(0, len(resistors), blockSize):
+            k = resistors[i:i + blockSize]
+            U = self._UpdateVectors(k)
+            Z = self.LU.solve(U)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                Cinv = 1.0 / (1.0 / np.float64(R) - 1.0 / c.R[k])
+            uz = np.einsum('ij,ij->j', U, Z)
+            den = Cinv + uz
+            direct = (c.R[k] == 0.0) | (c.R[k] == R) | (np.abs(den) <= 1e-10 * (np.abs(Cinv) + np.abs(uz)))
+            alpha = np.where(direct, 0.0, (U.T @ x) / np.where(direct, 1.0, den))
+            X = x[:, None] - Z * alpha
+            sol = self.Expand(X)
+            for j, kj in enumerate(k.tolist()):
+                if direct[j]:
+                    try:
+                        yield kj, (self._Resolved({kj: R}) if c.R[kj] != R else self.Expand(x))
+                    except ValueError:
+                        yield kj, None  # the change closes a loop of voltage sources and shorts
+                    continue
+                iR = sol.ResistorCurrents[:, j].copy()
+                iR[kj] = alpha[j] + U[:, j] @ X[:, j] / c.R[kj]
+                Rj = c.R.copy()
+                Rj[kj] = R
+                yield kj, CircuitSolution(c.WithResistances(Rj), sol.NodeVoltages[:, j], iR, sol.SourceCurrents[:, j])
+    #endregion
+#endregion
+
+#region function definitions
+def PartReferences(circuit):
+    """
+    The reference node of the connected part each node belongs to: the node of the part with the most
+    elements (the lowest numbered of those, on a tie).  Grounding it removes the densest row and column of
+    the MNA matrix; a hub left in, like the common node of a ladder's shunts, makes the minimum degree
+    ordering take time quadratic in the size of the circuit.  Open resistors (R = inf) do not connect their
+    nodes, so a part they alone held on gets its own reference, but they still count as elements: opening a
+    resistor that is not a bridge keeps every reference where it was.
+    :param circuit: a CompiledCircuit
+    :return: array with the index of each node's reference node
+    """
+    c = circuit
+    n = c.NumNodes
+    a = np.concatenate([c.RA, c.VA])
+    b = np.concatenate([c.RB, c.VB])
+    joins = np.concatenate([c.R != np.inf, np.ones(len(c.V), dtype=bool)])
+    nParts, labels = connected_components(sparse.coo_matrix((np.ones(joins.sum()), (a[joins], b[joins])), shape=(n, n)),
+                                          directed=False)
+    degree = np.bincount(a, minlength=n) + np.bincount(b, minlength=n)
+    order = np.lexsort((np.arange(n), -degree, labels))  # by part, then most elements first, then by number
+    reference = order[np.searchsorted(labels[order], np.arange(nParts))]
+    return reference[labels]
+
+
+def GroundNodes(circuit):
+    """
+    Picks the reference node of every connected part of the circuit (see PartReferences).
+    :param circuit: a CompiledCircuit
+    :return: boolean array, True for the reference node of each connected part
+    """
+    ground = np.zeros(circuit.NumNodes, dtype=bool)
+    ground[PartReferences(circuit)] = True
+    return ground
+
+
+def SolveMNA(circuit):
+    """
+    Solves a circuit by modified nodal analysis with one sparse LU factorization.
+    :param circuit: a CompiledCircuit
+    :return: a CircuitSolution
+    """
+    return MNASystem(circuit).Solve()
+#endregion
@@ -0,0 +1,173 @@
+#region imports
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from MNASolver import MNASystem
+#endregion
+
+#region class definitions
+class RunningStats():
+    """
+    Mean and standard deviation of a stream of sample batches (Welford's update, merged a batch at a time),
+    plus a fixed-size uniform random sample of the rows seen (reservoir sampling) for the percentiles, so the
+    memory use does not grow with the number of samples.
+    """
+    #region constructor
+    def __init__(self, width, reservoir=1000, rng=None):
+        """
+        :param width: number of quantities in each sample row
+        :param reservoir: number of sample rows kept for the percentiles
+        :param rng: numpy random Generator for the reservoir
+        """
+        self.Count = 0
+        self.Mean = np.zeros(width)
+        self.M2 = np.zeros(width)  # sum of squared deviations from the mean
+        self.Reservoir = np.empty((reservoir, width))
+        self.RNG = np.random.default_rng() if rng is None else rng
+    #endregion
+
+    #region methods
+    def Add(self, batch):
+        """
+        Adds a batch of samples.
+        :param batch: array of shape (samples, width)
+        :return: nothing
+        """
+        nb = len(batch)
+        if nb == 0:
+            return
+        n = self.Count + nb
+        mb = batch.mean(axis=0)
+        delta = mb - self.Mean
+        self.Mean += delta * nb / n
+        self.M2 += ((batch - mb) ** 2).sum(axis=0) + delta ** 2 * self.Count * nb / n
+
+        # Reservoir: sample t (0-based) replaces a random row with probability k / (t + 1)
+        k = len(self.Reservoir)
+        t = self.Count + np.arange(nb)
+        fill = t < k
+        self.Reservoir[t[fill]] = batch[fill]
+        j = self.RNG.integers(0, t[~fill] + 1) if (~fill).any() else np.zeros(0, dtype=np.int64)
+        take = j < k
+        rows, src = j[take], np.flatnonzero(~fill)[take]
+        last = len(rows) - 1 - np.unique(rows[::-1], return_index=True)[1]  # the latest sample wins a row
+        self.Reservoir[rows[last]] = batch[src[last]]
+        self.Count = n
+
+    @property
+    def Std(self):
+        return np.sqrt(self.M2 / max(self.Count - 1, 1))
+
+    def Percentiles(self, q):
+        """
+        :param q: percentiles to estimate, in 0..100
+        :return: array of shape (len(q), width)
+        """
+        return np.percentile(self.Reservoir[:min(self.Count, len(self.Reservoir))], q, axis=0)
+    #endregion
+
+
+class MonteCarloResult():
+    """
+    Statistics of the resistor currents and node voltages over the Monte Carlo samples.  Percentiles are
+    estimated from a uniform random subset of the samples (see RunningStats).
+    """
+    #region constructor
+    def __init__(self, circuit, currents, voltages, percentiles):
+        """
+        :param circuit: the CompiledCircuit analyzed
+        :param currents: RunningStats of the resistor currents
+        :param voltages: RunningStats of the node voltages
+        :param percentiles: percentiles to report
+        """
+        self.Circuit = circuit
+        self.Samples = currents.Count
+        self.CurrentMean, self.CurrentStd = currents.Mean, currents.Std
+        self.VoltageMean, self.VoltageStd = voltages.Mean, voltages.Std
+        self.PercentileLevels = list(percentiles)
+        self.CurrentPercentiles = dict(zip(self.PercentileLevels, currents.Percentiles(percentiles)))
+        self.VoltagePercentiles = dict(zip(self.PercentileLevels, voltages.Percentiles(percentiles)))
+    #endregion
+
+    #region methods
+    def Print(self):
+        """
+        Prints the current and voltage statistics.
+        """
+        c = self.Circuit
+        q = self.PercentileLevels
+        print(f"{self.Samples} samples; percentiles {', '.join(str(p) for p in q)}")
+        for k, name in enumerate(c.RNames):
+            pct = ', '.join('{:0.3f}'.format(self.CurrentPercentiles[p][k]) for p in q)
+            print("I_{} = {:0.3f} +/- {:0.3f}A ({})".format(name, self.CurrentMean[k], self.CurrentStd[k], pct))
+        for k, name in enumerate(c.NodeNames):
+            pct = ', '.join('{:0.3f}'.format(self.VoltagePercentiles[p][k]) for p in q)
+            print("V_{} = {:0.3f} +/- {:0.3f}V ({})".format(name, self.VoltageMean[k], self.VoltageStd[k], pct))
+    #endregion
+#endregion
+
+#region function definitions
+def MonteCarlo(circuit, tolerance=0.05, samples=10000, seed=0, distribution='uniform', batchSize=None,
+               percentiles=(5, 50, 95), reservoir=1000, denseLimit=64, workers=None):
+    """
+    Monte Carlo tolerance analysis: every resistance varies independently around its nominal value, and the
+    circuit is solved for each sample.  Samples are drawn and solved a batch at a time and only the running
+    statistics are kept.  Small circuits (at most denseLimit unknowns) solve a batch as one stack of dense
+    systems; larger ones refactor the sparse matrix per sample, reusing its sparsity pattern, optionally on a
+    pool of threads.
+    :param circuit: a CompiledCircuit
+    :param tolerance: relative tolerance, e.g. 0.01 for 1%
+    :param samples: number of samples
+    :param seed: random seed; the same seed gives the same samples for any batch size
+    :param distribution: 'uniform' within +/- tolerance, or 'normal' with the tolerance as 3 standard deviations
+    :param batchSize: samples per batch; chosen from the circuit size if None
+    :param percentiles: percentiles to estimate, in 0..100
+    :param reservoir: samples kept for the percentile estimates
+    :param denseLimit: largest number of unknowns for the stacked dense solver
+    :param workers: threads for the sparse solves; one at a time if None
+    :return: a MonteCarloResult
+    """
+    system = MNASystem(circuit)
+    c = circuit
+    n = system.Size
+    dense = n <= denseLimit
+    batchSize = batchSize or (max(1, 2 ** 22 // max(n * n, 1)) if dense else 256)
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    rng = np.random.default_rng(seeds[0])
+    currents = RunningStats(len(c.R), reservoir, np.random.default_rng(seeds[1]))
+    voltages = RunningStats(c.NumNodes, reservoir, np.random.default_rng(seeds[2]))
+    b = system.RHS()
+    rows, cols = system.Stamps[:2]
+    pool = ThreadPoolExecutor(workers) if workers and not dense else None
+    # The CSC structure is the same for every sample; only the summed stamp values change
+    entries, entry = np.unique(cols * n + rows, return_inverse=True)
+    indices, indptr = entries % n, np.searchsorted(entries // n, np.arange(n + 1))
+
+    def sparseSolve(vals):
+        A = sparse.csc_matrix((np.bincount(entry, vals, len(entries)), indices, indptr), shape=(n, n))
+        return splu(A, permc_spec="MMD_AT_PLUS_A", options=dict(SymmetricMode=True)).solve(b)
+
+    try:
+        for start in range(0, samples, batchSize):
+            m = min(batchSize, samples - start)
+            if distribution == 'normal':
+                scale = 1.0 + rng.standard_normal((m, len(c.R))) * (tolerance / 3.0)
+            else:
+                scale = 1.0 + rng.uniform(-tolerance, tolerance, (m, len(c.R)))
+            R = c.R * scale  # zero-ohm resistors stay zero
+            vals = system.StampValues(R)
+            if dense:
+                A = np.zeros((m, n, n))
+                np.add.at(A, (slice(None), rows, cols), vals)
+                x = np.linalg.solve(A, np.broadcast_to(b, (m, n))[..., None])[..., 0]
+            else:
+                x = np.array(list(pool.map(sparseSolve, vals) if pool else map(sparseSolve, vals)))
+            sol = system.Expand(x.T, R.T)
+            currents.Add(sol.ResistorCurrents.T)
+            voltages.Add(sol.NodeVoltages.T)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return MonteCarloResult(c, currents, voltages, percentiles)
+#endregion
@@ -0,0 +1,122 @@
+#region imports
+import numpy as np
+from Circuit import CompiledCircuit
+#endregion
+
+#region function definitions
+def _Assemble(nNodes, RA, RB, rng, loops, V=12.0):
+    """
+    Turns a list of node pairs into a CompiledCircuit with random resistances.  Node n0 is driven by a voltage
+    source from an extra ground node 'g', and a load resistor returns from n1 to g, so the source closes a
+    short loop g, n0, n1 (every generator joins nodes 0 and 1).  g is numbered first.  In a ladder it joins
+    every shunt, so it is the node with the most elements and the MNA solver grounds it.
+    :param nNodes: number of nodes besides g, named n0, n1, ...
+    :param RA: first node index of each resistor
+    :param RB: second node index of each resistor
+    :param rng: numpy random Generator
+    :param loops: list of node index lists, one per loop
+    :param V: source voltage
+    :return: a CompiledCircuit with a complete set of independent loops in its Loops
+    """
+    names = ['g'] + ['n{}'.format(k) for k in range(nNodes)]
+    g = nNodes  # in the generators' numbering, shifted by one below
+    RA = np.concatenate([np.asarray(RA, dtype=np.int64), [1]])
+    RB = np.concatenate([np.asarray(RB, dtype=np.int64), [g]])
+    RA, RB = (np.where(x == g, 0, x + 1) for x in (RA, RB))
+    R = np.round(rng.uniform(1.0, 100.0, len(RA)), 3)
+    loops = [('L{}'.format(k + 1), [names[0 if v == g else v + 1] for v in loop])
+             for k, loop in enumerate([[g, 0, 1]] + list(loops))]
+    return CompiledCircuit(names, ['{}-{}'.format(names[a], names[b]) for a, b in zip(RA.tolist(), RB.tolist())],
+                           RA, RB, R, ['g-n0'], [0], [1], [V], loops)
+
+
+def Ladder(nElements, seed=0):
+    """
+    Resistor ladder: a series resistor from each node to the next and a shunt resistor from each node to the
+    ground node g.  Each rung is a loop of three nodes.
+    :param nElements: approximate number of elements
+    :param seed: random seed
+    :return: a CompiledCircuit
+    """
+    m = max(2, (nElements - 1) // 2)  # series resistors; 2m + 1 elements with the source
+    k = np.arange(m)
+    g = m + 1  # the ground node is numbered after n0..nm by the generators
+    shunt = np.arange(2, m + 1)  # node 1 is shunted by the load resistor of _Assemble
+    loops = [[g, j, j + 1] for j in range(1, m)]
+    return _Assemble(m + 1, np.concatenate([k, shunt]), np.concatenate([k + 1, np.full(len(shunt), g)]),
+                     np.random.default_rng(seed), loops)
+
+
+def Mesh(nElements, seed=0):
+    """
+    Square 2D mesh of resistors between horizontal and vertical neighbours.  Each cell is a loop of four nodes.
+    :param nElements: approximate number of elements
+    :param seed: random seed
+    :return: a CompiledCircuit
+    """
+    side = max(2, int(round((1 + np.sqrt(1 + 2 * max(nElements - 2, 0))) / 2)))  # 2*side*(side-1) resistors
+    idx = np.arange(side * side).reshape(side, side)
+    RA = np.concatenate([idx[:, :-1].ravel(), idx[:-1, :].ravel()])
+    RB = np.concatenate([idx[:, 1:].ravel(), idx[1:, :].ravel()])
+    cells = np.stack([idx[:-1, :-1], idx[:-1, 1:], idx[1:, 1:], idx[1:, :-1]], axis=-1).reshape(-1, 4)
+    return _Assemble(side * side, RA, RB, np.random.default_rng(seed), cells.tolist())
+
+
+def RandomGraph(nElements, seed=0, loopFraction=0.3):
+    """
+    Random connected graph: a random tree (each node hangs off one of the few nodes numbered just before it)
+    plus chords between nodes that are close in the tree.  Each chord closes a loop through the tree.
+    :param nElements: approximate number of elements
+    :param seed: random seed
+    :param loopFraction: fraction of the resistors that are chords
+    :return: a CompiledCircuit
+    """
+    rng = np.random.default_rng(seed)
+    nNodes = max(3, int((nElements - 2) / (1 + loopFraction)) + 1)
+    child = np.arange(1, nNodes)
+    parent = np.concatenate([[-1], np.maximum(child - rng.integers(1, 8, nNodes - 1), 0)])
+    nChords = max(1, nElements - 2 - (nNodes - 1))
+    a = rng.integers(0, nNodes, nChords)
+    b = np.minimum(a + rng.integers(2, 20, nChords), nNodes - 1)
+    pairs = set(zip(parent[1:].tolist(), child.tolist()))
+    RA, RB, loops = list(parent[1:]), list(child), []
+    p = parent.tolist()
+    for u, v in zip(a.tolist(), b.tolist()):
+        if u == v or (u, v) in pairs:
+            continue
+        pairs.add((u, v))
+        RA.append(u)
+        RB.append(v)
+        up, down = [u], [v]  # parents are numbered below their children, so the larger end moves up
+        while up[-1] != down[-1]:
+            if down[-1] > up[-1]:
+                down.append(p[down[-1]])
+            else:
+                up.append(p[up[-1]])
+        loops.append(up + down[-2::-1])
+    return _Assemble(nNodes, RA, RB, rng, loops)
+
+
+def WriteNetlist(circuit, filename, comment=None):
+    """
+    Writes a circuit in the <Resistor>/<Source>/<Loop> block format read by ResistorNetwork.BuildNetworkFromFile.
+    The reader numbers the nodes in order of first appearance (CompiledCircuit.FromNetwork), which is not the
+    numbering here, so match nodes of the two by name.
+    :param circuit: a CompiledCircuit whose element names name their nodes (e.g. from a generator here)
+    :param filename: path of the file to write
+    :param comment: optional comment for the first line
+    :return: nothing
+    """
+    c = circuit
+    with open(filename, 'w') as f:
+        if comment:
+            f.write('# {}\n\n'.format(comment))
+        f.writelines('<Source>\nName = {}\nType = Voltage\nValue = {!r}\n</Source>\n'.format(n, v)
+                     for n, v in zip(c.VNames, c.V.tolist()))
+        f.writelines('<Resistor>\nName = {}\nResistance = {!r}\n</Resistor>\n'.format(n, r)
+                     for n, r in zip(c.RNames, c.R.tolist()))
+        f.writelines('<Loop>\nName = {}\nNodes = {}\n</Loop>\n'.format(n, ','.join(nodes)) for n, nodes in c.Loops)
+
+
+GENERATORS = {'ladder': Ladder, 'mesh': Mesh, 'random': RandomGraph}
+#endregion
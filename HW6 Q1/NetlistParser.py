@@ -0,0 +1,422 @@
+#region imports
+import hashlib
+import os
+import re
+from array import array
+import numpy as np
+from Circuit import CompiledCircuit, SplitElementName, SpiceNumber
+from Waveform import Waveform
+#endregion
+
+#region class definitions
+class _Scope():
+    """
+    Elements read so far for the top level of a netlist or for one subcircuit body, each with its own node
+    numbering.
+    """
+    #region constructor
+    def __init__(self, line=0):
+        """
+        :param line: line where the subcircuit definition starts (0 for the top level)
+        """
+        self.Line = line
+        self.Name, self.Ports = '', []  # subcircuit name and port node names
+        self.Index = {}  # node name -> node index
+        self.RNames, self.RA, self.RB, self.R = [], array('q'), array('q'), array('d')
+        self.VNames, self.VA, self.VB, self.V, self.VWaveforms = [], array('q'), array('q'), array('d'), []
+        self.Reactive = {kind: ([], array('q'), array('q'), array('d'), array('d')) for kind in 'cl'}
+        self.Loops, self.LoopLines = [], []
+        self.Instances = []  # (name, subcircuit name, [node indices], line)
+    #endregion
+
+    #region methods
+    def Node(self, name):
+        return self.Index.setdefault(name, len(self.Index))
+
+    def Circuit(self, subcircuits=None):
+        """
+        :param subcircuits: subcircuit definitions for CompiledCircuit
+        :return: the CompiledCircuit of the elements read
+        """
+        ints = lambda a: np.frombuffer(a, dtype=np.int64)
+        floats = lambda a: np.frombuffer(a, dtype=float)
+        (CNames, CA, CB, C, C0), (LNames, LA, LB, L, L0) = self.Reactive['c'], self.Reactive['l']
+        return CompiledCircuit(list(self.Index), self.RNames, ints(self.RA), ints(self.RB), floats(self.R),
+                               self.VNames, ints(self.VA), ints(self.VB), floats(self.V), self.Loops,
+                               self.VWaveforms, CNames, ints(CA), ints(CB), floats(C), floats(C0),
+                               LNames, ints(LA), ints(LB), floats(L), floats(L0), subcircuits,
+                               [(name, sub, np.array(nodes, dtype=np.int64)) for name, sub, nodes, line in
+                                self.Instances])
+    #endregion
+#endregion
+
+#region function definitions
+_WaveformCard = re.compile(r'(sin|pulse)\s*\([^)]*\)')
+
+
+def _List(txt):
+    """
+    :param txt: comma separated names, e.g. 'a, b, c'
+    :return: list of the names
+    """
+    return [n.strip() for n in txt.split(',') if n.strip()]
+
+
+def ParseNetlist(filename, cache=False):
+    """
+    Reads a netlist in one pass, a line at a time, straight into a CompiledCircuit.  The file may mix
+    <Resistor>, <Source>, <Capacitor>, <Inductor> and <Loop> blocks (name = value lines between exact opening
+    and closing tags) with SPICE element cards outside the blocks:
+        Rname node1 node2 value
+        Vname node+ node- [DC] value [SIN(...) | PULSE(...)]
+        Cname node1 node2 value [IC=initial voltage]
+        Lname node1 node2 value [IC=initial current]
+    A SPICE source raises node+ above node-, so it is stored from node- to node+.  A source with a waveform
+    (also 'waveform = ...' in a <Source> block) is time dependent in transient analysis, and its DC value
+    defaults to the waveform at t = 0.  Capacitor blocks take capacitance and voltage (initial, first node
+    minus second node), inductor blocks inductance and current (initial, first node to second node).
+
+    Subcircuits are defined once, between <Subcircuit> and </Subcircuit> with 'name = ...' and
+    'ports = p1, p2, ...' lines and then element blocks or cards, or between '.subckt name p1 p2 ...' and
+    '.ends'.  They are used by <Instance> blocks (name, subcircuit, nodes = n1, n2, ...) or instance cards
+        Xname n1 n2 ... subcircuit
+    which connect the ports in order to the given nodes.  Subcircuits may contain instances of other
+    subcircuits, but not definitions or loops.
+
+    Names are case insensitive and stored in lower case.  Lines starting with '#' or '*' are comments, and
+    other SPICE control lines ('.end', ...) are skipped.  Errors give the line number.
+    :param filename: path of the netlist
+    :param cache: if True, keep the compiled arrays in filename + '.npz' and reuse them while the file is unchanged
+    :return: a CompiledCircuit; the <Loop> blocks are in its Loops list as (name, [node names]), and the
+             subcircuits in its Subcircuits and Instances
+    """
+    if cache:
+        circuit = LoadCache(filename)
+        if circuit is not None:
+            return circuit
+    circuit = _ParseNetlist(filename)
+    if cache:
+        SaveCache(filename, circuit)
+    return circuit
+
+
+def _ParseNetlist(filename):
+    """
+    The parser behind ParseNetlist.
+    :param filename: path of the netlist
+    :return: a CompiledCircuit
+    """
+    top = _Scope()
+    scope = top  # the top level, or the subcircuit being defined
+    subcircuits = {}  # name -> _Scope of the body
+    block, fields, blockLine = None, {}, 0
+
+    def error(lineNum, msg):
+        return ValueError(f"{filename}, line {lineNum}: {msg}")
+
+    def number(txt, lineNum):
+        try:
+            return SpiceNumber(txt)
+        except ValueError:
+            raise error(lineNum, f"'{txt}' is not a number") from None
+
+    def nodes(name, lineNum):
+        try:
+            return SplitElementName(name)
+        except ValueError as e:
+            raise error(lineNum, str(e)) from None
+
+    def waveform(txt, lineNum):
+        try:
+            return Waveform(txt)
+        except ValueError as e:
+            raise error(lineNum, str(e)) from None
+
+    def source(name, a, b, value, wave, lineNum):
+        s = scope
+        s.VNames.append(name)
+        s.VA.append(s.Node(a))
+        s.VB.append(s.Node(b))
+        w = None if wave is None else waveform(wave, lineNum)
+        s.V.append(number(value, lineNum) if value is not None else float(w.Value(0.0)) if w else 12.0)
+        s.VWaveforms.append(None if w is None else w.Text)
+
+    def reactive(kind, name, a, b, value, initial, lineNum):
+        names, A, B, values, initials = scope.Reactive[kind]
+        names.append(name)
+        A.append(scope.Node(a))
+        B.append(scope.Node(b))
+        values.append(number(value, lineNum))
+        initials.append(number(initial, lineNum))
+
+    def begin(lineNum):
+        if scope is not top:
+            raise error(lineNum, f"subcircuit definitions cannot be nested (the definition on line {scope.Line} "
+                                 f"is not closed)")
+        return _Scope(lineNum)
+
+    def end(body):
+        if not body.Name:
+            raise error(body.Line, "subcircuit has no name")
+        if body.Name in subcircuits:
+            raise error(body.Line, f"subcircuit '{body.Name}' is already defined on line "
+                                   f"{subcircuits[body.Name].Line}")
+        subcircuits[body.Name] = body
+        return top
+
+    def instance(name, subcircuit, portNodes, lineNum):
+        scope.Instances.append((name, subcircuit, [scope.Node(n) for n in portNodes], lineNum))
+
+    with open(filename, 'r') as f:
+        for lineNum, line in enumerate(f, 1):
+            line = line.strip().lower()
+            if line.startswith('.subckt'):
+                card = line.split()
+                scope = begin(lineNum)
+                scope.Name, scope.Ports = (card[1] if len(card) > 1 else ''), card[2:]
+                continue
+            if line.startswith('.ends'):
+                if scope is top:
+                    raise error(lineNum, ".ends without .subckt")
+                scope = end(scope)
+                continue
+            if not line or line[0] in '#*.':
+                continue  # comments, and SPICE control lines such as .end
+            if line[0] == '<':
+                if not line.endswith('>'):
+                    raise error(lineNum, f"unterminated tag '{line}'")
+                tag = line[1:-1].strip()
+                if block is None:
+                    if tag == 'subcircuit':
+                        scope = begin(lineNum)
+                        continue
+                    if tag == '/subcircuit' and scope is not top:
+                        scope = end(scope)
+                        continue
+                    if tag.startswith('/'):
+                        raise error(lineNum, f"closing tag <{tag}> without an opening tag")
+                    block, fields, blockLine = tag, {}, lineNum
+                    continue
+                if tag != '/' + block:
+                    raise error(lineNum, f"expected </{block}> to close the block opened on line {blockLine}")
+                if 'name' not in fields and block in ('resistor', 'source', 'capacitor', 'inductor', 'loop',
+                                                      'instance'):
+                    raise error(blockLine, f"<{block}> block has no name")
+                if block == 'resistor':
+                    a, b = nodes(fields['name'], blockLine)
+                    scope.RNames.append(fields['name'])
+                    scope.RA.append(scope.Node(a))
+                    scope.RB.append(scope.Node(b))
+                    scope.R.append(number(fields.get('resistance', '1'), blockLine))
+                elif block == 'source':
+                    if fields.get('type', 'voltage') != 'voltage':
+                        raise error(blockLine, f"unsupported source type '{fields['type']}'")
+                    a, b = nodes(fields['name'], blockLine)
+                    source(fields['name'], a, b, fields.get('value'), fields.get('waveform'), blockLine)
+                elif block == 'capacitor':
+                    a, b = nodes(fields['name'], blockLine)
+                    reactive('c', fields['name'], a, b, fields.get('capacitance', '1u'), fields.get('voltage', '0'),
+                             blockLine)
+                elif block == 'inductor':
+                    a, b = nodes(fields['name'], blockLine)
+                    reactive('l', fields['name'], a, b, fields.get('inductance', '1m'), fields.get('current', '0'),
+                             blockLine)
+                elif block == 'instance':
+                    instance(fields['name'], fields.get('subcircuit', ''), _List(fields.get('nodes', '')), blockLine)
+                elif block == 'loop':
+                    if scope is not top:
+                        raise error(blockLine, "loops cannot be defined inside a subcircuit")
+                    top.Loops.append((fields['name'], _List(fields.get('nodes', ''))))
+                    top.LoopLines.append(blockLine)
+                block = None  # other blocks are skipped
+            elif block is not None:
+                key, sep, value = line.partition('=')
+                if not sep:
+                    raise error(lineNum, f"expected 'name = value' in <{block}> block")
+                fields[key.strip()] = value.strip()
+            elif scope is not top and line.partition('=')[0].strip() in ('name', 'ports'):
+                key, sep, value = line.partition('=')  # the header of a <Subcircuit> block
+                if key.strip() == 'name':
+                    scope.Name = value.strip()
+                else:
+                    scope.Ports = _List(value)
+            elif line[0] in 'rvclx':
+                wave = _WaveformCard.search(line) if line[0] == 'v' else None
+                card = (line[:wave.start()] + line[wave.end():] if wave else line).split()
+                if card[0][0] == 'x':
+                    if len(card) < 3:
+                        raise error(lineNum, f"too few fields in instance card '{line}'")
+                    instance(card[0], card[-1], card[1:-1], lineNum)
+                    continue
+                if card[0][0] == 'v' and len(card) > 3 and card[3] == 'dc':
+                    del card[3]
+                initial = '0'
+                if card[0][0] in 'cl' and len(card) > 4 and card[4].startswith('ic='):
+                    initial = card.pop(4)[3:]
+                if len(card) < (3 if wave else 4):
+                    raise error(lineNum, f"too few fields in element card '{line}'")
+                if card[0][0] == 'r':
+                    scope.RNames.append(card[0])
+                    scope.RA.append(scope.Node(card[1]))
+                    scope.RB.append(scope.Node(card[2]))
+                    scope.R.append(number(card[3], lineNum))
+                elif card[0][0] == 'v':
+                    source(card[0], card[2], card[1], card[3] if len(card) > 3 else None,
+                           wave.group(0) if wave else None, lineNum)
+                else:
+                    reactive(card[0][0], card[0], card[1], card[2], card[3], initial, lineNum)
+            else:
+                raise error(lineNum, f"unrecognized line '{line}'")
+    if block is not None:
+        raise error(blockLine, f"<{block}> block is not closed")
+    if scope is not top:
+        raise error(scope.Line, "subcircuit is not closed")
+    for (name, loopNodes), lineNum in zip(top.Loops, top.LoopLines):
+        for n in loopNodes:
+            if n not in top.Index:
+                raise error(lineNum, f"loop {name} passes through node '{n}', which no element connects")
+
+    # Instances must name a defined subcircuit with as many ports as nodes, and definitions must not recurse
+    for s in [top] + list(subcircuits.values()):
+        for name, sub, portNodes, lineNum in s.Instances:
+            if sub not in subcircuits:
+                raise error(lineNum, f"instance {name} of undefined subcircuit '{sub}'")
+            if len(portNodes) != len(subcircuits[sub].Ports):
+                raise error(lineNum, f"instance {name} connects {len(portNodes)} nodes to subcircuit '{sub}', "
+                                     f"which has {len(subcircuits[sub].Ports)} ports")
+    state = {}  # subcircuit name -> 1 while its instances are being checked, 2 when done
+
+    def visit(sub):
+        if state.get(sub) == 1:
+            raise error(subcircuits[sub].Line, f"subcircuit '{sub}' contains itself")
+        if state.get(sub) is None:
+            state[sub] = 1
+            for name, child, portNodes, lineNum in subcircuits[sub].Instances:
+                visit(child)
+            state[sub] = 2
+
+    for sub in subcircuits:
+        visit(sub)
+    definitions = {}
+    for sub, body in subcircuits.items():
+        ports = np.array([body.Node(p) for p in body.Ports], dtype=np.int64)  # a port no element uses is kept
+        definitions[sub] = (ports, body.Circuit())
+    return top.Circuit(definitions)
+
+
+def _FileKey(filename):
+    """
+    :param filename: path of a file
+    :return: (modification time in ns, size in bytes)
+    """
+    st = os.stat(filename)
+    return st.st_mtime_ns, st.st_size
+
+
+def _FileHash(filename):
+    """
+    :param filename: path of a file
+    :return: hex digest of the file contents
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _CircuitArrays(circuit, prefix=''):
+    """
+    :param circuit: a CompiledCircuit, without its subcircuit definitions
+    :param prefix: prefix of the array names
+    :return: dict of array name -> array, for np.savez
+    """
+    c = circuit
+    text = lambda names: np.array(names, dtype=str)
+    arrays = dict(NodeNames=text(c.NodeNames), RNames=text(c.RNames), RA=c.RA, RB=c.RB, R=c.R,
+                  VNames=text(c.VNames), VA=c.VA, VB=c.VB, V=c.V, VWaveforms=text([w or '' for w in c.VWaveforms]),
+                  CNames=text(c.CNames), CA=c.CA, CB=c.CB, C=c.C, C0=c.C0,
+                  LNames=text(c.LNames), LA=c.LA, LB=c.LB, L=c.L, L0=c.L0,
+                  InstNames=text([name for name, sub, nodes in c.Instances]),
+                  InstSubcircuits=text([sub for name, sub, nodes in c.Instances]),
+                  InstPtr=np.cumsum([0] + [len(nodes) for name, sub, nodes in c.Instances]),
+                  InstNodes=np.concatenate([np.zeros(0, dtype=np.int64)] + [nodes for name, sub, nodes in c.Instances]))
+    return {prefix + k: v for k, v in arrays.items()}
+
+
+def _CircuitFromArrays(s, prefix=''):
+    """
+    :param s: dict of the arrays written by _CircuitArrays
+    :param prefix: prefix of the array names
+    :return: a CompiledCircuit, without loops and subcircuit definitions
+    """
+    s = {k[len(prefix):]: v for k, v in s.items() if k.startswith(prefix)}
+    ptr, nodes = s['InstPtr'].tolist(), s['InstNodes']
+    instances = [(name, sub, nodes[ptr[k]:ptr[k + 1]])
+                 for k, (name, sub) in enumerate(zip(s['InstNames'].tolist(), s['InstSubcircuits'].tolist()))]
+    return CompiledCircuit(s['NodeNames'].tolist(), s['RNames'].tolist(), s['RA'], s['RB'], s['R'],
+                           s['VNames'].tolist(), s['VA'], s['VB'], s['V'], None,
+                           [w or None for w in s['VWaveforms'].tolist()],
+                           s['CNames'].tolist(), s['CA'], s['CB'], s['C'], s['C0'],
+                           s['LNames'].tolist(), s['LA'], s['LB'], s['L'], s['L0'], None, instances)
+
+
+def SaveCache(filename, circuit):
+    """
+    Stores a compiled netlist next to its file, with the file's modification time, size and content hash.
+    :param filename: path of the netlist
+    :param circuit: the CompiledCircuit parsed from it
+    :return: path of the cache file
+    """
+    c = circuit
+    loops = c.Loops
+    mtime, size = _FileKey(filename)
+    path = filename + '.npz'
+    arrays = _CircuitArrays(c)
+    subNames = list(c.Subcircuits)
+    for k, sub in enumerate(subNames):  # each subcircuit body under its own prefix
+        ports, body = c.Subcircuits[sub]
+        arrays.update(_CircuitArrays(body, f'S{k}_'), **{f'S{k}_Ports': ports})
+    with open(path, 'wb') as f:  # an open file keeps numpy from adding its own extension
+        np.savez(f, mtime=mtime, size=size, hash=_FileHash(filename), SubcircuitNames=np.array(subNames, dtype=str),
+                 LoopNames=np.array([name for name, nodes in loops], dtype=str),
+                 LoopPtr=np.cumsum([0] + [len(nodes) for name, nodes in loops]),
+                 LoopNodes=np.array([c.NodeIndex[n] for name, nodes in loops for n in nodes], dtype=np.int64),
+                 **arrays)
+    return path
+
+
+def LoadCache(filename):
+    """
+    Loads the cached compiled form of a netlist if the netlist has not changed since it was cached.  The
+    modification time and size are checked first; if they differ the contents are hashed, and a cache whose
+    hash still matches (e.g. after a touch or a fresh checkout) is reused and re-stamped.
+    :param filename: path of the netlist
+    :return: a CompiledCircuit, or None if there is no valid cache
+    """
+    path = filename + '.npz'
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as d:
+            stored = {k: d[k] for k in d.files}
+    except (OSError, ValueError):
+        return None  # unreadable cache; parse again
+    if 'SubcircuitNames' not in stored:
+        return None  # written by an older version
+    mtime, size = _FileKey(filename)
+    fresh = int(stored['mtime']) == mtime and int(stored['size']) == size
+    if not fresh and (int(stored['size']) != size or str(stored['hash']) != _FileHash(filename)):
+        return None
+    s = stored
+    circuit = _CircuitFromArrays(s)
+    circuit.Subcircuits = {sub: (s[f'S{k}_Ports'], _CircuitFromArrays(s, f'S{k}_'))
+                           for k, sub in enumerate(s['SubcircuitNames'].tolist())}
+    names = circuit.NodeNames
+    ptr, loopNodes = s['LoopPtr'].tolist(), s['LoopNodes'].tolist()
+    circuit.Loops = [(name, [names[n] for n in loopNodes[ptr[k]:ptr[k + 1]]])
+                     for k, name in enumerate(s['LoopNames'].tolist())]
+    if not fresh:
+        SaveCache(filename, circuit)
+    return circuit
+#endregion
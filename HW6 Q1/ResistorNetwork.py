@@ -1,8 +1,17 @@
 #region imports
+import numpy as np
+from scipy import sparse
 from scipy.optimize import fsolve
 from Resistor import Resistor
 from VoltageSource import VoltageSource
+from Capacitor import Capacitor
+from Inductor import Inductor
 from Loop import Loop
+from Circuit import CompiledCircuit, SplitElementName, ElementName
+from NetlistParser import ParseNetlist
+from MNASolver import MNASystem, SolveMNA
+# MonteCarlo, Reduction, LoopAnalysis, TransientAnalysis and Subcircuits are imported by the methods that use them,
+# so a script that only reads a network and solves it by fsolve or MNA does not load them
 #endregion
 
 #region class definitions
@@ -18,43 +27,102 @@ class ResistorNetwork():
         self.Loops = []  # initialize an empty list of loop objects in the network
         self.Resistors = []  # initialize an empty a list of resistor objects in the network
         self.VSources = []  # initialize an empty a list of source objects in the network
+        self.Capacitors = []  # capacitors and inductors, used by the transient analysis only
+        self.Inductors = []
+        self.ElementIndex = None  # (node, node) in either order -> (kind, index, sign), built by IndexElements
+        self.Hierarchy = None  # the netlist's CompiledCircuit if it has subcircuit instances
         #endregion
     #endregion
 
     #region methods
-    def BuildNetworkFromFile(self, filename):
+    def BuildNetworkFromFile(self, filename, cache=False):
         """
         This function reads the lines from a file and processes the file to populate the fields
-        for Loops, Resistors and Voltage Sources
+        for Loops, Resistors and Voltage Sources.  The file is read in one pass by NetlistParser.ParseNetlist,
+        which also accepts SPICE R and V cards.
         :param filename: string for file to process
+        :param cache: if True, reuse a compiled copy of the file while the file is unchanged
         :return: nothing
         """
-        FileTxt = open(filename, "r").read().split(
-            '\n')  # reads from file and then splits the string at the new line characters
-        LineNum = 0  # a counting variable to point to the line of text to be processed from FileTxt
-        # erase any previous
-        self.Resistors = []
-        self.VSources = []
-        self.Loops = []
-        LineNum = 0
-        lineTxt = ""
-        FileLength = len(FileTxt)
-        while LineNum < FileLength:
-            lineTxt = FileTxt[LineNum].lower().strip()
-            if len(lineTxt) < 1:
-                pass  # skip
-            elif lineTxt[0] == '#':
-                pass  # skips comment lines
-            elif "resistor" in lineTxt:
-                LineNum = self.MakeResistor(LineNum, FileTxt)
-            elif "source" in lineTxt:
-                LineNum = self.MakeVSource(LineNum, FileTxt)
-            elif "loop" in lineTxt:
-                LineNum = self.MakeLoop(LineNum, FileTxt)
-            LineNum += 1
-        pass
+        self.BuildNetworkFromCircuit(ParseNetlist(filename, cache))
         # print(f'Number of loops:{len(self.Loops)}')
 
+    def BuildNetworkFromCircuit(self, circuit):
+        """
+        Populates the fields for Loops, Resistors, Voltage Sources, Capacitors and Inductors from a
+        CompiledCircuit.  Elements whose names do not name their nodes (SPICE cards) are named after their
+        nodes.  Subcircuit instances are expanded into their elements (nodes 'x1.b', ...), and the hierarchical
+        circuit is kept in self.Hierarchy for AnalyzeCircuitHierarchical.
+        :param circuit: a CompiledCircuit
+        :return: nothing
+        """
+        self.Hierarchy = circuit if circuit.Instances else None
+        c = circuit
+        if circuit.Instances:
+            from Subcircuits import Flatten
+            c = Flatten(circuit)
+        names = c.NodeNames
+
+        def name(n, a, b):
+            try:
+                if SplitElementName(n) == (names[a], names[b]):
+                    return n
+            except ValueError:
+                pass
+            return ElementName(names[a], names[b])
+
+        self.Resistors = [Resistor(R, name=name(n, a, b)) for n, a, b, R in
+                          zip(c.RNames, c.RA.tolist(), c.RB.tolist(), c.R.tolist())]
+        self.VSources = [VoltageSource(V, name(n, a, b)) for n, a, b, V in
+                         zip(c.VNames, c.VA.tolist(), c.VB.tolist(), c.V.tolist())]
+        for vs, w in zip(self.VSources, c.VWaveforms):
+            vs.Waveform = w
+        self.Capacitors = [Capacitor(C, v0, name(n, a, b)) for n, a, b, C, v0 in
+                           zip(c.CNames, c.CA.tolist(), c.CB.tolist(), c.C.tolist(), c.C0.tolist())]
+        self.Inductors = [Inductor(L, i0, name(n, a, b)) for n, a, b, L, i0 in
+                          zip(c.LNames, c.LA.tolist(), c.LB.tolist(), c.L.tolist(), c.L0.tolist())]
+        self.Loops = []
+        for loopName, loopNodes in c.Loops:
+            L = Loop()
+            L.Name = loopName
+            L.Nodes = list(loopNodes)
+            self.Loops.append(L)
+        self.IndexElements()
+
+    def IndexElements(self):
+        """
+        Builds the lookup tables used while solving: every element by name and by its node pair in either
+        order, with sign +1 for the order of its name and -1 for the reverse, and every loop compiled into a
+        sparse loop x resistor matrix of signs plus the constant sum of its signed source voltages.  Traversing
+        a resistor along its name (the direction of positive current) drops its voltage I*R and traversing it
+        backwards raises it; traversing a source along its name raises the voltage by its value and traversing
+        it backwards lowers it.  BuildNetworkFromFile calls this; call it again after editing the lists by hand.
+        :return: nothing
+        """
+        self.ResistorIndex = {r.Name: n for n, r in enumerate(self.Resistors)}
+        self.ElementIndex = {}
+        for kind, elements in (('source', self.VSources), ('resistor', self.Resistors)):
+            for n, e in enumerate(elements):
+                a, b = SplitElementName(e.Name)
+                self.ElementIndex[(b, a)] = (kind, n, -1.0)  # resistors win a shared pair
+                self.ElementIndex[(a, b)] = (kind, n, 1.0)
+        rows, cols, signs = [], [], []
+        self.LoopSourceV = np.zeros(len(self.Loops))
+        for l, L in enumerate(self.Loops):
+            for n in range(len(L.Nodes)):
+                pair = (L.Nodes[n], L.Nodes[(n + 1) % len(L.Nodes)])
+                if pair not in self.ElementIndex:
+                    raise ValueError("Loop {}: no element connects nodes {} and {}".format(
+                        getattr(L, 'Name', l + 1), *pair))
+                kind, e, sign = self.ElementIndex[pair]
+                if kind == 'resistor':  # a resistor drops the voltage along its current
+                    rows.append(l)
+                    cols.append(e)
+                    signs.append(-sign)
+                else:  # a source raises it by its value along its name
+                    self.LoopSourceV[l] += sign * self.VSources[e].Voltage
+        self.LoopMatrix = sparse.csr_matrix((signs, (rows, cols)), shape=(len(self.Loops), len(self.Resistors)))
+
     def MakeResistor(self, N, Txt):
         """
         Make a resistor object from reading the text file
@@ -137,6 +205,164 @@ class ResistorNetwork():
         print("I3 = {:0.1f}".format(i[2]))
         return i
 
+    def AnalyzeCircuitMNA(self):
+        """
+        Solves any network read by BuildNetworkFromFile with modified nodal analysis: the node voltages
+        and source currents come from one sparse LU solve, so no loops, initial guess or hand-written
+        Kirchoff equations are needed.  The resistor currents are stored in self.Resistors (positive from
+        the first node of the name to the second).
+        :return: a CircuitSolution with all node voltages and element currents
+        """
+        sol = SolveMNA(CompiledCircuit.FromNetwork(self))
+        for r, i in zip(self.Resistors, sol.ResistorCurrents):
+            r.Current = i
+            r.DeltaV()
+        return sol
+
+    def AnalyzeCircuitReduced(self):
+        """
+        Like AnalyzeCircuitMNA, but first merges nodes joined by zero-ohm resistors and collapses series
+        chains and parallel groups of resistors, so netlists full of jumpers and ladders solve a much smaller
+        system.  All currents and voltages are expanded back to the original elements.  The reduction takes
+        longer than the factorization it saves (see Reduction.SolveReduced), so AnalyzeCircuitMNA is faster.
+        :return: a CircuitSolution with all node voltages and element currents
+        """
+        from Reduction import SolveReduced
+        sol = SolveReduced(CompiledCircuit.FromNetwork(self))
+        for r, i in zip(self.Resistors, sol.ResistorCurrents):
+            r.Current = i
+            r.DeltaV()
+        return sol
+
+    def AnalyzeCircuitHierarchical(self, equivalents=None):
+        """
+        Like AnalyzeCircuitMNA for a netlist with subcircuit instances, but each subcircuit definition is
+        reduced once to an equivalent at its ports and the instances are not expanded into one big system
+        (see Subcircuits.HierarchicalCircuit).  Solves the netlist as read; edits to self.Resistors are not seen.
+        :param equivalents: optional dict of reduced subcircuits shared with other networks
+        :return: a CircuitSolution of the expanded network, in the order of self.Resistors and self.VSources
+        """
+        if self.Hierarchy is None:
+            return self.AnalyzeCircuitMNA()
+        from Subcircuits import HierarchicalCircuit
+        sol = HierarchicalCircuit(self.Hierarchy, equivalents).Solve().Flat()
+        for r, i in zip(self.Resistors, sol.ResistorCurrents):
+            r.Current = i
+            r.DeltaV()
+        return sol
+
+    def AnalyzeBatch(self, SourceVoltages=None, Loads=None):
+        """
+        Solves many source voltage and load cases with one factorization of the circuit matrix; all the cases
+        go through one multi-column solve.  The Resistor objects are not changed.
+        :param SourceVoltages: array of shape (cases, number of VSources) in the order of self.VSources; the
+                               present source voltages in every case if None
+        :param Loads: optional dict of node name -> current drawn out of that node (to the reference node of
+                      its part), a number or an array with one value per case
+        :return: a CircuitSolution whose NodeVoltages, ResistorCurrents and SourceCurrents are 2D arrays with
+                 one row per case; the column order is in solution.Circuit
+        """
+        circuit = CompiledCircuit.FromNetwork(self)
+        V = None if SourceVoltages is None else np.atleast_2d(SourceVoltages)
+        L = None
+        if Loads:
+            cases = np.broadcast_shapes(*(np.shape(v) for v in Loads.values()), () if V is None else V.shape[:1])
+            L = np.zeros(cases + (circuit.NumNodes,))
+            for name, value in Loads.items():
+                L[..., circuit.NodeIndex[name]] = value
+        return MNASystem(circuit).SolveBatch(V, L)
+
+    def AnalyzeChange(self, changes, system=None):
+        """
+        Solves the network with some resistances changed, by a low-rank update of the factored circuit
+        matrix instead of a new factorization.  The Resistor objects are not changed.
+        :param changes: dict of resistor name -> new resistance (0 for a short, float('inf') for an open)
+        :param system: MNASystem of this network to reuse between calls; built if None
+        :return: a CircuitSolution
+        """
+        system = MNASystem(CompiledCircuit.FromNetwork(self)) if system is None else system
+        if self.ElementIndex is None:
+            self.IndexElements()
+        return system.Modified({self.ResistorIndex[name]: R for name, R in changes.items()})
+
+    def FaultSweep(self, names=None, Resistance=0.0):
+        """
+        Shorts (or opens, or sets to any resistance) one resistor at a time and solves each case with a
+        rank-1 update of one factorization.
+        :param names: names of the resistors to change; all resistors if None
+        :param Resistance: resistance each one is changed to (0 for a short, float('inf') for an open)
+        :return: generator of (resistor name, CircuitSolution or None if that case has no solution)
+        """
+        system = MNASystem(CompiledCircuit.FromNetwork(self))
+        if self.ElementIndex is None:
+            self.IndexElements()
+        k = None if names is None else [self.ResistorIndex[name] for name in names]
+        for n, sol in system.FaultSweep(k, Resistance):
+            yield self.Resistors[n].Name, sol
+
+    def AnalyzeMonteCarlo(self, tolerance=0.05, samples=10000, seed=0, **kwargs):
+        """
+        Monte Carlo tolerance analysis of the network: the resistances are drawn at random within the
+        tolerance, in batches, and only running statistics of the currents and voltages are kept.
+        :param tolerance: relative resistor tolerance, e.g. 0.01 for 1%
+        :param samples: number of samples
+        :param seed: random seed
+        :param kwargs: further options of MonteCarlo.MonteCarlo (distribution, batchSize, percentiles, ...)
+        :return: a MonteCarloResult with the mean, standard deviation and percentiles of each resistor
+                 current and node voltage
+        """
+        from MonteCarlo import MonteCarlo
+        return MonteCarlo(CompiledCircuit.FromNetwork(self), tolerance, samples, seed, **kwargs)
+
+    def AnalyzeTransient(self, tStop, dt, method='trap', sink=None, probes=None, currents=None, every=1):
+        """
+        Fixed-step transient analysis of the network with its capacitors, inductors and source waveforms,
+        starting from the capacitors' and inductors' initial voltages and currents.  The companion circuit
+        is factored once and every time step reuses the factors.
+        :param tStop: end time in s
+        :param dt: time step in s
+        :param method: 'trap' (trapezoidal) or 'be' (backward Euler)
+        :param sink: TransientAnalysis.ArraySink (default) or CSVSink to stream the waveforms to a file
+        :param probes: node names whose voltages are recorded; all nodes if None
+        :param currents: element names whose currents are recorded
+        :param every: record every this many steps
+        :return: the sink
+        """
+        from TransientAnalysis import Transient
+        return Transient(CompiledCircuit.FromNetwork(self), tStop, dt, method, sink, probes, currents, every)
+
+    def DiscoverLoops(self):
+        """
+        Replaces self.Loops with an independent set of loops found from the element names (a fundamental
+        cycle basis of a breadth-first spanning forest), so a file needs no <Loop> blocks.
+        :return: the LoopBasis
+        """
+        from LoopAnalysis import LoopBasis
+        basis = LoopBasis(CompiledCircuit.FromNetwork(self))
+        self.Loops = []
+        for k in range(basis.NumLoops):
+            L = Loop()
+            L.Name = 'L{}'.format(k + 1)
+            L.Nodes = basis.LoopNodes(k)
+            self.Loops.append(L)
+        self.IndexElements()
+        return basis
+
+    def AnalyzeCircuitLoops(self):
+        """
+        Branch current analysis with automatically discovered loops and automatically assigned currents:
+        one unknown current per element, one KCL equation per node and one KVL equation per loop.  Needs
+        only the <Resistor> and <Source> blocks of the file.  The resistor currents are stored in
+        self.Resistors (positive from the first node of the name to the second).
+        :return: a CircuitSolution with all node voltages and element currents
+        """
+        from LoopAnalysis import SolveBranchCurrents
+        sol = SolveBranchCurrents(CompiledCircuit.FromNetwork(self))
+        for r, i in zip(self.Resistors, sol.ResistorCurrents):
+            r.Current = i
+            r.DeltaV()
+        return sol
+
     def GetKirchoffVals(self, i):
         """
         This function uses Kirchoff Voltage and Current laws to analyze this specific circuit
@@ -145,12 +371,12 @@ class ResistorNetwork():
         :param i: a list of currents relevant to the circuit
         :return: a list of loop voltage drops and node currents
         """
-        # set current in resistors in the top loop.
-        self.GetResistorByName('ad').Current = i[0]  # I_1 in diagram
+        # set current in resistors in the top loop (a resistor's current is positive from the first node of its name).
+        self.GetResistorByName('ad').Current = -i[0]  # I_1 in diagram, flowing from d to a
         self.GetResistorByName('bc').Current = i[0]  # I_1 in diagram
         self.GetResistorByName('cd').Current = i[2]  # I_3 in diagram
         # set current in resistor in bottom loop.
-        self.GetResistorByName('ce').Current = i[1]  # I_2 in diagram
+        self.GetResistorByName('ce').Current = -i[1]  # I_2 in diagram, flowing from e to c
         # calculate net current into node c
         Node_c_Current = sum([i[0], i[1], -i[2]])
 
@@ -161,40 +387,30 @@ class ResistorNetwork():
     def GetElementDeltaV(self, name):
         """
         Need to retrieve either a resistor or a voltage source by name.
-        :param name:
-        :return:
+        :param name: element name in either node order, giving the traversal direction (e.g. 'da' for 'ad' traversed
+                     from d to a)
+        :return: voltage change across the element in the traversal direction
         """
-        for r in self.Resistors:
-            if name == r.Name:
-                return -r.DeltaV()
-            if name[::-1] == r.Name:
-                return -r.DeltaV()
-        for v in self.VSources:
-            if name == v.Name:
-                return v.Voltage
-            if name[::-1] == v.Name:
-                return v.Voltage
+        if self.ElementIndex is None:
+            self.IndexElements()
+        kind, n, sign = self.ElementIndex[SplitElementName(name)]
+        if kind == 'resistor':
+            return -sign * self.Resistors[n].DeltaV()
+        return sign * self.VSources[n].Voltage
 
     def GetLoopVoltageDrops(self):
         """
         This calculates the net voltage drop around a closed loop in a circuit based on the
-        current flowing through resistors (cause a drop in voltage regardless of direction of traversal) or
-        the value of the voltage source that have been set up as positive based on the direction of traversal.
+        current flowing through resistors (a drop when traversing along the current, a rise against it) and
+        the value of the voltage sources (a rise when traversing in the order of the source's name).
+        The loops are compiled by IndexElements, so all loops are one sparse signed sum, which is zero for every
+        loop once the currents satisfy KVL (e.g. after AnalyzeCircuitMNA).
         :return: net voltage drop for all loops in the network.
         """
-        loopVoltages=[]
-        for L in self.Loops:
-            # Traverse loops in order of nodes and add up voltage drops between nodes
-            loopDeltaV=0
-            for n in range(len(L.Nodes)):
-                if n == len(L.Nodes)-1:
-                    name = L.Nodes[0] + L.Nodes[n]
-                else:
-                    name = L.Nodes[n]+L.Nodes[n+1]
-                loopDeltaV += self.GetElementDeltaV(name)
-            loopVoltages.append(loopDeltaV)
-            #print(f"Voltages:{loopVoltages}") #debug notes
-        return loopVoltages
+        if self.ElementIndex is None:
+            self.IndexElements()
+        RI = np.fromiter((r.DeltaV() for r in self.Resistors), dtype=float, count=len(self.Resistors))
+        return list(self.LoopSourceV + self.LoopMatrix @ RI)
 
 
     def GetResistorByName(self, name):
@@ -203,9 +419,10 @@ class ResistorNetwork():
         :param name:
         :return:
         """
-        for r in self.Resistors:
-            if r.Name == name:
-                return r
+        if self.ElementIndex is None:
+            self.IndexElements()
+        n = self.ResistorIndex.get(name)
+        return None if n is None else self.Resistors[n]
     #endregion
 
 class ResistorNetwork_2(ResistorNetwork):
@@ -243,12 +460,12 @@ class ResistorNetwork_2(ResistorNetwork):
         :param i: a list of currents relevant to the circuit
         :return: a list of loop voltage drops and node currents
         """
-        # set current in resistors in the top loop
-        self.GetResistorByName('ad').Current = i[0]  # I_1 in diagram
+        # set current in resistors in the top loop (a resistor's current is positive from the first node of its name)
+        self.GetResistorByName('ad').Current = -i[0]  # I_1 in diagram, flowing from d to a
         self.GetResistorByName('bc').Current = i[0]  # I_2 in diagram
 
         # set current in resistors in the bottom loop
-        self.GetResistorByName('ce').Current = i[4]  # Current 5
+        self.GetResistorByName('ce').Current = -i[4]  # Current 5, flowing from e to c
         self.GetResistorByName('de').Current = i[3]  # Current 4
 
         # calculate current through resistor 'cd'
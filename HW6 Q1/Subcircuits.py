@@ -0,0 +1,314 @@
+#region imports
+import numpy as np
+from Circuit import CompiledCircuit, ElementName
+from MNASolver import CircuitSolution, MNASystem
+#endregion
+
+#region class definitions
+class PortEquivalent():
+    """
+    Port-level equivalent of a resistive subcircuit.  The currents into the subcircuit at its ports are
+
+        I = Y v + J
+
+    for port voltages v, where Y is the Schur complement of the subcircuit's equations on the port voltages
+    (the internal node voltages and source currents eliminated) and J the port currents with every port at
+    0 V.  Both are found from one factorization of the subcircuit with each port driven by a voltage source
+    from a common reference node: column k of Y is the source currents with port k at 1 V, the other ports at
+    0 V and the internal sources off, and J is the source currents with all ports at 0 V.  The subcircuit does
+    not connect to anything but its ports, so Y is the conductance matrix of one resistor between every pair
+    of ports (g = -Y[i, j]), and an instance stamps like those few resistors plus constant loads J.  The
+    factorization is kept to recover the inside of any number of instances from their port voltages.
+    """
+    #region constructor
+    def __init__(self, name, ports, body, equivalents):
+        """
+        :param name: subcircuit name
+        :param ports: node index of each port in the body
+        :param body: CompiledCircuit of the subcircuit
+        :param equivalents: dict of subcircuit name -> PortEquivalent for the instances inside the body
+        """
+        if len(body.C) or len(body.L):
+            raise ValueError(f"Subcircuit {name}: capacitors and inductors have no DC port equivalent; Flatten "
+                             f"the circuit instead")
+        self.Name = name
+        self.Body = body
+        self.Ports = np.asarray(ports, dtype=np.int64)
+        self.Inner, self.Loads = _Assemble(body, equivalents)
+        inner, p = self.Inner, len(self.Ports)
+        nS = len(inner.V)
+
+        # Node 0 is the reference the ports are driven from; the body's nodes follow
+        one = lambda a: np.asarray(a) + 1
+        driven = CompiledCircuit(['<reference>'] + inner.NodeNames, inner.RNames, one(inner.RA), one(inner.RB),
+                                 inner.R, inner.VNames + ['<port {}>'.format(k) for k in range(p)],
+                                 np.concatenate([one(inner.VA), np.zeros(p, dtype=np.int64)]),
+                                 np.concatenate([one(inner.VB), one(self.Ports)]), np.concatenate([inner.V, np.zeros(p)]))
+        try:
+            self.System = MNASystem(driven)
+        except ValueError:
+            raise ValueError(f"Subcircuit {name} cannot be reduced: a loop of voltage sources or zero-ohm resistors "
+                             f"joins two of its ports") from None
+        V = np.zeros((p + 1, nS + p))
+        V[np.arange(p), nS + np.arange(p)] = 1.0
+        V[p, :nS] = inner.V
+        Loads = np.zeros((p + 1, driven.NumNodes))
+        Loads[p, 1:] = self.Loads
+        I = self.System.SolveBatch(V, Loads).SourceCurrents[:, nS:]  # into each port from the reference
+        self.Y = (I[:p].T + I[:p]) / 2.0
+        self.J = I[p]
+
+        i, j = np.triu_indices(p, 1)
+        g = -self.Y[i, j]
+        keep = np.abs(g) > 1e-12 * max(np.abs(self.Y).max(initial=0.0), 1e-300)
+        self.PairA, self.PairB, self.PairR = i[keep], j[keep], 1.0 / g[keep]
+        names = [body.NodeNames[k] for k in self.Ports.tolist()]
+        self.PairNames = [ElementName(names[a], names[b]) for a, b in zip(self.PairA.tolist(), self.PairB.tolist())]
+    #endregion
+
+    #region methods
+    def Recover(self, portVoltages):
+        """
+        Solves the inside of many instances at once from their port voltages.
+        :param portVoltages: array of shape (instances, ports)
+        :return: (node voltages, resistor currents, source currents) of the body, one row per instance
+        """
+        body, inner = self.Body, self.Inner
+        portVoltages = np.atleast_2d(portVoltages)
+        V = np.concatenate([np.broadcast_to(inner.V, (len(portVoltages), len(inner.V))), portVoltages], axis=1)
+        sol = self.System.SolveBatch(V, np.concatenate([[0.0], self.Loads]))
+        # The solver grounds its own reference node, so the body's voltages are taken from '<reference>'
+        return (sol.NodeVoltages[:, 1:] - sol.NodeVoltages[:, :1], sol.ResistorCurrents[:, :len(body.R)],
+                sol.SourceCurrents[:, :len(body.V)])
+    #endregion
+
+
+class HierarchicalSolution():
+    """
+    Solution of a circuit with subcircuit instances: the top level as a CircuitSolution, and the inside of
+    every instance, named by its path ('x1' or 'x1.x2' for an instance inside x1).  Node and element names
+    inside an instance are prefixed with the path, e.g. 'x1.b' or 'x1.r1'.
+    """
+    #region constructor
+    def __init__(self, circuit, top, blocks):
+        """
+        :param circuit: the hierarchical CompiledCircuit
+        :param top: CircuitSolution of the top level
+        :param blocks: list of (subcircuit name, instance paths, node voltages, resistor currents, source
+                       currents) with one row per instance
+        """
+        self.Circuit = circuit
+        self.Top = top
+        self._Blocks = blocks
+        self._Where = {path: (b, r) for b, block in enumerate(blocks) for r, path in enumerate(block[1])}
+    #endregion
+
+    #region methods
+    def Instance(self, path):
+        """
+        :param path: instance path, e.g. 'x1' or 'x1.x2'
+        :return: CircuitSolution of the instance's subcircuit
+        """
+        b, r = self._Where[path]
+        sub, paths, volts, iR, iS = self._Blocks[b]
+        return CircuitSolution(self.Circuit.Subcircuits[sub][1], volts[r], iR[r], iS[r])
+
+    def NodeVoltage(self, name):
+        """
+        :param name: node name, with its instance path for a node inside a subcircuit
+        :return: voltage of the node
+        """
+        path, dot, node = name.rpartition('.')
+        return self.Instance(path).NodeVoltage(node) if dot and path in self._Where else self.Top.NodeVoltage(name)
+
+    def Current(self, name):
+        """
+        :param name: resistor or source name, with its instance path for an element inside a subcircuit
+        :return: current in amps
+        """
+        path, dot, element = name.rpartition('.')
+        return self.Instance(path).Current(element) if dot and path in self._Where else self.Top.Current(name)
+
+    def Flat(self):
+        """
+        :return: CircuitSolution of Flatten(circuit), with the same node and element order
+        """
+        c = self.Circuit
+        volts, iR, iS = [], [], []
+        for body, m, new, prefix in _Parts(c):
+            sol = self.Top if not prefix else self.Instance(prefix[:-1])
+            volts.append(sol.NodeVoltages[new][np.argsort(m[new])])
+            iR.append(sol.ResistorCurrents)
+            iS.append(sol.SourceCurrents)
+        return CircuitSolution(Flatten(c), np.concatenate(volts), np.concatenate(iR), np.concatenate(iS))
+    #endregion
+
+
+class HierarchicalCircuit():
+    """
+    A circuit with subcircuit instances, solved without expanding them: each subcircuit definition is reduced
+    once to its PortEquivalent (the definitions inside it first), every instance stamps its definition's
+    equivalent into the top level, and the top level is solved by modified nodal analysis.  The insides of the
+    instances are then recovered a definition at a time, all instances in one multi-column solve.  The work
+    grows with the number of instances and the size of each distinct definition, not with the total number
+    of elements.
+    """
+    #region constructor
+    def __init__(self, circuit, equivalents=None):
+        """
+        :param circuit: a CompiledCircuit with Subcircuits and Instances
+        :param equivalents: optional dict of subcircuit name -> PortEquivalent to reuse, e.g. from another
+                            circuit with the same definitions; new equivalents are added to it
+        """
+        self.Original = circuit
+        self.Equivalents = {} if equivalents is None else equivalents
+        for name, sub, nodes in circuit.Instances:
+            self.Equivalent(sub)
+        self.Circuit, self.Loads = _Assemble(circuit, self.Equivalents)
+        self.System = MNASystem(self.Circuit)
+    #endregion
+
+    #region methods
+    def Equivalent(self, sub):
+        """
+        :param sub: subcircuit name
+        :return: its PortEquivalent, reduced on first use
+        """
+        if sub not in self.Equivalents:
+            ports, body = self.Original.Subcircuits[sub]
+            for name, child, nodes in body.Instances:
+                self.Equivalent(child)
+            self.Equivalents[sub] = PortEquivalent(sub, ports, body, self.Equivalents)
+        return self.Equivalents[sub]
+
+    def Solve(self):
+        """
+        :return: a HierarchicalSolution
+        """
+        c = self.Original
+        sol = self.System.Solve(Loads=self.Loads)
+        top = CircuitSolution(c, sol.NodeVoltages, sol.ResistorCurrents[:len(c.R)], sol.SourceCurrents)
+        blocks = []
+        pending = _Group(c.Instances, sol.NodeVoltages[None, :], [''])
+        while pending:  # one level of the hierarchy at a time
+            level, pending = pending, {}
+            for sub, (paths, portVoltages) in level.items():
+                volts, iR, iS = self.Equivalents[sub].Recover(portVoltages)
+                blocks.append((sub, paths, volts, iR, iS))
+                body = c.Subcircuits[sub][1]
+                for child, (childPaths, childVoltages) in _Group(body.Instances, volts, paths).items():
+                    old = pending.get(child)
+                    pending[child] = (childPaths, childVoltages) if old is None else \
+                        (old[0] + childPaths, np.concatenate([old[1], childVoltages]))
+        return HierarchicalSolution(c, top, blocks)
+    #endregion
+#endregion
+
+#region function definitions
+def _Assemble(circuit, equivalents):
+    """
+    Replaces the subcircuit instances of a circuit by the resistors and loads of their port equivalents.
+    :param circuit: a CompiledCircuit
+    :param equivalents: dict of subcircuit name -> PortEquivalent
+    :return: (CompiledCircuit with the circuit's own resistors first, current drawn out of each node)
+    """
+    c = circuit
+    loads = np.zeros(c.NumNodes)
+    if not c.Instances:
+        return c, loads
+    RNames, RA, RB, R = list(c.RNames), [c.RA], [c.RB], [c.R]
+    groups = {}  # subcircuit name -> its instances
+    for name, sub, nodes in c.Instances:
+        groups.setdefault(sub, []).append((name, nodes))
+    for sub, instances in groups.items():
+        eq = equivalents[sub]
+        nodes = np.array([n for name, n in instances]).reshape(len(instances), len(eq.Ports))
+        RA.append(nodes[:, eq.PairA].ravel())
+        RB.append(nodes[:, eq.PairB].ravel())
+        R.append(np.tile(eq.PairR, len(instances)))
+        RNames += ['{}.{}'.format(name, pair) for name, n in instances for pair in eq.PairNames]
+        loads += np.bincount(nodes.ravel(), np.tile(eq.J, len(instances)), c.NumNodes)
+    return CompiledCircuit(c.NodeNames, RNames, np.concatenate(RA), np.concatenate(RB), np.concatenate(R),
+                           c.VNames, c.VA, c.VB, c.V, c.Loops, c.VWaveforms), loads
+
+
+def _Group(instances, volts, paths):
+    """
+    Gathers the port voltages of the instances inside a batch of solved circuits, by subcircuit.
+    :param instances: Instances of the solved circuit
+    :param volts: node voltages of each solved copy, shape (copies, nodes)
+    :param paths: instance path of each copy ('' for the top level)
+    :return: dict of subcircuit name -> (instance paths, port voltages of shape (instances, ports))
+    """
+    groups = {}
+    for name, sub, nodes in instances:
+        childPaths = [path + '.' + name if path else name for path in paths]
+        old = groups.get(sub)
+        groups[sub] = (childPaths, volts[:, nodes]) if old is None else \
+            (old[0] + childPaths, np.concatenate([old[1], volts[:, nodes]]))
+    return groups
+
+
+def _Parts(circuit):
+    """
+    Walks the instances of a hierarchical circuit depth first, the top level first.
+    :param circuit: a CompiledCircuit with Subcircuits and Instances
+    :return: generator of (circuit or subcircuit body, flat node index of each of its nodes, True for the nodes
+             that are new (not ports), name prefix); the new nodes are numbered in the order they are yielded
+    """
+    c = circuit
+    count = 0
+    stack = [(c, np.full(c.NumNodes, -1), '')]
+    while stack:
+        part, nodeMap, prefix = stack.pop()
+        new = nodeMap < 0
+        nodeMap[new] = count + np.arange(int(new.sum()))
+        count += int(new.sum())
+        yield part, nodeMap, new, prefix
+        children = []
+        for name, sub, nodes in part.Instances:
+            ports, body = c.Subcircuits[sub]
+            m = np.full(body.NumNodes, -1)
+            m[ports] = nodeMap[nodes]
+            children.append((body, m, prefix + name + '.'))
+        stack += children[::-1]
+
+
+def Flatten(circuit):
+    """
+    Expands every subcircuit instance into its elements.  Nodes and elements inside an instance are named
+    after the instance path, e.g. 'x1.b' and 'x1.r1'; the top level's nodes and elements come first.
+    :param circuit: a CompiledCircuit with Subcircuits and Instances
+    :return: a CompiledCircuit without instances
+    """
+    c = circuit
+    if not c.Instances:
+        return c
+    names, arrays = [], {k: [] for k in ('RNames', 'RA', 'RB', 'R', 'VNames', 'VA', 'VB', 'V', 'VWaveforms', 'CNames',
+                                         'CA', 'CB', 'C', 'C0', 'LNames', 'LA', 'LB', 'L', 'L0')}
+    for part, m, new, prefix in _Parts(c):
+        order = np.flatnonzero(new)
+        names += [prefix + part.NodeNames[k] for k in order[np.argsort(m[order])].tolist()]
+        for kind in 'RVCL':
+            arrays[kind + 'Names'] += [prefix + n for n in getattr(part, kind + 'Names')]
+            arrays[kind + 'A'].append(m[getattr(part, kind + 'A')])
+            arrays[kind + 'B'].append(m[getattr(part, kind + 'B')])
+            arrays[kind].append(getattr(part, kind))
+        arrays['VWaveforms'] += part.VWaveforms
+        arrays['C0'].append(part.C0)
+        arrays['L0'].append(part.L0)
+    a = {k: v if k.endswith('Names') or k == 'VWaveforms' else np.concatenate(v) for k, v in arrays.items()}
+    return CompiledCircuit(names, a['RNames'], a['RA'], a['RB'], a['R'], a['VNames'], a['VA'], a['VB'], a['V'],
+                           c.Loops, a['VWaveforms'], a['CNames'], a['CA'], a['CB'], a['C'], a['C0'],
+                           a['LNames'], a['LA'], a['LB'], a['L'], a['L0'])
+
+
+def SolveHierarchical(circuit, equivalents=None):
+    """
+    Solves a circuit with subcircuit instances through the port equivalents of its subcircuits.
+    :param circuit: a CompiledCircuit with Subcircuits and Instances
+    :param equivalents: optional dict of reduced subcircuits to reuse (see HierarchicalCircuit)
+    :return: a HierarchicalSolution
+    """
+    return HierarchicalCircuit(circuit, equivalents).Solve()
+#endregion
@@ -0,0 +1,339 @@
+#region imports
+import csv
+import numpy as np
+from scipy import sparse
+from Circuit import CompiledCircuit
+from MNASolver import MNASystem
+from Waveform import Waveform
+#endregion
+
+#region class definitions
+class ArraySink():
+    """
+    Output sink that keeps the recorded waveforms in memory.  Sinks receive the output names once (Open),
+    then blocks of time points (Write), then Close; a sink that writes the blocks out instead of keeping
+    them (CSVSink) lets a run of any length use constant memory.
+    """
+    #region constructor
+    def __init__(self):
+        self.Names = []
+        self._Blocks = []
+    #endregion
+
+    #region methods
+    def Open(self, names):
+        """
+        :param names: name of each recorded quantity, e.g. 'V(b)' or 'I(ab)'
+        :return: nothing
+        """
+        self.Names = list(names)
+        self._Blocks = []
+
+    def Write(self, t, values):
+        """
+        :param t: times of the block, shape (points,)
+        :param values: recorded quantities, shape (points, names)
+        :return: nothing
+        """
+        self._Blocks.append((t.copy(), values.copy()))
+
+    def Close(self):
+        pass
+
+    @property
+    def Times(self):
+        return np.concatenate([t for t, v in self._Blocks]) if self._Blocks else np.zeros(0)
+
+    @property
+    def Values(self):
+        return np.concatenate([v for t, v in self._Blocks]) if self._Blocks else np.zeros((0, len(self.Names)))
+
+    def Trace(self, name):
+        """
+        :param name: a recorded quantity, e.g. 'V(b)'
+        :return: its value at every recorded time
+        """
+        return self.Values[:, self.Names.index(name)]
+    #endregion
+
+
+class CSVSink():
+    """
+    Output sink that writes each block of time points to a CSV file as it arrives (see ArraySink).
+    """
+    #region constructor
+    def __init__(self, path):
+        """
+        :param path: CSV file to write; the first row holds the column names
+        """
+        self.Path = path
+        self._File = None
+        self._Writer = None
+    #endregion
+
+    #region methods
+    def Open(self, names):
+        self._File = open(self.Path, 'w', newline='')
+        self._Writer = csv.writer(self._File)
+        self._Writer.writerow(['t'] + list(names))
+
+    def Write(self, t, values):
+        self._Writer.writerows(np.column_stack([t, values]).tolist())
+
+    def Close(self):
+        if self._File is not None:
+            self._File.close()
+            self._File = None
+    #endregion
+
+
+class TransientAnalysis():
+    """
+    Fixed-step transient analysis.  Over each step of length h every capacitor and inductor is replaced by
+    its companion model, a conductance G in parallel with a current H known from the previous step, so that
+    its current from the first node to the second is i = G * v + H:
+
+        backward Euler   capacitor  G = C/h,    H = -G v(t-h)
+                         inductor   G = h/L,    H = i(t-h)
+        trapezoidal      capacitor  G = 2C/h,   H = -G v(t-h) - i(t-h)
+                         inductor   G = h/(2L), H = i(t-h) + G v(t-h)
+
+    The conductances only depend on h, so the circuit with the companion conductances as extra resistors is
+    factored once per step size (MNASystem) and every step is one solve with the stored factors; only the
+    right-hand side (source voltages and the H currents) changes.
+    """
+    #region constructor
+    def __init__(self, circuit):
+        """
+        :param circuit: a CompiledCircuit with capacitors and/or inductors; sources with a waveform follow it
+        """
+        c = circuit
+        if np.any(c.C <= 0.0) or np.any(c.L <= 0.0):
+            raise ValueError("Capacitances and inductances must be positive")
+        self.Circuit = c
+        self.Waveforms = [(k, Waveform(w)) for k, w in enumerate(c.VWaveforms) if w]
+        self.A = np.concatenate([c.CA, c.LA])  # first node of every capacitor, then every inductor
+        self.B = np.concatenate([c.CB, c.LB])
+        self.IsCapacitor = np.arange(len(self.A)) < len(c.C)
+        self._Systems = {}  # (method, h) -> (MNASystem, G, injection matrix)
+    #endregion
+
+    #region methods
+    def SourceVoltages(self, t):
+        """
+        :param t: array of times
+        :return: voltage of every source at every time, shape (times, sources)
+        """
+        V = np.broadcast_to(self.Circuit.V, (len(t), len(self.Circuit.V))).copy()
+        for k, w in self.Waveforms:
+            V[:, k] = w.Value(t)
+        return V
+
+    def Companion(self, h, method):
+        """
+        The companion circuit for one step size, assembled and factored on first use.
+        :param h: time step in s
+        :param method: 'trap' (trapezoidal) or 'be' (backward Euler)
+        :return: (MNASystem, companion conductance of each element, sparse matrix J such that J @ H is the
+                 right-hand side of the H currents and -J' @ x the element voltages)
+        """
+        key = (method, float(h))
+        if key not in self._Systems:
+            c = self.Circuit
+            k = 2.0 if method == 'trap' else 1.0
+            G = np.concatenate([k * c.C / h, h / (k * c.L)])
+            aug = CompiledCircuit(c.NodeNames, c.RNames + c.CNames + c.LNames, np.concatenate([c.RA, self.A]),
+                                  np.concatenate([c.RB, self.B]), np.concatenate([c.R, 1.0 / G]),
+                                  c.VNames, c.VA, c.VB, c.V)
+            system = MNASystem(aug)
+            # H leaves through the first node and enters through the second: a load of +H and -H
+            pa, pb = system.Position[self.A], system.Position[self.B]
+            e = np.arange(len(G))
+            rows, cols = np.concatenate([pa, pb]), np.concatenate([e, e])
+            vals = np.concatenate([-np.ones(len(G)), np.ones(len(G))])
+            keep = rows >= 0
+            J = sparse.csr_matrix((vals[keep], (rows[keep], cols[keep])), shape=(system.Size, len(G)))
+            self._Systems[key] = (system, G, J)
+        return self._Systems[key]
+
+    def InitialState(self):
+        """
+        Consistent state at t = 0: the circuit is solved with every capacitor as a voltage source at its
+        initial voltage and every inductor as a current source at its initial current, which gives the
+        capacitor currents and inductor voltages the trapezoidal rule needs.
+        :return: (element voltages, element currents, True if the solve succeeded); on failure (e.g. a
+                 capacitor across a voltage source) the unknown currents and voltages are zero
+        """
+        c = self.Circuit
+        nC = len(c.C)
+        v = np.concatenate([c.C0, np.zeros(len(c.L))])
+        i = np.concatenate([np.zeros(nC), c.L0])
+        dc = CompiledCircuit(c.NodeNames, c.RNames, c.RA, c.RB, c.R, c.VNames + c.CNames,
+                             np.concatenate([c.VA, c.CA]), np.concatenate([c.VB, c.CB]),
+                             np.concatenate([self.SourceVoltages(np.zeros(1))[0], -c.C0]))
+        loads = np.bincount(c.LA, c.L0, c.NumNodes) - np.bincount(c.LB, c.L0, c.NumNodes)
+        try:
+            sol = MNASystem(dc).Solve(Loads=loads)
+        except ValueError:
+            return v, i, False
+        i[:nC] = sol.SourceCurrents[len(c.V):]
+        v[nC:] = sol.NodeVoltages[c.LA] - sol.NodeVoltages[c.LB]
+        return v, i, True
+
+    def _Outputs(self, system, probes, currents):
+        """
+        :return: (names, sparse matrix taking the solution vector to the outputs, output column and element
+                 of each capacitor/inductor current output)
+        """
+        c = self.Circuit
+        aug = system.Circuit
+        probes = c.NodeNames if probes is None else list(probes)
+        currents = [] if currents is None else list(currents)
+        nV, nR = len(system.Unknown), len(c.R)
+        rows, cols, vals, reactive = [], [], [], []
+        short = {int(k): j for j, k in enumerate(system.Short.tolist())}
+        for m, name in enumerate(probes):
+            p = system.Position[c.NodeIndex[name]]
+            if p >= 0:
+                rows.append(m)
+                cols.append(p)
+                vals.append(1.0)
+        for m, name in enumerate(currents, len(probes)):
+            if name in c.RNames:
+                k = c.RNames.index(name)
+                if k in short:
+                    rows.append(m)
+                    cols.append(nV + len(c.V) + short[k])
+                    vals.append(1.0)
+                    continue
+                for node, sign in ((c.RA[k], 1.0), (c.RB[k], -1.0)):
+                    if system.Position[node] >= 0:
+                        rows.append(m)
+                        cols.append(system.Position[node])
+                        vals.append(sign / c.R[k])
+            elif name in c.VNames:
+                rows.append(m)
+                cols.append(nV + c.VNames.index(name))
+                vals.append(1.0)
+            elif name in aug.RNames[nR:]:
+                reactive.append((m, aug.RNames.index(name, nR) - nR))
+            else:
+                raise ValueError(f"unknown element '{name}'")
+        names = ['V({})'.format(n) for n in probes] + ['I({})'.format(n) for n in currents]
+        O = sparse.csr_matrix((vals, (rows, cols)), shape=(len(names), system.Size))
+        return names, O, np.array(reactive, dtype=np.int64).reshape(-1, 2)
+
+    def _Stepper(self, h, method, O, denseLimit):
+        """
+        One time step of the companion circuit as a function of the source voltages and the H currents.  With
+        at most denseLimit capacitors and inductors, the solution x = Xs @ V + Z @ H is written with the unit
+        responses Xs and Z, found once with the stored factors, so a step is a few small dense products;
+        otherwise every step is a solve with the stored factors.
+        :param h: time step in s
+        :param method: 'trap' or 'be'
+        :param O: sparse matrix taking the solution vector to the outputs (see _Outputs)
+        :param denseLimit: largest number of capacitors and inductors for the unit response form
+        :return: (companion conductances, function (V, H) -> (element voltages, function returning the outputs))
+        """
+        system, G, J = self.Companion(h, method)
+        nV, nS = len(system.Unknown), len(self.Circuit.V)
+        if len(G) <= denseLimit:
+            solve = lambda M: system.LU.solve(M) if M.shape[1] else np.zeros(M.shape)
+            U = np.zeros((system.Size, nS))
+            U[nV + np.arange(nS), np.arange(nS)] = -1.0
+            Xs, Z = solve(U), solve(J.toarray())
+            Dv, K = -(J.T @ Xs), -(J.T @ Z)
+            OXs, OZ = O @ Xs, O @ Z
+
+            def step(V, H):
+                return Dv @ V + K @ H, lambda: OXs @ V + OZ @ H
+        else:
+            b = np.zeros(system.Size)
+
+            def step(V, H):
+                b[nV:nV + nS] = -V
+                x = system.LU.solve(b + J @ H)
+                return -(J.T @ x), lambda: O @ x
+        return G, step
+
+    def Run(self, tStop, dt, method='trap', sink=None, probes=None, currents=None, every=1, blockSize=1024,
+            denseLimit=256):
+        """
+        Steps the circuit from t = 0 to tStop.  Outputs are buffered a block at a time and handed to the sink,
+        so memory use does not depend on the number of steps.  If the initial state cannot be solved
+        consistently, the first step is taken with backward Euler.
+        :param tStop: end time in s
+        :param dt: time step in s
+        :param method: 'trap' (trapezoidal, default) or 'be' (backward Euler)
+        :param sink: ArraySink, CSVSink or any object with Open, Write and Close; a new ArraySink if None
+        :param probes: node names whose voltages are recorded; all nodes if None
+        :param currents: element names (resistors, sources, capacitors, inductors) whose currents are recorded
+        :param every: record every this many steps
+        :param blockSize: time points per block handed to the sink
+        :param denseLimit: largest number of capacitors and inductors for the dense step (see _Stepper)
+        :return: the sink
+        """
+        if method not in ('trap', 'be'):
+            raise ValueError(f"unknown integration method '{method}'")
+        sink = ArraySink() if sink is None else sink
+        names, O, reactive = self._Outputs(self.Companion(dt, method)[0], probes, currents)
+        G, step = self._Stepper(dt, method, O, denseLimit)
+        v, i, consistent = self.InitialState()
+        startBE = not consistent and method == 'trap'
+        gV = G * np.where(self.IsCapacitor, -1.0, 1.0 if method == 'trap' else 0.0)  # H = gV * v + coefI * i
+        coefI = np.where(self.IsCapacitor, -1.0 if method == 'trap' else 0.0, 1.0)
+        steps = int(round(tStop / dt))
+        tBuf = np.empty(blockSize)
+        vBuf = np.empty((blockSize, len(names)))
+        filled = 0
+        sink.Open(names)
+        try:
+            for start in range(0, steps + 1, blockSize):
+                t = dt * np.arange(start, min(start + blockSize, steps + 1))
+                V = self.SourceVoltages(t)
+                for j, n in enumerate(range(start, start + len(t))):
+                    if n == 0:
+                        # H that reproduces the initial state, for the t = 0 outputs; the state is kept as is
+                        record = step(V[j], i - G * v)[1]
+                    elif n == 1 and startBE:
+                        GBE, stepBE = self._Stepper(dt, 'be', O, denseLimit)
+                        H = np.where(self.IsCapacitor, -GBE * v, i)
+                        v, record = stepBE(V[j], H)
+                        i = GBE * v + H
+                    else:
+                        H = gV * v + coefI * i
+                        v, record = step(V[j], H)
+                        i = G * v + H
+                    if n % every:
+                        continue
+                    tBuf[filled] = t[j]
+                    vBuf[filled] = record()
+                    vBuf[filled, reactive[:, 0]] = i[reactive[:, 1]]
+                    filled += 1
+                    if filled == blockSize:
+                        sink.Write(tBuf, vBuf)
+                        filled = 0
+            if filled:
+                sink.Write(tBuf[:filled], vBuf[:filled])
+        finally:
+            sink.Close()
+        return sink
+    #endregion
+#endregion
+
+#region function definitions
+def Transient(circuit, tStop, dt, method='trap', sink=None, probes=None, currents=None, every=1):
+    """
+    Transient analysis of a circuit with fixed time steps (see TransientAnalysis.Run).
+    :param circuit: a CompiledCircuit
+    :param tStop: end time in s
+    :param dt: time step in s
+    :param method: 'trap' or 'be'
+    :param sink: output sink; a new ArraySink if None
+    :param probes: node names to record; all nodes if None
+    :param currents: element names whose currents are recorded
+    :param every: record every this many steps
+    :return: the sink
+    """
+    return TransientAnalysis(circuit).Run(tStop, dt, method, sink, probes, currents, every)
+#endregion
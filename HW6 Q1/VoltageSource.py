@@ -6,6 +6,7 @@ class VoltageSource:
     - Voltage (float): The voltage value.
     - Name (str): The name of the voltage source.
     - Type (str): The type of voltage source (default is "DC").
+    - Waveform (str): Time dependence for transient analysis, e.g. "sin(0 5 50)" or "pulse(0 5 1m)", or None.
     """
 
     def __init__(self, V=12.0, name='ab'):
@@ -19,3 +20,4 @@ class VoltageSource:
         self.Voltage = V  # Sets voltage value
         self.Name = name  # Sets name of the source
         self.Type = "DC"  # Default to DC source
+        self.Waveform = None  # Constant voltage in transient analysis
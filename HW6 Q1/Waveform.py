@@ -0,0 +1,59 @@
+#region imports
+import re
+import numpy as np
+from Circuit import SpiceNumber
+#endregion
+
+#region class definitions
+class Waveform():
+    """
+    Time dependent source voltage in SPICE notation:
+        sin(vo va freq [td [theta]])          vo + va*sin(2*pi*freq*(t-td))*exp(-theta*(t-td)) after td
+        pulse(v1 v2 [td [tr [tf [pw [per]]]]])  v1, rising to v2 at td over tr, falling back after pw over tf,
+                                               repeating every per
+    Values may use SPICE scale suffixes (e.g. 1k, 5m).
+    """
+    #region constructor
+    def __init__(self, text):
+        """
+        :param text: waveform text, e.g. 'sin(0 5 50)'
+        """
+        m = re.fullmatch(r'\s*(sin|pulse)\s*\((.*)\)\s*', text.lower())
+        if m is None:
+            raise ValueError(f"unknown waveform '{text}'")
+        self.Text = text.strip()
+        self.Kind = m.group(1)
+        p = [SpiceNumber(v) for v in m.group(2).replace(',', ' ').split()]
+        if self.Kind == 'sin':
+            if not 3 <= len(p) <= 5:
+                raise ValueError(f"sin waveform needs 3 to 5 values: '{text}'")
+            self.Params = p + [0.0, 0.0][len(p) - 3:]
+        else:
+            if not 2 <= len(p) <= 7:
+                raise ValueError(f"pulse waveform needs 2 to 7 values: '{text}'")
+            self.Params = p + [0.0, 0.0, 0.0, np.inf, np.inf][len(p) - 2:]
+    #endregion
+
+    #region methods
+    def Value(self, t):
+        """
+        :param t: time in s, a number or an array
+        :return: source voltage at t
+        """
+        t = np.asarray(t, dtype=float)
+        if self.Kind == 'sin':
+            vo, va, freq, td, theta = self.Params
+            s = np.maximum(t - td, 0.0)
+            return vo + va * np.sin(2.0 * np.pi * freq * s) * np.exp(-theta * s)
+        v1, v2, td, tr, tf, pw, per = self.Params
+        s = t - td
+        if np.isfinite(per):
+            s = np.where(s >= 0.0, np.mod(s, per), s)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rise = np.where(tr > 0, s / tr, 1.0)
+            fall = np.where(tf > 0, (s - tr - pw) / tf, 1.0)
+        frac = np.where(s < 0, 0.0, np.where(s < tr, rise, np.where(s < tr + pw, 1.0,
+                                                                        np.where(s < tr + pw + tf, 1.0 - fall, 0.0))))
+        return v1 + (v2 - v1) * frac
+    #endregion
+#endregion
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import os
+import sys
+import pytest
+from BatchAnalyze import FindNetlists, RunBatch, WriteCSV, main
+from ResistorNetwork import ResistorNetwork
+
+SAMPLES = ['ResistorNetwork.txt', 'ResistorNetwork_2.txt']
+
+
+@pytest.fixture
+def files(tmp_path):
+    """
+    The two sample netlists plus one that fails to parse.
+    """
+    bad = tmp_path / 'bad.txt'
+    bad.write_text("<Resistor>\nName = ab\nResistance = ten\n</Resistor>\n")
+    return [os.path.abspath(f) for f in SAMPLES] + [str(bad)]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_records_each_file(files, workers):
+    records = list(RunBatch(files, workers=workers))
+    assert [r['file'] for r in records] == files
+    assert [r['ok'] for r in records] == [True, True, False]
+    assert records[2]['error'].startswith('ValueError') and "'ten' is not a number" in records[2]['error']
+
+    for r in records[:2]:
+        net = ResistorNetwork()
+        net.BuildNetworkFromFile(r['file'])
+        sol = net.AnalyzeCircuitMNA()
+        assert r['currents'] == pytest.approx({e.Name: e.Current for e in net.Resistors}, abs=1e-9)
+        assert r['voltages'] == pytest.approx(dict(zip(sol.Circuit.NodeNames, sol.NodeVoltages)), abs=1e-9)
+        assert r['residualKCL'] < 1e-9 and r['residualKVL'] < 1e-9
+        assert set(r['profile']) == {'parse', 'assemble', 'factor', 'solve'}
+
+
+def test_write_csv(files):
+    out = io.StringIO()
+    records = list(WriteCSV(RunBatch(files, workers=1), out, profile=True))
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['file', 'quantity', 'name', 'value']
+    errors = [row for row in rows if row[1] == 'error']
+    assert len(errors) == 1 and errors[0][0] == files[2] and errors[0][3] == records[2]['error']
+    for r in records[:2]:
+        currents = {row[2]: float(row[3]) for row in rows if row[0] == r['file'] and row[1] == 'I'}
+        assert currents == pytest.approx(r['currents'])
+    assert sum(row[1] == 'seconds' for row in rows) == 3
+    assert {row[2] for row in rows if row[1] == 'time'} == {'parse', 'assemble', 'factor', 'solve'}
+
+
+def test_main_exit_code(files, tmp_path, monkeypatch):
+    output = str(tmp_path / 'out.jsonl')
+    monkeypatch.setattr(sys, 'argv', ['BatchAnalyze.py', *files[:2], '--workers', '1', '-o', output])
+    main()  # no failures, so no exit code
+    with open(output) as f:
+        assert [json.loads(line)['ok'] for line in f] == [True, True]
+
+    monkeypatch.setattr(sys, 'argv', ['BatchAnalyze.py', *files, '--workers', '1', '-o', output])
+    with pytest.raises(SystemExit) as exit:
+        main()
+    assert exit.value.code == 1
+    with open(output) as f:
+        assert sum(not json.loads(line)['ok'] for line in f) == 1
+
+
+def test_find_netlists(files, tmp_path):
+    directory = os.path.dirname(files[2])
+    assert FindNetlists([directory]) == [files[2]]
+    assert FindNetlists([os.path.join(directory, '*.txt'), 'missing.txt']) == sorted([files[2], 'missing.txt'])
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from Circuit import CompiledCircuit
+from LoopAnalysis import LoopBasis, SolveBranchCurrents
+from MNASolver import GroundNodes, SolveMNA
+from NetlistGenerators import Mesh, RandomGraph
+from ResistorNetwork import ResistorNetwork, ResistorNetwork_2
+
+NETWORKS = [(ResistorNetwork, 'ResistorNetwork.txt'), (ResistorNetwork_2, 'ResistorNetwork_2.txt')]
+
+
+def AssertIndependentLoops(c, basis):
+    E, N, P = len(c.R) + len(c.V), c.NumNodes, int(GroundNodes(c).sum())
+    assert basis.NumLoops == E - N + P
+    L = basis.Matrix.toarray()
+    assert np.linalg.matrix_rank(L) == basis.NumLoops
+    # Every loop is closed: the signed elements enter and leave each node equally often
+    incidence = sparse.coo_matrix((np.concatenate([np.ones(E), -np.ones(E)]),
+                                   (np.tile(np.arange(E), 2), np.concatenate([basis.A, basis.B]))), shape=(E, N))
+    assert not np.any(L @ incidence.toarray())
+
+
+@pytest.mark.parametrize('cls, filename', NETWORKS)
+def test_discovered_loops_on_the_sample_networks(cls, filename):
+    net = cls()
+    net.BuildNetworkFromFile(filename)
+    basis = net.DiscoverLoops()
+    AssertIndependentLoops(CompiledCircuit.FromNetwork(net), basis)
+    assert len(net.Loops) == basis.NumLoops
+
+    mna = net.AnalyzeCircuitMNA()
+    assert np.allclose(net.GetLoopVoltageDrops(), 0.0, atol=1e-9)  # KVL holds around the discovered loops
+    loops = net.AnalyzeCircuitLoops()
+    assert np.allclose(loops.ResistorCurrents, mna.ResistorCurrents, atol=1e-9)
+    assert np.allclose(loops.SourceCurrents, mna.SourceCurrents, atol=1e-9)
+    assert np.allclose(loops.NodeVoltages, mna.NodeVoltages, atol=1e-9)
+
+
+@pytest.mark.parametrize('c', [Mesh(400, seed=1), RandomGraph(400, seed=2)], ids=['mesh', 'random'])
+def test_branch_currents_match_mna(c):
+    basis = LoopBasis(c)
+    AssertIndependentLoops(c, basis)
+    sol, mna = SolveBranchCurrents(c, basis), SolveMNA(c)
+    assert np.allclose(sol.ResistorCurrents, mna.ResistorCurrents, atol=1e-9)
+    assert np.allclose(sol.NodeVoltages, mna.NodeVoltages, atol=1e-9)
+    assert max(sol.Residual()) < 1e-9
@@ -0,0 +1,141 @@
+import copy
+import numpy as np
+import pytest
+from Circuit import CompiledCircuit
+from MNASolver import GroundNodes, MNASystem, PartReferences, SolveMNA
+from NetlistGenerators import Ladder, RandomGraph
+from ResistorNetwork import ResistorNetwork, ResistorNetwork_2
+
+
+@pytest.mark.parametrize('cls, filename, names', [
+    (ResistorNetwork, 'ResistorNetwork.txt', ['ad', 'bc', 'cd', 'ce']),
+    (ResistorNetwork_2, 'ResistorNetwork_2.txt', ['ad', 'bc', 'cd', 'ce', 'de']),  # df is 0 ohm, not in the diagram
+])
+def test_mna_matches_fsolve(cls, filename, names, capsys):
+    net = cls()
+    net.BuildNetworkFromFile(filename)
+    net.AnalyzeCircuit()
+    expected = [net.GetResistorByName(name).Current for name in names]
+    sol = net.AnalyzeCircuitMNA()
+    assert np.allclose([sol.Current(name) for name in names], expected, atol=1e-6)
+    assert max(sol.Residual()) < 1e-9
+
+
+def test_one_reference_per_connected_part():
+    # Two separate parts: a source driving a-b-c, and a resistor loop d-e-f; then a lone node g
+    c = CompiledCircuit(list('abcdefg'), ['ab', 'bc', 'ac', 'de', 'ef', 'df'], [0, 1, 0, 3, 4, 3],
+                        [1, 2, 2, 4, 5, 5], [1.0, 2.0, 3.0, 1.0, 1.0, 1.0], ['ca'], [2], [0], [6.0])
+    ground = GroundNodes(c)
+    assert ground.sum() == 3
+    assert ground.tolist() == [True, False, False, True, False, False, True]  # most elements, lowest number on a tie
+    assert PartReferences(c).tolist() == [0, 0, 0, 3, 3, 3, 6]
+
+    sol = SolveMNA(c)
+    assert np.all(sol.NodeVoltages[ground] == 0.0)
+    assert np.allclose(sol.NodeVoltages[3:], 0.0) and np.allclose(sol.ResistorCurrents[3:], 0.0)
+    assert max(sol.Residual()) < 1e-9
+
+
+def test_ladder_grounds_the_common_node():
+    c = Ladder(1001)
+    assert np.flatnonzero(GroundNodes(c)).tolist() == [c.NodeIndex['g']]
+
+
+@pytest.mark.parametrize('RNames, R, VNames, VA, VB, V', [
+    ([], [], ['ab', 'ab2'], [0, 0], [1, 1], [1.0, 2.0]),  # two sources in parallel
+    (['ab'], [0.0], ['ab2'], [0], [1], [1.0]),  # a source shorted by a zero-ohm resistor
+])
+def test_singular_circuit_raises(RNames, R, VNames, VA, VB, V):
+    c = CompiledCircuit(['a', 'b'], RNames, [0] * len(R), [1] * len(R), R, VNames, VA, VB, V)
+    with pytest.raises(ValueError, match='singular; check for loops of voltage sources and zero-ohm resistors'):
+        SolveMNA(c)
+
+
+def Changed(c, k, R):
+    changed = c.R.copy()
+    changed[k] = R
+    return c.WithResistances(changed)
+
+
+def AssertSameSolution(sol, ref):
+    assert np.array_equal(sol.Circuit.R, ref.Circuit.R)
+    assert np.allclose(sol.NodeVoltages, ref.NodeVoltages, atol=1e-9)
+    assert np.allclose(sol.ResistorCurrents, ref.ResistorCurrents, atol=1e-9)
+    assert np.allclose(sol.SourceCurrents, ref.SourceCurrents, atol=1e-9)
+    assert max(sol.Residual()) < 1e-9
+
+
+def Bridges(c):
+    """
+    :return: whether opening each resistor splits off part of the circuit
+    """
+    parts = GroundNodes(c).sum()
+    return np.array([GroundNodes(Changed(c, k, np.inf)).sum() > parts for k in range(len(c.R))])
+
+
+CIRCUIT = RandomGraph(300, seed=3)
+BRIDGES = Bridges(CIRCUIT)
+
+
+@pytest.mark.parametrize('case, R', [('change', 5.0), ('short', 0.0), ('open', np.inf), ('bridge open', np.inf)])
+def test_modified_matches_a_fresh_solve(case, R):
+    c = CIRCUIT
+    k = int(np.flatnonzero(BRIDGES)[0] if case == 'bridge open' else np.flatnonzero(~BRIDGES)[0])
+    ref = SolveMNA(Changed(c, k, R))
+    AssertSameSolution(MNASystem(c).Modified({k: R}), ref)
+
+
+@pytest.mark.parametrize('R', [5.0, 0.0, np.inf])
+def test_fault_sweep_matches_fresh_solves(R):
+    c = CIRCUIT
+    if R == np.inf:
+        assert BRIDGES.any() and not BRIDGES.all()  # both kinds of open are swept
+    solutions = dict(MNASystem(c).FaultSweep(R=R, blockSize=16))
+    assert sorted(solutions) == list(range(len(c.R)))
+    for k, sol in solutions.items():
+        AssertSameSolution(sol, SolveMNA(Changed(c, k, R)))
+
+
+def test_fault_sweep_reports_loops_of_sources():
+    # Shorting ab shorts the source across it; bc and ac are in series with each other
+    c = CompiledCircuit(['a', 'b', 'c'], ['ab', 'bc', 'ac'], [0, 1, 0], [1, 2, 2], [1.0, 2.0, 3.0], ['ab'], [0], [1],
+                        [1.0])
+    solutions = dict(MNASystem(c).FaultSweep())
+    assert solutions[0] is None
+    AssertSameSolution(solutions[1], SolveMNA(Changed(c, 1, 0.0)))
+
+
+@pytest.mark.parametrize('cases', [2, 10])  # fewer and more cases than inputs (sources and loaded nodes)
+def test_batch_matches_separate_solves(cases):
+    net = ResistorNetwork_2()
+    net.BuildNetworkFromFile('ResistorNetwork_2.txt')
+    rng = np.random.default_rng(cases)
+    V = rng.uniform(-50.0, 50.0, (cases, len(net.VSources)))
+    load = rng.uniform(0.0, 2.0, cases)
+    batch = net.AnalyzeBatch(V, Loads={'c': load, 'e': 0.5})
+    c = batch.Circuit
+    assert batch.NodeVoltages.shape == (cases, c.NumNodes)
+    for k in range(cases):
+        changed = copy.copy(c)
+        changed.V = V[k]
+        loads = np.zeros(c.NumNodes)
+        loads[[c.NodeIndex['c'], c.NodeIndex['e']]] = load[k], 0.5
+        ref = MNASystem(changed).Solve(Loads=loads)
+        assert np.allclose(batch.NodeVoltages[k], ref.NodeVoltages, atol=1e-9)
+        assert np.allclose(batch.ResistorCurrents[k], ref.ResistorCurrents, atol=1e-9)
+        assert np.allclose(batch.SourceCurrents[k], ref.SourceCurrents, atol=1e-9)
+        if k == 0:
+            assert not np.allclose(ref.ResistorCurrents, SolveMNA(changed).ResistorCurrents)  # the loads matter
+    assert net.AnalyzeBatch().ResistorCurrents.shape == (1, len(c.R))
+
+
+def test_batch_source_voltages_match_solve_mna():
+    c = RandomGraph(300, seed=4)
+    V = np.random.default_rng(0).uniform(1.0, 20.0, (5, len(c.V)))
+    batch = MNASystem(c).SolveBatch(V)
+    for k in range(len(V)):
+        changed = copy.copy(c)
+        changed.V = V[k]
+        ref = SolveMNA(changed)
+        assert np.allclose(batch.NodeVoltages[k], ref.NodeVoltages, atol=1e-9)
+        assert np.allclose(batch.ResistorCurrents[k], ref.ResistorCurrents, atol=1e-9)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from Circuit import CompiledCircuit
+from MNASolver import SolveMNA
+from MonteCarlo import MonteCarlo, RunningStats
+from ResistorNetwork import ResistorNetwork_2
+
+
+def SampleNetwork():
+    net = ResistorNetwork_2()
+    net.BuildNetworkFromFile('ResistorNetwork_2.txt')
+    return CompiledCircuit.FromNetwork(net)
+
+
+def DirectSamples(c, tolerance, samples, seed, batchSize, distribution):
+    """
+    The samples MonteCarlo draws, solved one at a time with SolveMNA.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(3)[0])
+    currents, voltages = [], []
+    for start in range(0, samples, batchSize):
+        m = min(batchSize, samples - start)
+        if distribution == 'normal':
+            scale = 1.0 + rng.standard_normal((m, len(c.R))) * (tolerance / 3.0)
+        else:
+            scale = 1.0 + rng.uniform(-tolerance, tolerance, (m, len(c.R)))
+        for R in c.R * scale:
+            sol = SolveMNA(c.WithResistances(R))
+            currents.append(sol.ResistorCurrents)
+            voltages.append(sol.NodeVoltages)
+    return np.array(currents), np.array(voltages)
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'normal'])
+def test_statistics_match_numpy(distribution):
+    c = SampleNetwork()
+    result = MonteCarlo(c, 0.1, 300, seed=7, distribution=distribution, batchSize=64)
+    currents, voltages = DirectSamples(c, 0.1, 300, 7, 64, distribution)
+    assert result.Samples == 300
+    assert np.allclose(result.CurrentMean, currents.mean(axis=0), atol=1e-10)
+    assert np.allclose(result.CurrentStd, currents.std(axis=0, ddof=1), atol=1e-10)
+    assert np.allclose(result.VoltageMean, voltages.mean(axis=0), atol=1e-10)
+    assert np.allclose(result.VoltageStd, voltages.std(axis=0, ddof=1), atol=1e-10)
+    for q in result.PercentileLevels:  # every sample fits in the reservoir
+        assert np.allclose(result.CurrentPercentiles[q], np.percentile(currents, q, axis=0), atol=1e-10)
+
+
+def test_dense_and_sparse_paths_agree():
+    c = SampleNetwork()
+    dense = MonteCarlo(c, 0.05, 500, seed=3, batchSize=100, reservoir=50)
+    for workers in (None, 2):
+        sparse = MonteCarlo(c, 0.05, 500, seed=3, batchSize=100, reservoir=50, denseLimit=0, workers=workers)
+        for a, b in ((dense.CurrentMean, sparse.CurrentMean), (dense.CurrentStd, sparse.CurrentStd),
+                     (dense.VoltageMean, sparse.VoltageMean), (dense.VoltageStd, sparse.VoltageStd)):
+            assert np.allclose(a, b, atol=1e-10)
+        for q in dense.PercentileLevels:
+            assert np.allclose(dense.CurrentPercentiles[q], sparse.CurrentPercentiles[q], atol=1e-10)
+
+
+def test_running_stats_reservoir_keeps_a_subset_of_the_rows():
+    data = np.random.default_rng(0).normal(size=(1000, 3))
+    stats = RunningStats(3, reservoir=100, rng=np.random.default_rng(1))
+    for batch in np.array_split(data, 7):
+        stats.Add(batch)
+    assert stats.Count == 1000
+    assert np.allclose(stats.Mean, data.mean(axis=0)) and np.allclose(stats.Std, data.std(axis=0, ddof=1))
+    kept = {tuple(row) for row in stats.Reservoir}
+    assert len(kept) == 100 and kept <= {tuple(row) for row in data}
+    assert kept & {tuple(row) for row in data[500:]}  # later batches replace rows too
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from Circuit import CompiledCircuit
+from MNASolver import SolveMNA
+from NetlistGenerators import GENERATORS, WriteNetlist
+from ResistorNetwork import ResistorNetwork
+
+
+@pytest.mark.parametrize('gen', list(GENERATORS))
+def test_written_netlist_reads_back(gen, tmp_path):
+    c = GENERATORS[gen](300, seed=4)
+    filename = str(tmp_path / f'{gen}.txt')
+    WriteNetlist(c, filename, comment=f'{gen} test circuit')
+
+    net = ResistorNetwork()
+    net.BuildNetworkFromFile(filename)
+    read = CompiledCircuit.FromNetwork(net)
+    assert sorted(read.NodeNames) == sorted(c.NodeNames)
+    assert read.RNames == c.RNames and np.array_equal(read.R, c.R)
+    assert read.VNames == c.VNames and np.array_equal(read.V, c.V)
+    assert len(net.Loops) == len(c.Loops)
+
+    expected, sol = SolveMNA(c), net.AnalyzeCircuitMNA()
+    # The reader numbers the nodes differently and may ground another node, so compare by name against g
+    order = [read.NodeNames.index(n) for n in c.NodeNames]
+    assert np.allclose(sol.NodeVoltages[order] - sol.NodeVoltage('g'),
+                       expected.NodeVoltages - expected.NodeVoltage('g'), atol=1e-9)
+    assert np.allclose(sol.ResistorCurrents, expected.ResistorCurrents, atol=1e-9)
+    assert np.allclose(sol.SourceCurrents, expected.SourceCurrents, atol=1e-9)
+    assert np.allclose(net.GetLoopVoltageDrops(), 0.0, atol=1e-9)  # the written loops are closed
@@ -0,0 +1,83 @@
+import os
+import re
+import numpy as np
+import pytest
+import NetlistParser
+from NetlistParser import ParseNetlist
+
+SPICE = """* RC divider with a subcircuit
+V1 in 0 DC 10
+R1 in mid 4.7k
+C1 mid 0 2u IC=1.5
+L1 mid out 1m IC=0.1
+Vs out 0 SIN(0 1 50)
+X1 out 0 half
+.subckt half p q
+Ra p m 1k
+Rb m q 1k
+.ends
+.end
+"""
+
+
+def Write(tmp_path, text, name='net.cir'):
+    filename = tmp_path / name
+    filename.write_text(text)
+    return str(filename)
+
+
+def test_spice_cards(tmp_path):
+    c = ParseNetlist(Write(tmp_path, SPICE))
+    assert c.NodeNames == ['0', 'in', 'mid', 'out']
+    assert c.RNames == ['r1'] and c.R.tolist() == [4700.0]
+    # A SPICE source raises node+ above node-, so it is stored from node- to node+
+    assert c.VNames == ['v1', 'vs'] and c.VA.tolist() == [0, 0] and c.VB.tolist() == [1, 3]
+    assert c.V.tolist() == [10.0, 0.0] and c.VWaveforms == [None, 'sin(0 1 50)']
+    assert c.CNames == ['c1'] and c.C.tolist() == [2e-6] and c.C0.tolist() == [1.5]
+    assert c.LNames == ['l1'] and c.L.tolist() == [1e-3] and c.L0.tolist() == [0.1]
+    assert [(name, sub, list(nodes)) for name, sub, nodes in c.Instances] == [('x1', 'half', [3, 0])]
+    ports, body = c.Subcircuits['half']
+    assert [body.NodeNames[p] for p in ports] == ['p', 'q'] and body.R.tolist() == [1000.0, 1000.0]
+
+
+@pytest.mark.parametrize('line, message', [
+    ('R2 in\n', "line 3: too few fields in element card 'r2 in'"),
+    ('R2 in mid k47\n', "line 3: 'k47' is not a number"),
+    ('Q1 in mid out\n', "line 3: unrecognized line 'q1 in mid out'"),
+    ('X2 in mid nothing\n', "line 3: instance x2 of undefined subcircuit 'nothing'"),
+    ('</Resistor>\n', "line 3: closing tag </resistor> without an opening tag"),
+])
+def test_errors_give_the_line(tmp_path, line, message):
+    lines = SPICE.splitlines(True)
+    filename = Write(tmp_path, ''.join(lines[:2] + [line] + lines[2:]))
+    with pytest.raises(ValueError, match='^' + re.escape(f'{filename}, {message}')):
+        ParseNetlist(filename)
+
+
+def test_cache_is_rebuilt_when_the_file_changes(tmp_path, monkeypatch):
+    filename = Write(tmp_path, SPICE)
+    parses = []
+    parse = NetlistParser._ParseNetlist
+    monkeypatch.setattr(NetlistParser, '_ParseNetlist', lambda f: parses.append(f) or parse(f))
+
+    first = ParseNetlist(filename, cache=True)
+    assert os.path.exists(filename + '.npz') and len(parses) == 1
+    cached = ParseNetlist(filename, cache=True)
+    assert len(parses) == 1
+    assert cached.NodeNames == first.NodeNames and np.array_equal(cached.R, first.R)
+    assert cached.VWaveforms == first.VWaveforms and list(cached.Subcircuits) == ['half']
+
+    # A new modification time alone: the contents hash still matches, so the cache is reused
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert ParseNetlist(filename, cache=True).R.tolist() == [4700.0] and len(parses) == 1
+
+    # Same size, different contents
+    Write(tmp_path, SPICE.replace('4.7k', '5.6k'))
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10 ** 9))
+    assert ParseNetlist(filename, cache=True).R.tolist() == [5600.0] and len(parses) == 2
+
+    # Different size
+    Write(tmp_path, SPICE.replace('4.7k', '10k'))
+    assert ParseNetlist(filename, cache=True).R.tolist() == [10000.0] and len(parses) == 3
+    assert ParseNetlist(filename, cache=True).R.tolist() == [10000.0] and len(parses) == 3
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from ResistorNetwork import ResistorNetwork, ResistorNetwork_2
+
+NETWORKS = [(ResistorNetwork, 'ResistorNetwork.txt'), (ResistorNetwork_2, 'ResistorNetwork_2.txt')]
+
+
+def Build(cls, filename):
+    net = cls()
+    net.BuildNetworkFromFile(filename)
+    return net
+
+
+@pytest.mark.parametrize('cls, filename', NETWORKS)
+def test_loop_residual_is_zero_after_mna(cls, filename):
+    net = Build(cls, filename)
+    net.AnalyzeCircuitMNA()
+    assert np.allclose(net.GetLoopVoltageDrops(), 0.0, atol=1e-9)
+
+
+def test_element_delta_v_depends_on_traversal_direction():
+    net = Build(ResistorNetwork, 'ResistorNetwork.txt')
+    net.AnalyzeCircuitMNA()
+    ad = net.GetResistorByName('ad')
+    assert net.GetElementDeltaV('ad') == pytest.approx(-ad.Current * ad.Resistance)
+    assert net.GetElementDeltaV('da') == pytest.approx(ad.Current * ad.Resistance)
+    assert net.GetElementDeltaV('ab') == 16.0
+    assert net.GetElementDeltaV('ba') == -16.0
+
+
+def test_loop_signs_follow_element_names():
+    net = Build(ResistorNetwork, 'ResistorNetwork.txt')
+    names = [r.Name for r in net.Resistors]
+    L1 = dict(zip(names, net.LoopMatrix.toarray()[0]))
+    assert L1 == {'ad': 1.0, 'bc': -1.0, 'cd': -1.0, 'ce': 0.0}  # a,b,c,d traverses ad from d to a
+    assert net.LoopSourceV.tolist() == [16.0, 32.0]
+
+
+@pytest.mark.parametrize('cls, filename, expected', [
+    (ResistorNetwork, 'ResistorNetwork.txt', [2.0, 6.0, 8.0]),
+    (ResistorNetwork_2, 'ResistorNetwork_2.txt', [14 / 3, -14 / 15, -8 / 3, 6.4, -22 / 3]),
+])
+def test_fsolve_diagram_currents(cls, filename, expected, capsys):
+    net = Build(cls, filename)
+    assert np.allclose(net.AnalyzeCircuit(), expected, atol=1e-6)
+    assert np.allclose(net.GetLoopVoltageDrops(), 0.0, atol=1e-6)
+
+
+@pytest.mark.parametrize('cls, filename', NETWORKS)
+def test_reduced_matches_mna_with_the_same_reference(cls, filename):
+    net = Build(cls, filename)
+    mna = net.AnalyzeCircuitMNA()
+    reduced = net.AnalyzeCircuitReduced()
+    assert np.allclose(reduced.NodeVoltages, mna.NodeVoltages, atol=1e-9)
+    assert np.allclose(reduced.ResistorCurrents, mna.ResistorCurrents, atol=1e-9)
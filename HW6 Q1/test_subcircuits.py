@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from MNASolver import SolveMNA
+from NetlistParser import ParseNetlist
+from ResistorNetwork import ResistorNetwork
+from Subcircuits import Flatten, HierarchicalCircuit
+
+# Two levels of subcircuits, instances sharing a definition, and a source inside a subcircuit
+NETLIST = """* two-level hierarchy
+.subckt div in out gnd
+R1 in mid 10
+R2 mid out 20
+R3 mid gnd 30
+Vb mid tap 2
+Rt tap gnd 15
+.ends
+.subckt pair a b g
+X1 a m g div
+X2 m b g div
+R9 m g 40
+.ends
+V1 0 1 12
+X1 1 2 0 pair
+X2 2 3 0 div
+X3 3 0 0 div
+R5 3 0 50
+R6 1 3 100
+"""
+
+
+@pytest.fixture
+def netlist(tmp_path):
+    filename = tmp_path / 'sub.cir'
+    filename.write_text(NETLIST)
+    return str(filename)
+
+
+def test_hierarchical_matches_mna_on_the_flat_circuit(netlist):
+    c = ParseNetlist(netlist)
+    flat = SolveMNA(Flatten(c))
+    sol = HierarchicalCircuit(c).Solve()
+    expanded = sol.Flat()
+    assert expanded.Circuit.NodeNames == flat.Circuit.NodeNames
+    assert np.allclose(expanded.NodeVoltages, flat.NodeVoltages, atol=1e-9)
+    assert np.allclose(expanded.ResistorCurrents, flat.ResistorCurrents, atol=1e-9)
+    assert np.allclose(expanded.SourceCurrents, flat.SourceCurrents, atol=1e-9)
+    assert max(expanded.Residual()) < 1e-9
+
+    # Lookups by name, inside nested instances too
+    for name in ('x1.x1.mid', 'x1.x2.tap', 'x1.m', 'x3.mid', '3'):
+        assert sol.NodeVoltage(name) == pytest.approx(flat.NodeVoltage(name), abs=1e-9)
+    for name in ('x1.x2.r2', 'x1.r9', 'x2.vb', 'r6', 'v1'):
+        assert sol.Current(name) == pytest.approx(flat.Current(name), abs=1e-9)
+
+
+def test_resistor_network_hierarchical(netlist):
+    net = ResistorNetwork()
+    net.BuildNetworkFromFile(netlist)
+    flat = net.AnalyzeCircuitMNA()
+    sol = net.AnalyzeCircuitHierarchical()
+    for name in flat.Circuit.NodeNames:  # the two number the nodes differently
+        assert sol.NodeVoltage(name) == pytest.approx(flat.NodeVoltage(name), abs=1e-9)
+    assert np.allclose([r.Current for r in net.Resistors], flat.ResistorCurrents, atol=1e-9)
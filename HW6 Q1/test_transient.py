@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from Circuit import CompiledCircuit
+from TransientAnalysis import CSVSink, Transient, TransientAnalysis
+
+
+def RC():
+    """
+    1 V step through 1 kohm into 1 uF (tau = 1 ms), the capacitor starting at 0 V.
+    """
+    return CompiledCircuit(['0', 'in', 'out'], ['in-out'], [1], [2], [1000.0], ['v'], [0], [1], [1.0],
+                           CNames=['c'], CA=[2], CB=[0], C=[1e-6], C0=[0.0])
+
+
+def RL():
+    """
+    1 V step through 10 ohm into 10 mH (tau = 1 ms), the inductor starting at 0 A.
+    """
+    return CompiledCircuit(['0', 'in', 'out'], ['in-out'], [1], [2], [10.0], ['v'], [0], [1], [1.0],
+                           LNames=['l'], LA=[2], LB=[0], L=[1e-2], L0=[0.0])
+
+
+@pytest.mark.parametrize('method, tol', [('trap', 1.5e-5), ('be', 5e-3)])
+def test_rc_step_response(method, tol):
+    sink = Transient(RC(), 5e-3, 1e-5, method, probes=['out'])
+    t = sink.Times
+    assert len(t) == 501 and t[-1] == pytest.approx(5e-3)
+    assert np.abs(sink.Trace('V(out)') - (1.0 - np.exp(-t / 1e-3))).max() < tol
+
+
+def test_rl_step_response():
+    sink = Transient(RL(), 5e-3, 1e-5, probes=['out'], currents=['l'])
+    t = sink.Times
+    assert np.abs(sink.Trace('I(l)') - 0.1 * (1.0 - np.exp(-t / 1e-3))).max() < 1.5e-6
+    assert np.abs(sink.Trace('V(out)') - np.exp(-t / 1e-3)).max() < 1.5e-5
+
+
+def test_dense_and_sparse_steps_agree(tmp_path):
+    # Series RLC driven by a sine, with initial charge and current
+    c = CompiledCircuit(['0', 'a', 'b', 'c'], ['a-b'], [1], [2], [20.0], ['v'], [0], [1], [0.0],
+                        VWaveforms=['sin(0 5 1k)'], CNames=['c'], CA=[3], CB=[0], C=[1e-6], C0=[2.0],
+                        LNames=['l'], LA=[2], LB=[3], L=[1e-3], L0=[0.01])
+    analysis = TransientAnalysis(c)
+    dense = analysis.Run(2e-3, 1e-6, currents=['l', 'c'], blockSize=300)
+    sparse = analysis.Run(2e-3, 1e-6, currents=['l', 'c'], blockSize=300, denseLimit=0)
+    assert dense.Names == sparse.Names
+    assert np.allclose(dense.Values, sparse.Values, rtol=0.0, atol=1e-10)
+    assert dense.Trace('V(c)')[0] == pytest.approx(2.0) and dense.Trace('I(l)')[0] == pytest.approx(0.01)
+
+    path = str(tmp_path / 'rlc.csv')
+    analysis.Run(2e-3, 1e-6, sink=CSVSink(path), currents=['l', 'c'], every=10)
+    data = np.loadtxt(path, delimiter=',', skiprows=1)
+    assert np.allclose(data[:, 1:], dense.Values[::10], atol=1e-9)
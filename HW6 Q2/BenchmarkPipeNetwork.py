@@ -0,0 +1,111 @@
+import argparse
+import sys
+from BenchmarkTools import maxRssMB, timePhase, compare, saveResults, loadResults
+from FrictionFactor import FrictionFactorTable
+from PipeNetwork import PipeNetwork
+from HeadSolver import solveHeads, solveComponents
+from NetworkGenerators import GENERATORS, toPipes
+
+
+def runBenchmarks(generators, sizes, repeat=1, trace=False, objectLimit=5000, loopSolverLimit=300):
+    """
+    Runs every phase for every generator and size.
+
+    :param generators: Names of the generators in NetworkGenerators.GENERATORS.
+    :param sizes: Approximate pipe counts.
+    :param repeat: Runs per phase (fastest reported).
+    :param trace: Record tracemalloc peaks per phase.
+    :param objectLimit: Largest network for the object phases (buildNodes scans every pipe for every node, so
+                        it is quadratic; buildLoops is a breadth-first search).
+    :param loopSolverLimit: Largest network for findFlowRates (fsolve uses a dense Jacobian).
+    :return: List of result records.
+    """
+    table = FrictionFactorTable()
+    frictions = {'colebrook': None, 'table': table}
+    records = []
+
+    def record(gen, net, phase, solver, friction, seconds, peak, **extra):
+        rec = dict(generator=gen, pipes=int(net.nPipes), nodes=int(net.nNodes), phase=phase, solver=solver,
+                   friction=friction, seconds=seconds, peakMB=peak, maxRssMB=maxRssMB(), **extra)
+        records.append(rec)
+        failed = ' (not converged)' if extra.get('converged') is False else ''
+        print(f"{gen:>10} {net.nPipes:>8} {phase:>10} {solver:>12} {friction:>9} {seconds:10.4f} s{failed}", flush=True)
+
+    for gen in generators:
+        for size in sizes:
+            t, net, peak = timePhase(lambda: GENERATORS[gen](size), 1, trace)
+            record(gen, net, 'generate', '-', '-', t, peak)
+
+            if net.nPipes <= objectLimit:
+                pipes = toPipes(net)
+
+                def build():
+                    PN = PipeNetwork(list(pipes))
+                    PN.buildNodes()
+                    return PN
+
+                t, PN, peak = timePhase(build, repeat, trace)
+                record(gen, net, 'buildNodes', '-', '-', t, peak)
+                flows = dict(zip(net.nodeNames, net.extFlow))
+                for n in PN.nodes:
+                    n.extFlow = flows[n.name]
+
+                def loops():
+                    PN.loops = []
+                    PN.buildLoops()
+                    return len(PN.loops)
+
+                t, nLoops, peak = timePhase(loops, repeat, trace)
+                record(gen, net, 'buildLoops', '-', '-', t, peak, loops=nLoops)
+
+                if net.nPipes <= loopSolverLimit:
+                    for fname, tab in frictions.items():
+                        PN.setFrictionModel(tab)
+                        t, (FR, rep), peak = timePhase(lambda: PN.findFlowRates(fullOutput=True), repeat, trace)
+                        record(gen, net, 'solve', 'fsolve', fname, t, peak,
+                               residualEvaluations=rep.residualEvaluations, converged=bool(rep.converged))
+
+            for fname, tab in frictions.items():
+                t, sol, peak = timePhase(lambda: solveHeads(net, tab), repeat, trace)
+                record(gen, net, 'solve', 'heads', fname, t, peak, iterations=sol.iterations,
+                       converged=bool(sol.converged))
+                t, sol, peak = timePhase(lambda: solveComponents(net, tab), repeat, trace)
+                record(gen, net, 'solve', 'components', fname, t, peak, iterations=sol.iterations,
+                       converged=bool(sol.converged))
+    return records
+
+
+def main():
+    """
+    Benchmarks building and solving synthetic pipe networks and records the results as JSON.
+    Use --compare with a previous result file to fail (exit code 1) on timing regressions.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--generators', nargs='+', default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=1, help='runs per phase, fastest reported')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks per phase')
+    parser.add_argument('--object-limit', type=int, default=5000, help='largest network for buildNodes/buildLoops')
+    parser.add_argument('--loop-solver-limit', type=int, default=300, help='largest network for findFlowRates')
+    parser.add_argument('--output', default='bench_pipe_network.json')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio')
+    args = parser.parse_args()
+
+    records = runBenchmarks(args.generators, args.sizes, args.repeat, args.trace_memory, args.object_limit,
+                            args.loop_solver_limit)
+    saveResults(records, args.output)
+
+    if args.compare:
+        key = lambda r: (r['generator'], r['pipes'], r['phase'], r['solver'], r['friction'])
+        regressions = compare(records, loadResults(args.compare), args.threshold, key)
+        for r, b, ratio in regressions:
+            print(f"Regression: {r['generator']} {r['pipes']} {r['phase']} {r['solver']} {r['friction']}: "
+                  f"{b:.4f} s -> {r['seconds']:.4f} s ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold}x')
+
+
+if __name__ == "__main__":
+    main()
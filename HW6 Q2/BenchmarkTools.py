@@ -0,0 +1,96 @@
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import scipy
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module
+    resource = None
+
+_tracedPeakMB = None  # Largest tracemalloc peak of the phases timed so far, for maxRssMB without resource
+
+
+def maxRssMB():
+    """
+    Process memory high-water mark in MB.  Where the resource module is missing (Windows), the largest
+    tracemalloc peak of the phases timed with trace=True is reported instead, or None if none was traced.
+    """
+    if resource is None:
+        return _tracedPeakMB
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if sys.platform == 'darwin' else rss / 1e3  # Bytes on macOS, kB elsewhere
+
+
+def timePhase(fn, repeat=1, trace=False):
+    """
+    Times a benchmark phase.
+
+    :param fn: Function to run; it is called once per repeat.
+    :param repeat: Number of runs; the fastest one is reported.
+    :param trace: If True, also record the peak Python allocation with tracemalloc (slows the phase down).
+    :return: (best time in s, result of the last call, peak traced memory in MB or None).
+    """
+    global _tracedPeakMB
+    best, result, peak = float('inf'), None, None
+    for _ in range(repeat):
+        if trace:
+            tracemalloc.start()
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            _tracedPeakMB = max(_tracedPeakMB or 0.0, peak)
+    return best, result, peak
+
+
+def saveResults(records, filename):
+    """
+    Writes result records to a JSON file with the Python, numpy and scipy versions and the platform.
+
+    :param records: List of result records.
+    :param filename: Output file.
+    """
+    meta = dict(python=platform.python_version(), numpy=np.__version__, scipy=scipy.__version__,
+                platform=platform.platform(), time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    with open(filename, 'w') as f:
+        json.dump(dict(meta=meta, results=records), f, indent=1)
+    print(f'Results written to {filename}')
+
+
+def loadResults(filename):
+    """
+    :param filename: JSON file written by saveResults.
+    :return: Its list of result records.
+    """
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def compare(records, baseline, threshold, key, minSeconds=1e-3):
+    """
+    Compares timings against a baseline run.  Records of a solve that did not converge, in either run, are
+    skipped: their time is the time to give up, not a timing of the same work.
+
+    :param records: Result records of this run.
+    :param baseline: Result records of the baseline run.
+    :param threshold: Allowed slowdown ratio before a phase counts as a regression.
+    :param key: Function of a record giving what identifies its phase, e.g. (generator, size, phase, solver).
+    :param minSeconds: Baseline timings below this are too noisy to compare.
+    :return: List of (record, baseline seconds, ratio) for the regressions.
+    """
+    base = {key(r): r for r in baseline}
+    regressions = []
+    for r in records:
+        b = base.get(key(r))
+        if b is None or b['seconds'] < minSeconds or False in (r.get('converged'), b.get('converged')):
+            continue
+        ratio = r['seconds'] / b['seconds']
+        if ratio > threshold:
+            regressions.append((r, b['seconds'], ratio))
+    return regressions
@@ -0,0 +1,187 @@
+from array import array
+import numpy as np
+from Fluid import defaultFluid
+from Pipe import Pipe
+from Node import Node
+from PipeNetwork import PipeNetwork
+from NetworkArrays import NetworkArrays
+
+# Flow units -> L/s, and whether the unit system is SI (True) or US customary (False)
+FLOW_UNITS = {'LPS': (1.0, True), 'LPM': (1.0 / 60.0, True), 'MLD': (1e6 / 86400.0, True),
+              'CMH': (1000.0 / 3600.0, True), 'CMD': (1000.0 / 86400.0, True),
+              'CFS': (28.316846592, False), 'GPM': (0.0630901964, False), 'MGD': (43.812636, False),
+              'IMGD': (52.616782, False), 'AFD': (14.276410, False)}
+
+
+def loadInp(filename, buildObjects=False, patternStep=None, fluid=None):
+    """
+    Streams a subset of the EPANET .inp format into the compact array form, one line at a time.
+    Supported sections are [JUNCTIONS], [RESERVOIRS], [PIPES], [DEMANDS], [PATTERNS] and the
+    Units, Headloss and Pattern entries of [OPTIONS]; other sections are skipped. Only the
+    Darcy-Weisbach head loss formula is supported, and pipes must be OPEN or CLOSED (check valves
+    are rejected). Without an [OPTIONS] section the file is assumed to use LPS and D-W, the units
+    of this package. The demand patterns are kept in the patterns attribute of the result.
+
+    :param filename: Path of the .inp file.
+    :param buildObjects: If True, also build a PipeNetwork of Pipe and Node objects.
+    :param patternStep: Optional time step at which demand patterns are applied; base demands if None.
+    :param fluid: Fluid in the pipes; water by default.
+    :return: A NetworkArrays, or (NetworkArrays, PipeNetwork) if buildObjects is True.
+    """
+    fluid = defaultFluid() if fluid is None else fluid
+    nodeIndex = {}  # Node name -> index, in order of first appearance
+    firstRef = []  # Line number where each node was first referenced
+    declaredAt = {}  # Node name -> line number of its [JUNCTIONS] or [RESERVOIRS] record
+    pipeAt = {}  # Pipe name -> line number of its [PIPES] record
+    declared = bytearray()  # 1 once the node appears in [JUNCTIONS] or [RESERVOIRS]
+    elevation = array('d')
+    fixedHead = array('d')
+    demand = array('d')  # Base demand (consumption) in file units
+    demandPattern = []  # Demand pattern id of each node, or None
+    hasDemandEntry = bytearray()  # 1 once the node has an entry in [DEMANDS]
+    pipeNames, start, end = [], array('q'), array('q')
+    length, diameter, rough, closed = array('d'), array('d'), array('d'), bytearray()
+    patterns = {}
+    options = {}
+
+    def node(name, lineNum):
+        i = nodeIndex.get(name)
+        if i is None:
+            i = nodeIndex[name] = len(firstRef)
+            firstRef.append(lineNum)
+            declared.append(0)
+            elevation.append(0.0)
+            fixedHead.append(np.nan)
+            demand.append(0.0)
+            demandPattern.append(None)
+            hasDemandEntry.append(0)
+        return i
+
+    def declare(name, lineNum):
+        if name in declaredAt:
+            raise ValueError(f"{filename}, line {lineNum}: node '{name}' is already defined on line {declaredAt[name]}")
+        declaredAt[name] = lineNum
+        i = node(name, lineNum)
+        declared[i] = 1
+        return i
+
+    def number(txt, lineNum):
+        try:
+            return float(txt)
+        except ValueError:
+            raise ValueError(f"{filename}, line {lineNum}: '{txt}' is not a number") from None
+
+    section = None
+    with open(filename, 'r') as f:
+        for lineNum, line in enumerate(f, 1):
+            line = line.split(';', 1)[0].strip()  # Drop comments
+            if not line:
+                continue
+            if line[0] == '[':
+                section = line.upper()
+                if section == '[END]':
+                    break
+                continue
+            fields = line.split()
+            try:
+                if section == '[PIPES]':
+                    a, b = fields[1], fields[2]
+                    if b < a:
+                        a, b = b, a  # Same orientation as Pipe: start node is alphabetically lower
+                    if fields[0] in pipeAt:
+                        raise ValueError(f"{filename}, line {lineNum}: pipe '{fields[0]}' is already defined "
+                                         f"on line {pipeAt[fields[0]]}")
+                    status = fields[7].upper() if len(fields) > 7 else 'OPEN'
+                    if status not in ('OPEN', 'CLOSED'):
+                        raise ValueError(f"{filename}, line {lineNum}: pipe status '{fields[7]}' is not supported"
+                                         + (" (check valves are not modelled)" if status == 'CV' else ''))
+                    pipeAt[fields[0]] = lineNum
+                    pipeNames.append(fields[0])
+                    start.append(node(a, lineNum))
+                    end.append(node(b, lineNum))
+                    length.append(number(fields[3], lineNum))
+                    diameter.append(number(fields[4], lineNum))
+                    rough.append(number(fields[5], lineNum))
+                    closed.append(status == 'CLOSED')
+                elif section == '[JUNCTIONS]':
+                    i = declare(fields[0], lineNum)
+                    elevation[i] = number(fields[1], lineNum)
+                    if len(fields) > 2 and not hasDemandEntry[i]:
+                        demand[i] = number(fields[2], lineNum)
+                        demandPattern[i] = fields[3] if len(fields) > 3 else None
+                elif section == '[RESERVOIRS]':
+                    i = declare(fields[0], lineNum)
+                    fixedHead[i] = elevation[i] = number(fields[1], lineNum)
+                elif section == '[DEMANDS]':
+                    i = node(fields[0], lineNum)
+                    value = number(fields[1], lineNum)
+                    if hasDemandEntry[i]:
+                        demand[i] += value  # Further demand categories add up
+                    else:
+                        demand[i] = value  # The first entry replaces the [JUNCTIONS] demand
+                        hasDemandEntry[i] = 1
+                    if len(fields) > 2:
+                        demandPattern[i] = fields[2]
+                elif section == '[PATTERNS]':
+                    patterns.setdefault(fields[0], []).extend(number(v, lineNum) for v in fields[1:])
+                elif section == '[OPTIONS]':
+                    options[fields[0].upper()] = fields[1].upper() if len(fields) > 1 else ''
+            except IndexError:
+                raise ValueError(f"{filename}, line {lineNum}: too few fields in {section} record") from None
+
+    for name, i in nodeIndex.items():
+        if not declared[i]:
+            raise ValueError(f"{filename}, line {firstRef[i]}: node '{name}' is not a junction or reservoir")
+    units = options.get('UNITS', 'LPS')
+    if units not in FLOW_UNITS:
+        raise ValueError(f"{filename}: unsupported flow units '{units}'")
+    if options.get('HEADLOSS', 'D-W') != 'D-W':
+        raise ValueError(f"{filename}: only the D-W head loss formula is supported")
+    flowFactor, si = FLOW_UNITS[units]
+    lengthFactor = 1.0 if si else 0.3048  # m or ft
+    diameterFactor = 0.001 if si else 0.0254  # mm or in
+    roughFactor = 0.001 if si else 0.0003048  # mm or millifeet
+
+    demandArr = np.frombuffer(demand, dtype=float).copy()
+    if patternStep is not None:
+        default = options.get('PATTERN', '1')
+        mult = {pid: v[patternStep % len(v)] for pid, v in patterns.items() if v}
+        demandArr *= np.array([mult.get(p if p is not None else default, 1.0) for p in demandPattern])
+    elevArr = np.frombuffer(elevation, dtype=float) * lengthFactor
+    headArr = np.frombuffer(fixedHead, dtype=float) * lengthFactor
+
+    net = NetworkArrays(list(nodeIndex), np.frombuffer(start, dtype=np.int64), np.frombuffer(end, dtype=np.int64),
+                        np.frombuffer(length, dtype=float) * lengthFactor,
+                        np.frombuffer(diameter, dtype=float) * diameterFactor,
+                        np.frombuffer(rough, dtype=float) * roughFactor,
+                        None, None, extFlow=-demandArr * flowFactor, elevation=elevArr, fixedHead=headArr,
+                        pipeNames=pipeNames, closed=np.frombuffer(closed, dtype=bool), fluids=[fluid],
+                        fluidIndex=np.zeros(len(start), dtype=np.int64),
+                        patterns={pid: np.array(v) for pid, v in patterns.items()})
+    if not buildObjects:
+        return net
+    return net, buildPipeNetwork(net, fluid)
+
+
+def buildPipeNetwork(net, fluid=None):
+    """
+    Builds Pipe and Node objects for a NetworkArrays, in the same pipe and node order.
+
+    :param net: NetworkArrays to convert.
+    :param fluid: Fluid in all the pipes; by default each pipe gets its fluid in net.
+    :return: A PipeNetwork.
+    """
+    names = net.nodeNames
+    fluids = [net.fluids[k] for k in net.fluidIndex.tolist()] if fluid is None else [fluid] * net.nPipes
+    pipes = []
+    for i in range(net.nPipes):
+        p = Pipe(names[net.start[i]], names[net.end[i]], net.length[i], net.d[i] * 1000.0, net.rough[i], fluids[i])
+        p.closed = bool(net.closed[i])
+        pipes.append(p)
+    nodePipes = [[] for _ in names]
+    for i, p in enumerate(pipes):
+        nodePipes[net.start[i]].append(p)
+        nodePipes[net.end[i]].append(p)
+    nodes = [Node(names[i], nodePipes[i], net.extFlow[i], net.elevation[i],
+                  None if np.isnan(net.fixedHead[i]) else net.fixedHead[i]) for i in range(net.nNodes)]
+    return PipeNetwork(pipes, [], nodes, fluid if fluid is not None or not net.fluids else net.fluids[0])
@@ -1,16 +1,137 @@
+import threading
+import numpy as np
+
+
 class Fluid:
     """
     Represents a fluid with properties such as dynamic viscosity and density.
     Default values correspond to water at room temperature.
+    Fluids from a FluidRegistry are shared by every pipe that uses them, so treat them as read-only.
     """
 
-    def __init__(self, mu=0.00089, rho=1000):
+    def __init__(self, mu=0.00089, rho=1000, name=None, temperature=None):
         """
         Initializes the Fluid object with given properties.
 
         :param mu: Dynamic viscosity in Pa·s (kg/(m·s)). Default is 0.00089 for water.
         :param rho: Density in kg/m³. Default is 1000 for water.
+        :param name: Name of the property table the values come from, or None for a fluid given by its values.
+        :param temperature: Temperature in °C the values were looked up at, or None.
         """
         self.mu = mu  # Store dynamic viscosity
         self.rho = rho  # Store density
-        self.nu = self.mu / self.rho  # Compute and store kinematic viscosity (m²/s)
\ No newline at end of file
+        self.nu = self.mu / self.rho  # Compute and store kinematic viscosity (m²/s)
+        self.name = name  # Property table name, e.g. 'water'
+        self.temperature = temperature  # Temperature in °C
+
+    def key(self):
+        """
+        Identity of the fluid for interning: (name, temperature) for a tabulated fluid, else its values.
+
+        :return: A hashable tuple.
+        """
+        if self.name is not None:
+            return (self.name, float(self.temperature))
+        return (None, float(self.mu), float(self.rho))
+
+    def __repr__(self):
+        if self.name is not None:
+            return f'Fluid({self.name!r} at {self.temperature} °C: mu={self.mu:.4g}, rho={self.rho:.5g})'
+        return f'Fluid(mu={self.mu}, rho={self.rho})'
+
+
+class FluidTable:
+    """
+    Temperature-dependent properties of one fluid, tabulated at a set of temperatures.
+    Viscosity is interpolated in log(mu), which is close to linear in temperature, and density linearly.
+    """
+
+    def __init__(self, name, temperature, mu, rho):
+        """
+        :param name: Fluid name.
+        :param temperature: Increasing table temperatures in °C.
+        :param mu: Dynamic viscosity at each temperature in Pa·s.
+        :param rho: Density at each temperature in kg/m³.
+        """
+        self.name = name
+        self.temperature = np.asarray(temperature, dtype=float)
+        self.logMu = np.log(np.asarray(mu, dtype=float))
+        self.rho = np.asarray(rho, dtype=float)
+
+    def properties(self, temperature):
+        """
+        Looks up the properties for any number of temperatures at once.
+
+        :param temperature: Temperature in °C (float or array).
+        :return: (mu in Pa·s, rho in kg/m³) with the shape of temperature.
+        """
+        T = np.asarray(temperature, dtype=float)
+        lo, hi = self.temperature[0], self.temperature[-1]
+        if np.any((T < lo) | (T > hi)) or np.any(np.isnan(T)):
+            raise ValueError(f'{self.name} properties are tabulated from {lo:g} to {hi:g} °C only')
+        return np.exp(np.interp(T, self.temperature, self.logMu)), np.interp(T, self.temperature, self.rho)
+
+
+# Liquid water at atmospheric pressure
+WATER = FluidTable('water', np.arange(0.0, 101.0, 5.0),
+                   1e-3 * np.array([1.792, 1.519, 1.307, 1.138, 1.002, 0.890, 0.798, 0.719, 0.653, 0.596, 0.547,
+                                    0.504, 0.467, 0.433, 0.404, 0.378, 0.355, 0.333, 0.315, 0.297, 0.282]),
+                   [999.84, 999.97, 999.70, 999.10, 998.21, 997.05, 995.65, 994.03, 992.22, 990.21, 988.04,
+                    985.69, 983.20, 980.55, 977.76, 974.84, 971.79, 968.61, 965.31, 961.89, 958.35])
+
+
+class FluidRegistry:
+    """
+    Interns Fluid objects: every (fluid, temperature), or every set of values for a fluid given by its
+    values, maps to one shared Fluid, so thousands of pipes at a handful of temperatures hold a handful
+    of Fluid objects. Safe to use from several threads.
+    """
+
+    def __init__(self, tables=None):
+        """
+        :param tables: Dictionary of name -> FluidTable; water only by default.
+        """
+        self.tables = {WATER.name: WATER} if tables is None else dict(tables)
+        self.fluids = {}  # Fluid.key() -> the shared Fluid
+        self._lock = threading.Lock()
+
+    def intern(self, fluid):
+        """
+        :param fluid: A Fluid.
+        :return: The registry's Fluid with the same key; fluid itself the first time its key is seen.
+        """
+        with self._lock:
+            return self.fluids.setdefault(fluid.key(), fluid)
+
+    def get(self, temperature=20.0, name='water'):
+        """
+        :param temperature: Temperature in °C.
+        :param name: Name of a property table.
+        :return: The shared Fluid for name at temperature.
+        """
+        return self.lookup([temperature], name)[0][0]
+
+    def lookup(self, temperature, name='water'):
+        """
+        Shared Fluids for many temperatures at once; the table is interpolated once for all new temperatures.
+
+        :param temperature: Array of temperatures in °C, e.g. one per pipe.
+        :param name: Name of a property table.
+        :return: (list of the distinct Fluids, index of each temperature's Fluid in that list).
+        """
+        if name not in self.tables:
+            raise ValueError(f"No property table for fluid '{name}'")
+        T, index = np.unique(np.asarray(temperature, dtype=float), return_inverse=True)
+        mu, rho = self.tables[name].properties(T)
+        fluids = [self.intern(Fluid(m, r, name, t)) for t, m, r in zip(T.tolist(), mu.tolist(), rho.tolist())]
+        return fluids, index.reshape(-1)
+
+
+FLUIDS = FluidRegistry()  # Registry shared by the whole program
+
+
+def defaultFluid():
+    """
+    :return: The shared Fluid() (water with the default values), used when no fluid is given.
+    """
+    return FLUIDS.intern(Fluid())
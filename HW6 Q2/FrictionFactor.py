@@ -0,0 +1,237 @@
+import math
+import threading
+import numpy as np
+
+
+def colebrook(Re, rr, f0=0.01, tol=1e-10, maxIter=50):
+    """
+    Solves the Colebrook equation for the Darcy friction factor with Newton's method.
+    The iteration is carried out on x = 1/sqrt(f), where the equation is smooth and monotone,
+    so a good starting point (e.g. the previous friction factor of the same pipe) converges in 1-2 steps.
+
+    :param Re: Reynolds number (float or array).
+    :param rr: Relative roughness e/D (float or array).
+    :param f0: Starting friction factor (float or array).
+    :param tol: Relative convergence tolerance on 1/sqrt(f).
+    :param maxIter: Maximum number of Newton iterations.
+    :return: Friction factor array with the broadcast shape of Re and rr.
+    """
+    Re, rr = np.broadcast_arrays(np.asarray(Re, dtype=float), np.asarray(rr, dtype=float))
+    a = rr / 3.7  # Roughness term
+    b = 2.51 / Re  # Viscous term
+    x = np.broadcast_to(1.0 / np.sqrt(np.asarray(f0, dtype=float)), Re.shape).copy()
+
+    for _ in range(maxIter):
+        arg = a + b * x
+        g = x + 2.0 * np.log10(arg)  # Colebrook residual in terms of x
+        dg = 1.0 + 2.0 * b / (arg * math.log(10.0))  # Derivative of the residual
+        dx = g / dg
+        x -= dx
+        if np.all(np.abs(dx) <= tol * np.abs(x)):
+            break
+
+    return 1.0 / x ** 2
+
+
+def frictionFactors(Re, rr, table=None, stats=None, f0=None):
+    """
+    Vectorized Darcy friction factor for arrays of pipes.
+    Uses the same regimes as Pipe.FrictionFactor, except that the transitional range is the
+    deterministic mean of the laminar and turbulent values (random noise would stall a Newton solve).
+
+    :param Re: Array of Reynolds numbers.
+    :param rr: Array of relative roughness values.
+    :param table: Optional FrictionFactorTable used for the turbulent values.
+    :param stats: Optional object whose colebrookSolves counter is increased by the number of exact solves.
+    :param f0: Optional array of starting friction factors for the Colebrook solves, e.g. the previous
+               values of the same pipes; NaN entries start from the default.
+    :return: Array of friction factors.
+    """
+    Re = np.maximum(np.abs(np.asarray(Re, dtype=float)), 1e-12)  # Guard against zero flow
+    rr = np.broadcast_to(np.asarray(rr, dtype=float), Re.shape)
+    f = 64.0 / Re  # Laminar flow everywhere to start with
+
+    turb = Re > 2000
+    if np.any(turb):
+        ReT = Re[turb]
+        if table is not None:
+            fT = table.lookup(ReT, rr[turb], stats)
+        else:
+            start = 0.01 if f0 is None else np.broadcast_to(np.asarray(f0, dtype=float), Re.shape)[turb]
+            fT = colebrook(ReT, rr[turb], np.where(start > 0, start, 0.01))  # NaN compares False
+            if stats is not None:
+                stats.colebrookSolves += ReT.size
+        w = np.minimum((ReT - 2000.0) / (4000.0 - 2000.0), 1.0)  # Blend weight, 1 for turbulent flow
+        f[turb] = (1.0 - w) * (64.0 / ReT) + w * fT
+
+    return f
+
+
+def frictionSlope(Re, rr, f):
+    """
+    Logarithmic slope d(ln f)/d(ln Re) of the friction factors returned by frictionFactors,
+    used to form the exact Newton derivative of the head loss, dh/dQ = r*|Q|*(2 + slope).
+
+    :param Re: Array of Reynolds numbers.
+    :param rr: Array of relative roughness values.
+    :param f: Array of friction factors at (Re, rr).
+    :return: Array of slopes (-1 for laminar flow, between -0.25 and 0 for turbulent flow).
+    """
+    Re = np.maximum(np.abs(np.asarray(Re, dtype=float)), 1e-12)
+    rr = np.broadcast_to(np.asarray(rr, dtype=float), Re.shape)
+    slope = np.full(Re.shape, -1.0)  # Laminar: f = 64/Re
+
+    turb = Re > 2000
+    if np.any(turb):
+        ReT = Re[turb]
+        w = np.minimum((ReT - 2000.0) / (4000.0 - 2000.0), 1.0)
+        fL = 64.0 / ReT
+        fT = (f[turb] - (1.0 - w) * fL) / np.where(w > 0, w, 1.0)  # Turbulent part of the blend
+        fT = np.where(w > 0, fT, colebrook(ReT, rr[turb]))
+        x = 1.0 / np.sqrt(fT)
+        b = 2.51 / ReT
+        arg = rr[turb] / 3.7 + b * x
+        gx = 1.0 + 2.0 * b / (arg * math.log(10.0))  # d(residual)/dx
+        gRe = -2.0 * b * x / (ReT * arg * math.log(10.0))  # d(residual)/dRe
+        sT = 2.0 * ReT * gRe / (x * gx)  # d(ln fT)/d(ln Re)
+        dfdRe = (1.0 - w) * (-fL / ReT) + w * fT * sT / ReT + np.where(w < 1.0, (fT - fL) / 2000.0, 0.0)
+        slope[turb] = dfdRe * ReT / f[turb]
+
+    return slope
+
+
+class FrictionFactorTable:
+    """
+    Precomputed Colebrook friction factor surface on a log-spaced (Re, e/D) grid.
+    Turbulent friction factors are found by bilinear interpolation in (log Re, log e/D), and the grid
+    is refined at construction until the interpolation error is below the requested bound.
+    Points outside the grid fall back to an exact Colebrook solve.
+    The grid is read-only after construction and the counters are guarded by a lock, so one table
+    can be shared by solves running on several threads.
+    """
+
+    def __init__(self, tol=1e-3, ReRange=(4000.0, 1e8), rrRange=(1e-6, 0.05), pointsPerDecade=8, maxPointsPerDecade=512):
+        """
+        Builds the friction factor grid.
+
+        :param tol: Maximum relative error of the interpolated friction factor.
+        :param ReRange: (min, max) Reynolds numbers covered by the table.
+        :param rrRange: (min, max) relative roughness covered by the table.
+        :param pointsPerDecade: Initial grid density, doubled until tol is met.
+        :param maxPointsPerDecade: Upper limit on the grid density.
+        """
+        self.tol = tol  # Requested relative error bound
+        self.ReMin, self.ReMax = ReRange
+        self.rrMin, self.rrMax = rrRange
+        self.hits = 0  # Lookups served from the table
+        self.misses = 0  # Lookups outside the table (exact Colebrook solve)
+        self._lock = threading.Lock()  # Guards the counters
+
+        n = pointsPerDecade
+        while True:
+            self._buildGrid(n)
+            self.maxError = self._gridError()  # Worst relative error at the cell centres
+            if self.maxError <= tol:
+                break
+            if n >= maxPointsPerDecade:
+                raise ValueError(f"Cannot reach a friction factor error of {tol} with {n} points per decade")
+            n *= 2
+        self.pointsPerDecade = n
+
+    def _buildGrid(self, n):
+        """
+        Evaluates Colebrook on a grid with n points per decade in both directions.
+
+        :param n: Points per decade.
+        """
+        lo, hi = math.log10(self.ReMin), math.log10(self.ReMax)
+        nRe = max(int(math.ceil((hi - lo) * n)), 1) + 1
+        self.logRe = np.linspace(lo, hi, nRe)
+        lo, hi = math.log10(self.rrMin), math.log10(self.rrMax)
+        nRR = max(int(math.ceil((hi - lo) * n)), 1) + 1
+        self.logRR = np.linspace(lo, hi, nRR)
+        self.dRe = self.logRe[1] - self.logRe[0]  # Grid spacing in log10(Re)
+        self.dRR = self.logRR[1] - self.logRR[0]  # Grid spacing in log10(e/D)
+        ReGrid, rrGrid = np.meshgrid(10 ** self.logRe, 10 ** self.logRR, indexing='ij')
+        self.f = colebrook(ReGrid, rrGrid)
+
+    def _gridError(self):
+        """
+        Computes the worst relative interpolation error, which for bilinear interpolation is found
+        near the centres of the grid cells.
+
+        :return: Maximum relative error.
+        """
+        ReMid = 10 ** (0.5 * (self.logRe[:-1] + self.logRe[1:]))
+        rrMid = 10 ** (0.5 * (self.logRR[:-1] + self.logRR[1:]))
+        ReGrid, rrGrid = np.meshgrid(ReMid, rrMid, indexing='ij')
+        exact = colebrook(ReGrid, rrGrid)
+        return float(np.max(np.abs(self._interpolate(ReGrid.ravel(), rrGrid.ravel()) - exact.ravel()) / exact.ravel()))
+
+    def _interpolate(self, Re, rr):
+        """
+        Bilinear interpolation of the grid; assumes all points are inside the table.
+
+        :param Re: Array of Reynolds numbers.
+        :param rr: Array of relative roughness values.
+        :return: Array of friction factors.
+        """
+        u = (np.log10(Re) - self.logRe[0]) / self.dRe
+        v = (np.log10(rr) - self.logRR[0]) / self.dRR
+        i = np.clip(u.astype(int), 0, len(self.logRe) - 2)
+        j = np.clip(v.astype(int), 0, len(self.logRR) - 2)
+        u -= i
+        v -= j
+        f = self.f
+        return ((1 - u) * (1 - v) * f[i, j] + u * (1 - v) * f[i + 1, j]
+                + (1 - u) * v * f[i, j + 1] + u * v * f[i + 1, j + 1])
+
+    def lookup(self, Re, rr, stats=None):
+        """
+        Returns turbulent friction factors, interpolated where possible and solved exactly otherwise.
+
+        :param Re: Reynolds number (float or array).
+        :param rr: Relative roughness (float or array).
+        :param stats: Optional object whose colebrookSolves counter is increased by the number of exact solves.
+        :return: Friction factor array with the broadcast shape of Re and rr.
+        """
+        Re, rr = np.broadcast_arrays(np.asarray(Re, dtype=float), np.asarray(rr, dtype=float))
+        inside = (Re >= self.ReMin) & (Re <= self.ReMax) & (rr >= self.rrMin) & (rr <= self.rrMax)
+        f = np.empty(Re.shape)
+        f[inside] = self._interpolate(Re[inside], rr[inside])
+        outside = ~inside
+        if np.any(outside):
+            f[outside] = colebrook(Re[outside], rr[outside])
+        nHits = int(np.count_nonzero(inside))
+        with self._lock:
+            self.hits += nHits
+            self.misses += Re.size - nHits
+        if stats is not None:
+            stats.colebrookSolves += Re.size - nHits
+        return f
+
+    def hitRate(self):
+        """
+        Fraction of lookups served from the table.
+
+        :return: Hit rate between 0 and 1 (0 if the table has not been used).
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def resetCounters(self):
+        """
+        Resets the hit and miss counters.
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']  # Locks cannot be pickled (e.g. when sent to a process pool)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,312 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import spsolve
+from FrictionFactor import frictionFactors, frictionSlope
+from SolveReport import SolveReport
+
+g = 9.81  # Acceleration due to gravity (m/s²)
+
+
+class HeadSolution:
+    """
+    Result of a head-based network solve, as arrays aligned with the pipe and node indices
+    of the NetworkArrays that was solved.
+    """
+
+    def __init__(self, Q, H, f, iterations, converged, report=None, supplied=None):
+        """
+        :param Q: Flow rate in each pipe in L/s (positive from start node to end node).
+        :param H: Total head at each node in m.
+        :param f: Friction factor of each pipe at the solution.
+        :param iterations: Number of Newton iterations taken.
+        :param converged: True if the flow and head corrections fell below the tolerance.
+        :param report: SolveReport with the solver telemetry.
+        :param supplied: Boolean array, False for nodes whose external flow cannot be met (NaN heads).
+        """
+        self.Q = Q
+        self.H = H
+        self.f = f
+        self.iterations = iterations
+        self.converged = converged
+        self.report = report
+        self.supplied = np.ones(len(H), dtype=bool) if supplied is None else supplied
+
+    def pressures(self, elevation, rho):
+        """
+        Converts the nodal heads to pressures.
+
+        :param elevation: Array of node elevations in m.
+        :param rho: Fluid density in kg/m³.
+        :return: Array of nodal pressures in Pa.
+        """
+        return rho * g * (self.H - elevation)
+
+
+def pipeHeadLosses(net, Qm3, table=None, stats=None, pipes=None, f0=None):
+    """
+    Darcy-Weisbach head loss of every pipe for given flows.
+
+    :param net: NetworkArrays describing the pipes.
+    :param Qm3: Flow in each pipe in m³/s.
+    :param table: Optional FrictionFactorTable.
+    :param stats: Optional object whose colebrookSolves counter is increased by the number of exact solves.
+    :param pipes: Optional index array selecting the pipes that Qm3 refers to; all pipes by default.
+    :param f0: Optional starting friction factors for the Colebrook solves, aligned with Qm3.
+    :return: (h, dh, f) where h is the signed head loss r*Q*|Q| in m, dh its derivative dh/dQ
+             and f the friction factor.
+    """
+    sel = slice(None) if pipes is None else pipes
+    d, L, rho, mu = net.d[sel], net.length[sel], net.rho[sel], net.mu[sel]
+    A = math.pi / 4.0 * d ** 2
+    rr = net.rough[sel] / d
+    Re = rho * np.abs(Qm3) / A * d / mu
+    f = frictionFactors(Re, rr, table, stats, f0)
+    r = f * L / (d * 2 * g * A ** 2)  # h = r*Q*|Q|
+    dh = r * np.abs(Qm3) * (2.0 + frictionSlope(Re, rr, f))
+    return r * Qm3 * np.abs(Qm3), dh, f
+
+
+def componentLabels(net, pipes):
+    """
+    Labels the connected components of the network formed by a subset of its pipes.
+
+    :param net: NetworkArrays describing the network.
+    :param pipes: Index array of the pipes that connect nodes.
+    :return: (number of components, component label of each node).
+    """
+    n = net.nNodes
+    graph = sparse.csr_matrix((np.ones(len(pipes)), (net.start[pipes], net.end[pipes])), shape=(n, n))
+    return connected_components(graph, directed=False)
+
+
+def partition(net, refHead=0.0):
+    """
+    Sorts the nodes and pipes of a network for the head-based solver. Closed pipes are dropped; in
+    every connected part without a fixed head the first node is held at refHead if the part's
+    external flows balance, otherwise the part cannot be solved and its nodes are marked dead.
+
+    :param net: NetworkArrays to partition.
+    :param refHead: Head given to the reference node of each floating part.
+    :return: (fixed, Hfix, active, unknown, dead): boolean node mask of known heads, their values,
+             index array of the pipes to solve, boolean node masks of unknown heads and of dead nodes.
+    """
+    fixed = ~np.isnan(net.fixedHead)
+    Hfix = net.fixedHead.copy()
+    active = np.flatnonzero(~net.closed)  # Pipes that can carry flow
+    nComp, labels = componentLabels(net, active)
+    hasFixed = np.zeros(nComp, dtype=bool)
+    hasFixed[labels[fixed]] = True
+    first = np.unique(labels, return_index=True)[1]  # First node of each component
+    demand = np.bincount(labels, weights=net.extFlow, minlength=nComp)
+    balanced = np.abs(demand) <= 1e-9 * max(1.0, float(np.max(np.abs(net.extFlow), initial=0.0)))
+    ground = first[~hasFixed & balanced]
+    fixed[ground] = True  # Hold one node of each floating component at the reference head
+    Hfix[ground] = refHead
+    dead = ~(hasFixed | balanced)[labels]  # Nodes in components that cannot satisfy mass balance
+    active = active[~dead[net.start[active]]]
+    return fixed, Hfix, active, ~fixed & ~dead, dead
+
+
+def solveHeads(net, table=None, Q0=None, H0=None, tol=1e-6, maxIter=100, refHead=0.0, callback=None, f0=None):
+    """
+    Solves the network for pipe flows and nodal heads together with the global gradient
+    (Todini-Pilati) Newton method. Nodes with a fixed head act as reservoirs; every other node
+    enforces mass balance, so no loop equations are needed. Closed pipes carry no flow. In every
+    connected part of the network without a fixed head the first node is held at refHead, which fixes
+    the otherwise arbitrary head datum; parts whose external flows do not balance cannot be solved
+    and get NaN heads and flows. Each iteration starts its Colebrook solves from the friction factors
+    of the one before, and the first from f0 if it is given. The solve stops as soon as the flow
+    correction implied by the current heads and every node's mass imbalance are below tol, so a
+    start that already satisfies the equations takes no Newton step at all.
+
+    :param net: NetworkArrays to solve.
+    :param table: Optional FrictionFactorTable for the turbulent friction factors.
+    :param Q0: Optional initial pipe flows in L/s, e.g. a previous solution to warm-start from.
+    :param H0: Optional initial nodal heads in m (only the unknown heads are used).
+    :param tol: Convergence tolerance on the flow correction in L/s.
+    :param maxIter: Maximum number of Newton iterations.
+    :param refHead: Head of the reference node when the network has no fixed heads.
+    :param callback: Optional function called as callback(iteration, residualNorm) after every iteration.
+    :param f0: Optional friction factor of each pipe to start from, e.g. the f of an earlier solution (NaN for unknown).
+    :return: A HeadSolution.
+    """
+    t0 = time.perf_counter()
+    report = SolveReport('global gradient (nodal heads)', tol)
+    fixed, Hfix, active, unknown, dead = partition(net, refHead)
+    if np.any(dead):
+        report.message = f'{int(np.count_nonzero(dead))} nodes cannot be supplied. '
+
+    A = net.incidence()[active]
+    A12 = A[:, unknown].tocsc()  # Unknown-head columns
+    A21 = A12.T.tocsr()
+    fixedTerm = A[:, fixed] @ Hfix[fixed]  # Head rise along each pipe due to fixed heads
+    q = net.extFlow[unknown] * 0.001  # External inflow at the unknown nodes (m³/s)
+
+    if Q0 is None:
+        Q = math.pi / 4.0 * net.d[active] ** 2  # Start near 1 m/s
+    else:
+        Q = np.nan_to_num(np.asarray(Q0, dtype=float)[active]) * 0.001
+    H = Hfix.copy()
+    H[unknown] = np.nanmax(Hfix) if np.any(fixed) else refHead
+    if H0 is not None:
+        H0u = np.asarray(H0, dtype=float)[unknown]
+        H[unknown] = np.where(np.isnan(H0u), H[unknown], H0u)
+    H[dead] = np.nan
+    Qfloor = 1e-6 * math.pi / 4.0 * net.d[active] ** 2  # Keeps the Newton derivative finite at zero flow
+    f = None if f0 is None else np.asarray(f0, dtype=float)[active]
+
+    iteration = 0
+    while iteration < maxIter:
+        iteration += 1
+        t = time.perf_counter()
+        h, D, f = pipeHeadLosses(net, np.where(np.abs(Q) < Qfloor, Qfloor, Q), table, report, active, f)
+        h = np.where(np.abs(Q) < Qfloor, h * Q / Qfloor, h)  # Linear through zero flow
+        report.frictionTime += time.perf_counter() - t
+        report.residualEvaluations += 1
+        Dinv = 1.0 / D  # D is d(head loss)/dQ
+        energy = h + A12 @ H[unknown] + fixedTerm  # Head mismatch along each pipe (m)
+        mass = (A21 @ Q + q) * 1000.0  # Net inflow at each unknown node (L/s)
+        report.residualNorms.append(float(np.sqrt(energy @ energy + mass @ mass)))
+        if callback is not None:
+            callback(iteration, report.residualNorms[-1])
+        if len(Q) and np.max(np.abs(Dinv * energy)) * 1000.0 < tol and np.max(np.abs(mass), initial=0.0) < tol:
+            iteration -= 1  # Already converged; no Newton step taken
+            report.converged = True
+            break
+
+        t = time.perf_counter()
+        M = (A21 @ sparse.diags(Dinv) @ A12).tocsc()
+        rhs = A21 @ Q + q - A21 @ (Dinv * (h + fixedTerm))
+        if M.shape[0]:
+            H[unknown] = spsolve(M, rhs)
+        report.linearSolveTime += time.perf_counter() - t
+        Qnew = Q - Dinv * (h + A12 @ H[unknown] + fixedTerm)
+        dQ = np.max(np.abs(Qnew - Q)) * 1000.0 if len(Q) else 0.0
+        Q = Qnew
+        if dQ < tol:
+            report.converged = True
+            break
+
+    h, D, f = pipeHeadLosses(net, Q, table, report, active, f)
+    report.residualEvaluations += 1
+    energy = h + A12 @ H[unknown] + fixedTerm
+    mass = (A21 @ Q + q) * 1000.0
+    report.iterations = iteration
+    report.message += 'The solution converged.' if report.converged else f'No convergence in {maxIter} iterations.'
+    unknownIdx = np.flatnonzero(unknown)
+    if len(mass):
+        i = int(np.argmax(np.abs(mass)))
+        report.worstNode = (net.nodeNames[unknownIdx[i]], float(mass[i]))
+    if len(energy):
+        i = int(np.argmax(np.abs(energy)))
+        report.worstPipe = (net.pipeNames[active[i]] if net.pipeNames is not None else int(active[i]), float(energy[i]))
+
+    Qall = np.zeros(net.nPipes)  # Closed pipes carry no flow
+    Qall[dead[net.start]] = np.nan
+    Qall[active] = Q * 1000.0
+    fAll = np.full(net.nPipes, np.nan)
+    fAll[active] = f
+    report.totalTime = time.perf_counter() - t0
+    return HeadSolution(Qall, H, fAll, iteration, report.converged, report, ~dead)
+
+
+def solveMany(nets, table=None, maxWorkers=None, **kwargs):
+    """
+    Solves several networks at once on a thread pool. solveHeads keeps all iteration state in
+    per-solve arrays and never writes to its input, so the solves do not interfere; the heavy
+    NumPy/SciPy work releases the GIL.
+
+    :param nets: Iterable of NetworkArrays (e.g. from PipeNetwork.compile).
+    :param table: Optional FrictionFactorTable shared by all solves.
+    :param maxWorkers: Number of worker threads.
+    :param kwargs: Further keyword arguments for solveHeads.
+    :return: List of HeadSolution objects in the order of nets.
+    """
+    with ThreadPoolExecutor(max_workers=maxWorkers) as ex:
+        return list(ex.map(lambda net: solveHeads(net, table, **kwargs), nets))
+
+
+def _solvePart(args):
+    """
+    Solves one independent part of a network; module level so that process pools can pickle it.
+
+    :param args: (NetworkArrays, keyword arguments for solveHeads).
+    :return: A HeadSolution.
+    """
+    net, kwargs = args
+    return solveHeads(net, **kwargs)
+
+
+def solveComponents(net, table=None, Q0=None, H0=None, executor=None, maxWorkers=None, f0=None, **kwargs):
+    """
+    Splits the network into independent parts (see NetworkArrays.components), solves each part
+    with solveHeads, optionally on a thread or process pool, and merges the results.
+
+    :param net: NetworkArrays to solve.
+    :param table: Optional FrictionFactorTable for the turbulent friction factors.
+    :param Q0: Optional initial pipe flows in L/s for the whole network.
+    :param H0: Optional initial nodal heads in m for the whole network.
+    :param executor: None to solve the parts one after another, 'thread' or 'process' for a pool,
+                     or an existing concurrent.futures.Executor.
+    :param maxWorkers: Number of pool workers when a pool is created here.
+    :param f0: Optional starting friction factors for the whole network.
+    :param kwargs: Further keyword arguments for solveHeads (tol, maxIter, refHead).
+    :return: A HeadSolution for the whole network with a merged SolveReport; the per-part
+             reports are kept in report.parts.
+    """
+    t0 = time.perf_counter()
+    parts = net.components()
+    tasks = []
+    for pipes, nodes in parts:
+        kw = dict(kwargs, table=table)
+        if Q0 is not None:
+            kw['Q0'] = np.asarray(Q0, dtype=float)[pipes]
+        if H0 is not None:
+            kw['H0'] = np.asarray(H0, dtype=float)[nodes]
+        if f0 is not None:
+            kw['f0'] = np.asarray(f0, dtype=float)[pipes]
+        tasks.append((net.subnetwork(pipes, nodes), kw))
+
+    if executor is None:
+        results = [_solvePart(t) for t in tasks]
+    elif executor in ('thread', 'process'):
+        pool = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool(max_workers=maxWorkers) as ex:
+            results = list(ex.map(_solvePart, tasks))
+    else:
+        results = list(executor.map(_solvePart, tasks))
+
+    Q = np.zeros(net.nPipes)  # Closed pipes carry no flow
+    f = np.full(net.nPipes, np.nan)
+    H = net.fixedHead.copy()
+    supplied = np.ones(net.nNodes, dtype=bool)
+    report = SolveReport('global gradient by component', kwargs.get('tol', 1e-6))
+    report.parts = [sol.report for sol in results]
+    report.converged = all(sol.converged for sol in results)
+    for (pipes, nodes), sol in zip(parts, results):
+        Q[pipes] = sol.Q
+        f[pipes] = sol.f
+        H[nodes] = sol.H
+        supplied[nodes] &= sol.supplied
+        r = sol.report
+        report.iterations = max(report.iterations, r.iterations)
+        report.residualEvaluations += r.residualEvaluations
+        report.colebrookSolves += r.colebrookSolves
+        report.frictionTime += r.frictionTime
+        report.linearSolveTime += r.linearSolveTime
+        if abs(r.worstNode[1]) >= abs(report.worstNode[1]):
+            report.worstNode = r.worstNode
+        if abs(r.worstPipe[1]) >= abs(report.worstPipe[1]):
+            report.worstPipe = r.worstPipe
+    for k in range(report.iterations):
+        # Combined residual norm per iteration; parts that finished early keep their last value
+        report.residualNorms.append(float(np.sqrt(sum(r.residualNorms[min(k, len(r.residualNorms) - 1)] ** 2
+                                                      for r in report.parts if r.residualNorms))))
+    report.message = f'{len(parts)} independent parts. ' + (
+        'The solution converged.' if report.converged else 'Some parts did not converge.')
+    report.totalTime = time.perf_counter() - t0
+    return HeadSolution(Q, H, f, report.iterations, report.converged, report, supplied)
@@ -4,15 +4,15 @@ class Loop:
     The pipes within the loop must be listed in order to ensure correct traversal.
     """
 
-    def __init__(self, Name='A', Pipes=[]):
+    def __init__(self, Name='A', Pipes=None):
         """
         Initializes the loop with a given name and a list of pipes.
 
         :param Name: A string representing the loop's identifier.
-        :param Pipes: A list of Pipe objects forming a closed loop.
+        :param Pipes: A list of Pipe objects forming a closed loop (a new empty list if None).
         """
         self.name = Name  # Store the loop name
-        self.pipes = Pipes  # Store the pipes that make up the loop
+        self.pipes = [] if Pipes is None else Pipes  # Store the pipes that make up the loop
 
     def getLoopHeadLoss(self):
         """
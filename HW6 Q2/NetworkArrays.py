@@ -0,0 +1,254 @@
+import copy
+import math
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from Fluid import Fluid, FLUIDS
+
+
+class NetworkArrays:
+    """
+    Compact array form of a pipe network: one entry per pipe and per node, with pipes referring to
+    nodes by integer index. Used by the vectorized solvers instead of the Pipe/Node objects.
+    Units follow the object model: lengths in m, diameters in m, roughness in m, flows in L/s.
+    The fluid of each pipe is kept both as an index into the network's list of distinct fluids and
+    as per-pipe density and viscosity arrays, so the solvers never touch the Fluid objects.
+    """
+
+    def __init__(self, nodeNames, start, end, length, d, rough, rho, mu, extFlow=None, elevation=None,
+                 fixedHead=None, pipeNames=None, closed=None, fluids=None, fluidIndex=None, patterns=None):
+        """
+        Initializes the arrays; all per-pipe arrays must have the same length.
+
+        :param nodeNames: List of node names; the position of a name is its node index.
+        :param start: Start node index of each pipe (positive flow runs from start to end).
+        :param end: End node index of each pipe.
+        :param length: Pipe lengths in m.
+        :param d: Pipe diameters in m.
+        :param rough: Pipe roughness in m.
+        :param rho: Fluid density in each pipe in kg/m³, or None to take it from fluids.
+        :param mu: Fluid dynamic viscosity in each pipe in Pa·s, or None to take it from fluids.
+        :param extFlow: External flow at each node in L/s (positive into the node).
+        :param elevation: Elevation of each node in m.
+        :param fixedHead: Fixed total head of each node in m, NaN for junctions with unknown head.
+        :param pipeNames: Optional list of pipe names.
+        :param closed: Optional boolean array marking closed pipes.
+        :param fluids: Optional list of the distinct Fluid objects in the network; found from the distinct
+                       (rho, mu) pairs if None.
+        :param fluidIndex: Index into fluids of each pipe's fluid (required with fluids).
+        :param patterns: Optional dictionary of demand pattern id -> array of demand multipliers, one per time step.
+        """
+        nNodes = len(nodeNames)
+        self.nodeNames = list(nodeNames)  # Node names in index order
+        self.nodeIndex = {n: i for i, n in enumerate(self.nodeNames)}  # Node name -> index
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.length = np.asarray(length, dtype=float)
+        self.d = np.asarray(d, dtype=float)
+        self.rough = np.asarray(rough, dtype=float)
+        if fluids is None:  # One shared Fluid per distinct (rho, mu) pair
+            pairs = np.stack([np.asarray(rho, dtype=float), np.asarray(mu, dtype=float)], axis=1)
+            pairs, fluidIndex = np.unique(pairs, axis=0, return_inverse=True)
+            fluids = [FLUIDS.intern(Fluid(m, r)) for r, m in pairs.tolist()]
+        self.fluids = list(fluids)  # Distinct fluids; fluidIndex refers to their positions
+        self.fluidIndex = np.asarray(fluidIndex, dtype=np.int64).reshape(-1)
+        fluidRho = np.array([f.rho for f in self.fluids], dtype=float)
+        fluidMu = np.array([f.mu for f in self.fluids], dtype=float)
+        self.rho = fluidRho[self.fluidIndex] if rho is None else np.asarray(rho, dtype=float)
+        self.mu = fluidMu[self.fluidIndex] if mu is None else np.asarray(mu, dtype=float)
+        self.extFlow = np.zeros(nNodes) if extFlow is None else np.asarray(extFlow, dtype=float)
+        self.elevation = np.zeros(nNodes) if elevation is None else np.asarray(elevation, dtype=float)
+        self.fixedHead = np.full(nNodes, np.nan) if fixedHead is None else np.asarray(fixedHead, dtype=float)
+        self.pipeNames = pipeNames  # Optional pipe names in index order
+        self.closed = np.zeros(len(self.start), dtype=bool) if closed is None else np.asarray(closed, dtype=bool)
+        self.patterns = {} if patterns is None else patterns  # Demand patterns, e.g. from an .inp file
+        self._incidence = None  # Cached incidence matrix, shared by copies with the same topology
+
+    @classmethod
+    def fromPipeNetwork(cls, network):
+        """
+        Builds the array form of a PipeNetwork; node indices follow network.nodes and pipe
+        indices follow network.pipes.
+
+        :param network: A PipeNetwork with its nodes built.
+        :return: A NetworkArrays object.
+        """
+        nodeNames = [n.name for n in network.nodes]
+        index = {name: i for i, name in enumerate(nodeNames)}
+        pipes = network.pipes
+        ids = {}  # id of each distinct Fluid object -> its index
+        fluidIndex = [ids.setdefault(id(p.fluid), len(ids)) for p in pipes]
+        fluids = list({id(p.fluid): p.fluid for p in pipes}.values())  # In the same first-seen order
+        return cls(nodeNames,
+                   [index[p.startNode] for p in pipes],
+                   [index[p.endNode] for p in pipes],
+                   [p.length for p in pipes],
+                   [p.d for p in pipes],
+                   [p.r for p in pipes],
+                   None, None,
+                   extFlow=[n.extFlow for n in network.nodes],
+                   elevation=[n.elevation for n in network.nodes],
+                   fixedHead=[np.nan if n.fixedHead is None else n.fixedHead for n in network.nodes],
+                   pipeNames=[p.Name() for p in pipes],
+                   closed=[p.closed for p in pipes],
+                   fluids=fluids, fluidIndex=fluidIndex)
+
+    @property
+    def nPipes(self):
+        return len(self.start)
+
+    @property
+    def nNodes(self):
+        return len(self.nodeNames)
+
+    @property
+    def area(self):
+        """
+        Cross-sectional area of each pipe in m².
+        """
+        return math.pi / 4.0 * self.d ** 2
+
+    @property
+    def relrough(self):
+        """
+        Relative roughness of each pipe.
+        """
+        return self.rough / self.d
+
+    def pipeIndex(self, name):
+        """
+        Finds the index of a pipe by name.
+
+        :param name: Pipe name.
+        :return: Pipe index.
+        """
+        return self.pipeNames.index(name)
+
+    def incidence(self):
+        """
+        Builds the pipe-node incidence matrix with -1 at the start node and +1 at the end node of
+        each pipe, so that (A @ H) is the head rise along each pipe and (A.T @ Q) the net pipe inflow at each node.
+        Closed pipes keep their rows; solvers mask them out.
+
+        :return: Sparse CSR matrix of shape (nPipes, nNodes).
+        """
+        if self._incidence is None:
+            nP = self.nPipes
+            rows = np.concatenate([np.arange(nP), np.arange(nP)])
+            cols = np.concatenate([self.start, self.end])
+            vals = np.concatenate([-np.ones(nP), np.ones(nP)])
+            self._incidence = sparse.csr_matrix((vals, (rows, cols)), shape=(nP, self.nNodes))
+        return self._incidence
+
+    def withPipeChange(self, i, closed=None, d=None, rough=None):
+        """
+        Returns a copy of the network with one pipe changed. Only the modified arrays are copied;
+        everything else, including the cached incidence matrix, is shared with this network.
+
+        :param i: Index of the pipe to change.
+        :param closed: New closed state, or None to keep it.
+        :param d: New diameter in m, or None to keep it.
+        :param rough: New roughness in m, or None to keep it.
+        :return: A new NetworkArrays object.
+        """
+        self.incidence()  # Build it once so that the copy shares it
+        net = copy.copy(self)
+        if closed is not None:
+            net.closed = self.closed.copy()
+            net.closed[i] = closed
+        if d is not None:
+            net.d = self.d.copy()
+            net.d[i] = d
+        if rough is not None:
+            net.rough = self.rough.copy()
+            net.rough[i] = rough
+        return net
+
+    def withTemperatures(self, temperature, pipes=None, fluid='water', registry=FLUIDS):
+        """
+        Returns a copy of the network with pipes at new temperatures. The properties come from one
+        vectorized table lookup, and pipes at the same temperature share one Fluid from the registry.
+        Only the fluid arrays are copied.
+
+        :param temperature: Temperature in °C, one value or one per selected pipe.
+        :param pipes: Index array of the pipes to change; all pipes by default.
+        :param fluid: Name of the property table.
+        :param registry: FluidRegistry to intern the fluids in.
+        :return: A new NetworkArrays object.
+        """
+        sel = np.arange(self.nPipes) if pipes is None else np.asarray(pipes, dtype=np.int64).reshape(-1)
+        new, index = registry.lookup(np.broadcast_to(temperature, sel.shape), fluid)
+        position = {id(f): k for k, f in enumerate(self.fluids)}
+        fluids = list(self.fluids)
+        for f in new:
+            if id(f) not in position:
+                position[id(f)] = len(fluids)
+                fluids.append(f)
+        self.incidence()  # Build it once so that the copy shares it
+        net = copy.copy(self)
+        net.fluids = fluids
+        net.fluidIndex = self.fluidIndex.copy()
+        net.fluidIndex[sel] = np.array([position[id(f)] for f in new], dtype=np.int64)[index]
+        net.rho = np.array([f.rho for f in fluids])[net.fluidIndex]
+        net.mu = np.array([f.mu for f in fluids])[net.fluidIndex]
+        return net
+
+    def components(self):
+        """
+        Splits the network into independent parts. Closed pipes are ignored, and fixed-head nodes
+        do not connect the pipes that meet there, since their head is known; each part can then be
+        solved on its own. Fixed-head nodes appear in every part they touch.
+
+        :return: List of (pipe indices, node indices) arrays, one pair per part.
+        """
+        nN = self.nNodes
+        open_ = np.flatnonzero(~self.closed)
+        fixed = ~np.isnan(self.fixedHead)
+        ends = np.stack([self.start[open_], self.end[open_]])  # Endpoints of the open pipes
+        vertex = ends.copy()
+        isFixed = fixed[ends]
+        vertex[isFixed] = nN + np.arange(np.count_nonzero(isFixed))  # A private copy of each fixed endpoint
+        nV = nN + np.count_nonzero(isFixed)
+        graph = sparse.csr_matrix((np.ones(len(open_)), (vertex[0], vertex[1])), shape=(nV, nV))
+        nComp, labels = connected_components(graph, directed=False)
+
+        pipeLabel = labels[vertex[0]]
+        nodeLabel = labels[:nN]
+        used = np.zeros(nComp, dtype=bool)
+        used[pipeLabel] = True
+        used[nodeLabel[~fixed]] = True  # Junctions without open pipes form parts of their own
+
+        pipeOrder = np.argsort(pipeLabel, kind='stable')
+        pipeSplit = np.searchsorted(pipeLabel[pipeOrder], np.arange(nComp + 1))
+        # Node membership: junctions by label, fixed nodes through the parts of their pipes
+        memberNode = np.concatenate([np.flatnonzero(~fixed), ends[isFixed]])
+        memberLabel = np.concatenate([nodeLabel[~fixed], labels[vertex[isFixed]]])
+        nodeOrder = np.lexsort((memberNode, memberLabel))
+        memberNode, memberLabel = memberNode[nodeOrder], memberLabel[nodeOrder]
+        nodeSplit = np.searchsorted(memberLabel, np.arange(nComp + 1))
+
+        parts = []
+        for c in np.flatnonzero(used):
+            nodes = np.unique(memberNode[nodeSplit[c]:nodeSplit[c + 1]])
+            parts.append((open_[pipeOrder[pipeSplit[c]:pipeSplit[c + 1]]], nodes))
+        return parts
+
+    def subnetwork(self, pipes, nodes):
+        """
+        Extracts part of the network as a NetworkArrays of its own.
+
+        :param pipes: Indices of the pipes to keep.
+        :param nodes: Indices of the nodes to keep; must include both ends of every kept pipe.
+        :return: A new NetworkArrays with the pipes and nodes renumbered in the given order.
+        """
+        newIndex = np.full(self.nNodes, -1, dtype=np.int64)
+        newIndex[nodes] = np.arange(len(nodes))
+        return NetworkArrays([self.nodeNames[i] for i in nodes],
+                             newIndex[self.start[pipes]], newIndex[self.end[pipes]],
+                             self.length[pipes], self.d[pipes], self.rough[pipes],
+                             self.rho[pipes], self.mu[pipes],
+                             extFlow=self.extFlow[nodes], elevation=self.elevation[nodes],
+                             fixedHead=self.fixedHead[nodes],
+                             pipeNames=None if self.pipeNames is None else [self.pipeNames[i] for i in pipes],
+                             closed=self.closed[pipes], fluids=self.fluids, fluidIndex=self.fluidIndex[pipes],
+                             patterns=self.patterns)
@@ -0,0 +1,128 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy.spatial import Delaunay
+from Fluid import defaultFluid
+from Pipe import Pipe
+from NetworkArrays import NetworkArrays
+
+DIAMETERS = np.array([150.0, 200.0, 250.0, 300.0])  # Pipe diameters to choose from (mm)
+
+
+def _assemble(nodeNames, start, end, rng, totalDemand, roughness=0.00025):
+    """
+    Turns a list of node pairs into a NetworkArrays with random lengths and diameters and
+    consistent demands: every node but the first draws a random demand, and the first node
+    supplies the total, so the external flows sum to zero.
+
+    :param nodeNames: List of node names.
+    :param start: Start node index of each pipe.
+    :param end: End node index of each pipe.
+    :param rng: numpy random Generator.
+    :param totalDemand: Total demand of the network in L/s.
+    :param roughness: Pipe roughness in m.
+    :return: A NetworkArrays.
+    """
+    start, end = np.asarray(start), np.asarray(end)
+    names = np.array(nodeNames)
+    swap = names[end] < names[start]  # Same orientation as Pipe: start node is alphabetically lower
+    start, end = np.where(swap, end, start), np.where(swap, start, end)
+    nP, nN = len(start), len(nodeNames)
+    demand = rng.uniform(0.5, 1.5, nN)
+    demand[0] = 0.0
+    extFlow = -demand * totalDemand / demand.sum()
+    extFlow[0] = totalDemand
+    return NetworkArrays(nodeNames, start, end, rng.uniform(50.0, 250.0, nP), rng.choice(DIAMETERS, nP) / 1000.0,
+                         np.full(nP, roughness), None, None, extFlow=extFlow,
+                         pipeNames=[f'{nodeNames[a]}-{nodeNames[b]}' for a, b in zip(start, end)],
+                         fluids=[defaultFluid()], fluidIndex=np.zeros(nP, dtype=np.int64))
+
+
+def gridNetwork(nPipes, seed=0, totalDemand=100.0):
+    """
+    Square grid of nodes with pipes between horizontal and vertical neighbours.
+
+    :param nPipes: Approximate number of pipes.
+    :param seed: Random seed.
+    :param totalDemand: Total demand in L/s, supplied at the first corner.
+    :return: A NetworkArrays.
+    """
+    side = max(2, int(round((1 + np.sqrt(1 + 2 * nPipes)) / 2)))  # 2*side*(side-1) pipes
+    idx = np.arange(side * side).reshape(side, side)
+    start = np.concatenate([idx[:, :-1].ravel(), idx[:-1, :].ravel()])
+    end = np.concatenate([idx[:, 1:].ravel(), idx[1:, :].ravel()])
+    names = [f'n{i:07d}' for i in range(side * side)]
+    return _assemble(names, start, end, np.random.default_rng(seed), totalDemand)
+
+
+def loopedTree(nPipes, seed=0, loopFraction=0.2, totalDemand=100.0):
+    """
+    Random tree (each node hangs off one of the few nodes created just before it) with extra pipes
+    closing loops between nodes that are close in the tree.
+
+    :param nPipes: Approximate number of pipes.
+    :param seed: Random seed.
+    :param loopFraction: Fraction of the pipes that close loops.
+    :param totalDemand: Total demand in L/s, supplied at the root.
+    :return: A NetworkArrays.
+    """
+    rng = np.random.default_rng(seed)
+    nNodes = max(3, int(nPipes / (1 + loopFraction)) + 1)
+    child = np.arange(1, nNodes)
+    parent = np.maximum(child - rng.integers(1, 8, nNodes - 1), 0)
+    nExtra = max(1, nPipes - (nNodes - 1))
+    a = rng.integers(0, nNodes, nExtra)
+    b = np.minimum(a + rng.integers(2, 20, nExtra), nNodes - 1)
+    pairs = set(zip(parent.tolist(), child.tolist()))
+    start, end = list(parent), list(child)
+    for u, v in zip(a.tolist(), b.tolist()):
+        if u != v and (u, v) not in pairs:
+            pairs.add((u, v))
+            start.append(u)
+            end.append(v)
+    names = [f'n{i:07d}' for i in range(nNodes)]
+    return _assemble(names, start, end, rng, totalDemand)
+
+
+def randomPlanar(nPipes, seed=0, totalDemand=100.0):
+    """
+    Random planar network: random points joined by a subset of their Delaunay triangulation that
+    contains its minimum spanning tree, so the network is connected and no pipes cross.
+
+    :param nPipes: Approximate number of pipes.
+    :param seed: Random seed.
+    :param totalDemand: Total demand in L/s, supplied at the first node.
+    :return: A NetworkArrays.
+    """
+    rng = np.random.default_rng(seed)
+    nNodes = max(4, int(nPipes / 1.5))
+    pts = rng.random((nNodes, 2))
+    tri = Delaunay(pts).simplices
+    edges = np.sort(np.concatenate([tri[:, [0, 1]], tri[:, [1, 2]], tri[:, [0, 2]]]), axis=1)
+    edges = np.unique(edges, axis=0)
+    length = np.linalg.norm(pts[edges[:, 0]] - pts[edges[:, 1]], axis=1)
+    mst = minimum_spanning_tree(csr_matrix((length, (edges[:, 0], edges[:, 1])), shape=(nNodes, nNodes))).tocoo()
+    inTree = {(min(u, v), max(u, v)) for u, v in zip(mst.row.tolist(), mst.col.tolist())}
+    treeMask = np.array([(u, v) in inTree for u, v in edges.tolist()])
+    others = np.flatnonzero(~treeMask)
+    extra = rng.choice(others, min(len(others), max(0, nPipes - int(treeMask.sum()))), replace=False)
+    chosen = np.concatenate([np.flatnonzero(treeMask), np.sort(extra)])
+    names = [f'n{i:07d}' for i in range(nNodes)]
+    return _assemble(names, edges[chosen, 0], edges[chosen, 1], rng, totalDemand)
+
+
+def toPipes(net):
+    """
+    Creates Pipe objects for a generated network, for benchmarking the object model.
+
+    :param net: A NetworkArrays.
+    :return: List of Pipe objects in pipe index order.
+    """
+    names = net.nodeNames
+    water = defaultFluid()
+    return [Pipe(names[a], names[b], L, d * 1000.0, r, water)
+            for a, b, L, d, r in zip(net.start.tolist(), net.end.tolist(), net.length.tolist(), net.d.tolist(),
+                                     net.rough.tolist())]
+
+
+GENERATORS = {'grid': gridNetwork, 'loopedTree': loopedTree, 'planar': randomPlanar}
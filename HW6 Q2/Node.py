@@ -3,17 +3,23 @@ class Node:
     Represents a node (junction) in a pipe network where multiple pipes meet.
     """
 
-    def __init__(self, Name='a', Pipes=[], ExtFlow=0):
+    def __init__(self, Name='a', Pipes=None, ExtFlow=0, Elevation=0.0, FixedHead=None):
         """
         Initializes a node with a name, a list of connected pipes, and an external flow rate.
 
         :param Name: A string representing the node's name.
-        :param Pipes: A list of Pipe objects connected to this node.
+        :param Pipes: A list of Pipe objects connected to this node (a new empty list if None).
         :param ExtFlow: External flow into (+) or out (-) of this node in L/s.
+        :param Elevation: Elevation of the node in m.
+        :param FixedHead: Total head in m if the node is a fixed-head reservoir, None for a junction.
         """
         self.name = Name  # Store the node name
-        self.pipes = Pipes  # Store the list of connected pipes
+        self.pipes = [] if Pipes is None else Pipes  # Store the list of connected pipes
         self.extFlow = ExtFlow  # External flow rate at the node (L/s)
+        self.elevation = Elevation  # Node elevation (m)
+        self.fixedHead = FixedHead  # Fixed total head (m) or None
+        self.head = None  # Total head (m), set by the nodal head calculations
+        self.pressure = None  # Pressure (Pa), set by the nodal head calculations
 
     def getNetFlowRate(self):
         """
@@ -2,7 +2,8 @@ import math
 import numpy as np
 import random as rnd
 from scipy.optimize import fsolve
-from Fluid import Fluid
+from Fluid import defaultFluid
+from FrictionFactor import colebrook
 
 
 class Pipe:
@@ -11,7 +12,8 @@ class Pipe:
     and flow characteristics.
     """
 
-    def __init__(self, Start='A', End='B', L=100, D=200, r=0.00025, fluid=Fluid()):
+    def __init__(self, Start='A', End='B', L=100, D=200, r=0.00025, fluid=None, frictionTable=None,
+                 memoizeFriction=False, memoTol=1e-6):
         """
         Initializes a Pipe object with given parameters.
 
@@ -20,13 +22,26 @@ class Pipe:
         :param L: Pipe length in meters (float).
         :param D: Pipe diameter in millimeters (float).
         :param r: Pipe roughness in meters (float).
-        :param fluid: A Fluid object representing the fluid inside the pipe.
+        :param fluid: A Fluid object representing the fluid inside the pipe (the shared default water if None).
+        :param frictionTable: Optional FrictionFactorTable used instead of solving Colebrook.
+        :param memoizeFriction: If True, the last (Re, f) pair is reused and seeds the next Colebrook solve.
+        :param memoTol: The memo is reused while Re is within this relative distance of the memoized Re; the
+                        turbulent friction factor then changes by at most a quarter of that.
         """
         self.startNode = min(Start, End)  # Ensure startNode is alphabetically lower
         self.endNode = max(Start, End)  # Ensure endNode is alphabetically higher
         self.length = L  # Store pipe length
         self.r = r  # Store pipe roughness
-        self.fluid = fluid  # Store fluid properties
+        self.fluid = defaultFluid() if fluid is None else fluid  # Store fluid properties
+        self.frictionTable = frictionTable  # Optional tabulated friction factor surface
+        self.memoizeFriction = memoizeFriction  # Reuse the last Colebrook solution as a starting point
+        self.lastFriction = None  # Last (Re, f) pair from a Colebrook solve
+        self.memoTol = memoTol  # Relative Re change within which the memoized friction factor is reused
+        self.memoHits = 0  # Friction factors returned unchanged from the memo
+        self.memoMisses = 0  # Friction factors that needed a Colebrook solve
+        self.colebrookSolves = 0  # Exact Colebrook solves done by this pipe
+        self.closed = False  # A closed pipe (shut valve) carries no flow in the head-based solvers
+        self.ff = None  # Friction factor of the last head loss evaluation or head-based solve
 
         # Compute derived properties
         self.d = D / 1000.0  # Convert diameter to meters
@@ -51,7 +66,7 @@ class Pipe:
 
         :return: The Reynolds number (dimensionless).
         """
-        self.reynolds = (self.fluid.rho * self.V() * self.d) / self.fluid.mu
+        self.reynolds = (self.fluid.rho * abs(self.V()) * self.d) / self.fluid.mu  # Flow direction does not matter
         return self.reynolds
 
     def FrictionFactor(self):
@@ -65,10 +80,26 @@ class Pipe:
         rr = self.relrough
 
         def CB():
+            if self.frictionTable is not None:
+                return float(self.frictionTable.lookup(Re, rr, self))
+            if self.memoizeFriction:
+                return memoCB()
+            self.colebrookSolves += 1
             cb = lambda f: 1 / (f ** 0.5) + 2.0 * np.log10(rr / 3.7 + 2.51 / (Re * f ** 0.5))
             result = fsolve(cb, 0.01)
             return result[0]
 
+        def memoCB():
+            if self.lastFriction is not None and abs(self.lastFriction[0] - Re) <= self.memoTol * Re:
+                self.memoHits += 1
+                return self.lastFriction[1]
+            self.memoMisses += 1
+            self.colebrookSolves += 1
+            f0 = self.lastFriction[1] if self.lastFriction is not None else 0.01
+            ff = float(colebrook(Re, rr, f0))  # Newton solve started from the previous friction factor
+            self.lastFriction = (Re, ff)
+            return ff
+
         def lam():
             return 64 / Re
 
@@ -84,27 +115,33 @@ class Pipe:
             sig = 0.2 * mean
             return rnd.normalvariate(mean, sig)
 
-    def frictionHeadLoss(self):
+    def frictionHeadLoss(self, ff=None):
         """
         Calculates head loss in meters using the Darcy-Weisbach equation.
 
+        :param ff: Friction factor to use, e.g. self.ff from a solve; computed from the current flow if None.
         :return: Head loss in meters of fluid.
         """
         g = 9.81  # Acceleration due to gravity (m/s²)
-        ff = self.FrictionFactor()
+        if ff is None:
+            ff = self.FrictionFactor()
+        else:
+            self.V()
+        self.ff = ff
         hl = ff * (self.length / self.d) * (self.vel ** 2) / (2 * g)
         return hl
 
-    def getFlowHeadLoss(self, s):
+    def getFlowHeadLoss(self, s, ff=None):
         """
         Calculates the signed head loss in the pipe when traversing a loop.
 
         :param s: Starting node for traversal.
+        :param ff: Friction factor to use; computed from the current flow if None.
         :return: Signed head loss in meters.
         """
         nTraverse = 1 if s == self.startNode else -1
         nFlow = 1 if self.Q >= 0 else -1
-        return nTraverse * nFlow * self.frictionHeadLoss()
+        return nTraverse * nFlow * self.frictionHeadLoss(ff)
 
     def Name(self):
         """
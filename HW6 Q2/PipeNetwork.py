@@ -1,7 +1,15 @@
+import time
+from collections import deque
 from scipy.optimize import fsolve
 import numpy as np
-from Fluid import Fluid
+from Fluid import FLUIDS, defaultFluid
 from Node import Node
+from Loop import Loop
+from NetworkArrays import NetworkArrays
+from HeadSolver import solveHeads, solveComponents, g
+from SolveReport import SolveReport
+from Sensitivity import DemandSensitivity
+from SolutionStore import saveSolution, loadSolution
 
 
 class PipeNetwork:
@@ -10,26 +18,67 @@ class PipeNetwork:
     based on mass conservation at nodes and energy conservation around loops.
     """
 
-    def __init__(self, Pipes=[], Loops=[], Nodes=[], fluid=Fluid()):
+    def __init__(self, Pipes=None, Loops=None, Nodes=None, fluid=None):
         """
-        Initializes a PipeNetwork with lists of pipes, loops, and nodes.
+        Initializes a PipeNetwork with lists of pipes, loops, and nodes. Each network gets its own
+        new lists when they are not given, so networks never share state through default arguments.
 
         :param Pipes: List of Pipe objects in the network.
         :param Loops: List of Loop objects in the network.
         :param Nodes: List of Node objects in the network.
-        :param fluid: Fluid object representing the working fluid in the pipes.
+        :param fluid: Fluid object representing the working fluid in the pipes (the shared default water if None).
         """
-        self.loops = Loops  # Store list of loops
-        self.nodes = Nodes  # Store list of nodes
-        self.Fluid = fluid  # Store fluid properties
-        self.pipes = Pipes  # Store list of pipes
+        self.loops = [] if Loops is None else Loops  # Store list of loops
+        self.nodes = [] if Nodes is None else Nodes  # Store list of nodes
+        self.Fluid = defaultFluid() if fluid is None else fluid  # Store fluid properties
+        self.pipes = [] if Pipes is None else Pipes  # Store list of pipes
+        self.frictionTable = None  # Optional FrictionFactorTable shared by all pipes
+        self.lastArrays = None  # NetworkArrays of the last head-based solve
+        self.lastSolution = None  # HeadSolution of the last head-based solve
 
-    def findFlowRates(self):
+    def setFrictionModel(self, table=None, memoize=False, memoTol=1e-6):
+        """
+        Selects how the pipes in the network compute their friction factors.
+
+        :param table: A FrictionFactorTable to interpolate from, or None to solve Colebrook for every evaluation.
+        :param memoize: If True, each pipe reuses its last (Re, f) pair as the Colebrook starting point.
+        :param memoTol: Relative change of Re within which a pipe returns its memoized friction factor unchanged.
+        """
+        self.frictionTable = table
+        for p in self.pipes:
+            p.frictionTable = table
+            p.memoizeFriction = memoize
+            p.memoTol = memoTol
+            p.lastFriction = None  # Start from a clean memo
+
+    def setTemperatures(self, temperature, names=None, fluid='water'):
+        """
+        Gives pipes the shared Fluid for their temperature from the FLUIDS registry, e.g. to model
+        water at different temperatures in different zones. Pipes at the same temperature share one Fluid.
+
+        :param temperature: Temperature in °C, one value for all the pipes or one per pipe.
+        :param names: Names of the pipes to change; defaults to every pipe.
+        :param fluid: Name of the property table.
+        """
+        pipes = self.pipes if names is None else [self.getPipe(name) for name in names]
+        fluids, index = FLUIDS.lookup(np.broadcast_to(temperature, (len(pipes),)), fluid)
+        for p, k in zip(pipes, index.tolist()):
+            p.fluid = fluids[k]
+
+    def findFlowRates(self, fullOutput=False, callback=None, tol=1e-6):
         """
         Solves for flow rates in the pipes using mass continuity and head loss equations.
+
+        :param fullOutput: If True, also return a SolveReport with the solver telemetry.
+        :param callback: Optional function called as callback(evaluation, residualNorm) after every residual evaluation.
+        :param tol: Tolerance for the final node (L/s) and loop (m) imbalance check in the report.
+        :return: Array of flow rates, or (flow rates, SolveReport) if fullOutput is True.
         """
         N = len(self.nodes) + len(self.loops)  # Number of equations (nodes + loops)
         Q0 = np.full(N, 10.0)  # Initial guess for flow rates (L/s)
+        report = SolveReport('fsolve (loop equations)', tol)
+        evalTime = [0.0]  # Wall time spent inside the residual function
+        solves0 = sum(p.colebrookSolves for p in self.pipes)
 
         def fn(q):
             """
@@ -39,17 +88,215 @@ class PipeNetwork:
             :param q: Array of flow rates in pipes.
             :return: Array of residuals for node mass balance and loop head losses.
             """
+            t0 = time.perf_counter()
             for i in range(len(self.pipes)):
                 self.pipes[i].Q = q[i]  # Assign flow rates to pipes
 
             L = self.getNodeFlowRates()  # Compute net flow rates at nodes
+            t = time.perf_counter()
             L += self.getLoopHeadLosses()  # Compute net head loss around loops
+            report.frictionTime += time.perf_counter() - t
+            evalTime[0] += time.perf_counter() - t0
 
+            report.residualEvaluations += 1
+            report.residualNorms.append(float(np.linalg.norm(L)))
+            if callback is not None:
+                callback(report.residualEvaluations, report.residualNorms[-1])
             return L
 
-        FR = fsolve(fn, Q0)  # Solve system of equations
+        t0 = time.perf_counter()
+        FR, info, ier, mesg = fsolve(fn, Q0, full_output=True)  # Solve system of equations
+        report.totalTime = time.perf_counter() - t0
+
+        for i in range(len(self.pipes)):
+            self.pipes[i].Q = FR[i]  # Leave the pipes at the solution, not the last trial point
+        report.converged = ier == 1
+        report.message = mesg
+        report.iterations = None  # MINPACK hybrd does not report its iterations; see residualEvaluations
+        report.colebrookSolves = sum(p.colebrookSolves for p in self.pipes) - solves0
+        report.solverOverheadTime = report.totalTime - evalTime[0]  # Jacobian updates and steps inside fsolve
+        nodeFlows = self.getNodeFlowRates()
+        loopLosses = self.getLoopHeadLosses()
+        if nodeFlows:
+            i = int(np.argmax(np.abs(nodeFlows)))
+            report.worstNode = (self.nodes[i].name, nodeFlows[i])
+        if loopLosses:
+            i = int(np.argmax(np.abs(loopLosses)))
+            report.worstLoop = (self.loops[i].name, loopLosses[i])
+
+        if fullOutput:
+            return FR, report
         return FR
 
+    def compile(self):
+        """
+        Takes a snapshot of the network in array form. Solving the snapshot (HeadSolver.solveHeads,
+        solveComponents or solveMany) never touches the Pipe and Node objects, so many solves can
+        run at the same time.
+
+        :return: A NetworkArrays object.
+        """
+        return NetworkArrays.fromPipeNetwork(self)
+
+    def findHeads(self, refHead=0.0, tol=1e-6, maxIter=100, callback=None, decompose=False, executor=None,
+                  maxWorkers=None, writeBack=True, warmStart=None):
+        """
+        Solves for pipe flows and nodal heads directly, without loop equations. Nodes with a
+        fixedHead act as reservoirs; if there are none, the first node is held at refHead.
+        The flows are stored on the pipes and the heads and pressures on the nodes.
+
+        :param refHead: Head in m of the first node when no node has a fixed head.
+        :param tol: Convergence tolerance on the flow correction in L/s.
+        :param maxIter: Maximum number of Newton iterations.
+        :param callback: Optional function called as callback(iteration, residualNorm) after every iteration
+                         (ignored when decompose is True).
+        :param decompose: If True, split the network into parts that are independent (disconnected,
+                          separated by closed pipes or joined only at fixed-head nodes) and solve them separately.
+        :param executor: With decompose, None, 'thread', 'process' or a concurrent.futures.Executor.
+        :param maxWorkers: With decompose, number of pool workers.
+        :param writeBack: If False, leave the Pipe and Node objects and the stored last solution untouched.
+        :param warmStart: Optional earlier solution to start from: a StoredSolution or the path of a file written
+                          by saveSolution. Pipes and nodes are matched by name, so it may come from an older
+                          version of the network (see StoredSolution.warmStart).
+        :return: A HeadSolution with Q aligned with self.pipes and H aligned with self.nodes; its report
+                 attribute holds the SolveReport.
+        """
+        net = self.compile()
+        Q0 = H0 = f0 = None
+        if warmStart is not None:
+            if isinstance(warmStart, str):
+                warmStart = loadSolution(warmStart)
+            Q0, H0, f0, matched = warmStart.warmStart(net)
+        if decompose:
+            sol = solveComponents(net, self.frictionTable, Q0, H0, executor=executor, maxWorkers=maxWorkers, f0=f0,
+                                  tol=tol, maxIter=maxIter, refHead=refHead)
+        else:
+            sol = solveHeads(net, self.frictionTable, Q0, H0, tol=tol, maxIter=maxIter, refHead=refHead,
+                             callback=callback, f0=f0)
+        if warmStart is not None:
+            sol.report.message = f'Warm start for {matched} of {net.nPipes} pipes. ' + sol.report.message
+        if not writeBack:
+            return sol
+        P = sol.pressures(net.elevation, self.Fluid.rho)
+        for i, p in enumerate(self.pipes):
+            p.Q = sol.Q[i]
+            p.ff = sol.f[i]
+        for i, n in enumerate(self.nodes):
+            n.head = sol.H[i]
+            n.pressure = P[i]
+        self.lastArrays = net
+        self.lastSolution = sol
+        return sol
+
+    def saveSolution(self, filename):
+        """
+        Saves the last findHeads solution (flows, heads, friction factors and topology hash) for a warm
+        start in a later run: PN.findHeads(warmStart=filename).
+
+        :param filename: Path of the .npz file to write.
+        """
+        if self.lastSolution is None:
+            self.findHeads()
+        saveSolution(filename, self.lastArrays, self.lastSolution)
+
+    def resolveWithPipeChange(self, name, closed=None, D=None, r=None, refHead=0.0, tol=1e-6, maxIter=100):
+        """
+        Solves the network again with one pipe changed, starting from the last findHeads solution.
+        This is a full Newton solve of the changed network (the nodal matrix is rebuilt and factored
+        every iteration); the saving over a cold findHeads comes only from the warm start, which
+        usually needs a few iterations instead of ten or more. The change is applied to a copy of the
+        compiled arrays, so the Pipe and Node objects and the base solution are left untouched.
+        Call findHeads again after editing the network itself.
+
+        :param name: Name of the pipe to change (format: 'a-b').
+        :param closed: True to close the pipe, False to open it, None to keep its state.
+        :param D: New diameter in mm, or None to keep it.
+        :param r: New roughness in m, or None to keep it.
+        :param refHead: Head in m of the first node when no node has a fixed head (as for findHeads).
+        :param tol: Convergence tolerance on the flow correction in L/s.
+        :param maxIter: Maximum number of Newton iterations.
+        :return: A HeadSolution for the changed network.
+        """
+        if self.lastSolution is None:
+            self.findHeads(refHead=refHead, tol=tol, maxIter=maxIter)
+        base = self.lastSolution
+        net = self.lastArrays.withPipeChange(self.lastArrays.pipeIndex(name), closed,
+                                             None if D is None else D / 1000.0, r)
+        return solveHeads(net, self.frictionTable, Q0=base.Q, H0=base.H, tol=tol, maxIter=maxIter, refHead=refHead,
+                          f0=base.f)
+
+    def demandSensitivity(self, refHead=0.0):
+        """
+        Sets up the sensitivity of the last findHeads solution to the external flow at each node,
+        e.g. sens.dense() for the full dQ/d(extFlow) and d(head)/d(extFlow) matrices or
+        sens.topK(10) for the largest entries only.
+
+        :param refHead: Reference head used for the solve.
+        :return: A DemandSensitivity.
+        """
+        if self.lastSolution is None:
+            self.findHeads(refHead=refHead)
+        return DemandSensitivity(self.lastArrays, self.lastSolution, self.frictionTable, refHead)
+
+    def contingencySweep(self, names=None, closed=True, D=None, r=None, refHead=0.0, tol=1e-6, maxIter=100):
+        """
+        Runs resolveWithPipeChange for each pipe in turn, e.g. an N-1 sweep closing every pipe one at a time.
+        Each case is a warm-started full solve, so a sweep costs about as many Newton iterations as the
+        warm starts take, summed over the pipes.
+
+        :param names: Names of the pipes to change; defaults to every pipe.
+        :param closed: Closed state applied to each pipe (see resolveWithPipeChange).
+        :param D: Diameter in mm applied to each pipe (see resolveWithPipeChange).
+        :param r: Roughness in m applied to each pipe (see resolveWithPipeChange).
+        :param refHead: Head in m of the first node when no node has a fixed head.
+        :param tol: Convergence tolerance on the flow correction in L/s.
+        :param maxIter: Maximum number of Newton iterations.
+        :return: Dictionary of pipe name -> HeadSolution.
+        """
+        if names is None:
+            names = [p.Name() for p in self.pipes]
+        return {name: self.resolveWithPipeChange(name, closed, D, r, refHead, tol, maxIter) for name in names}
+
+    def getNodeHeads(self, refNode=None, refHead=None):
+        """
+        Computes nodal heads and pressures from the current pipe flows with a single traversal
+        from a reference node, subtracting each pipe's friction head loss in the direction of flow.
+        Closed pipes are skipped. Each pipe's head loss uses the friction factor of the last solve
+        (or head loss evaluation) when there is one, so repeated calls give the same heads.
+
+        :param refNode: Name of the reference node; defaults to the first fixed-head node, else the first node.
+        :param refHead: Head in m at the reference node; defaults to its fixed head, else its elevation.
+        :return: (heads, pressures) arrays in m and Pa aligned with self.nodes (NaN for unreachable nodes).
+        """
+        index = {n.name: i for i, n in enumerate(self.nodes)}
+        if refNode is None:
+            fixedNodes = [n.name for n in self.nodes if n.fixedHead is not None]
+            refNode = fixedNodes[0] if fixedNodes else self.nodes[0].name
+        ref = self.nodes[index[refNode]]
+        if refHead is None:
+            refHead = ref.fixedHead if ref.fixedHead is not None else ref.elevation
+
+        H = np.full(len(self.nodes), np.nan)
+        H[index[refNode]] = refHead
+        queue = deque([ref])
+        while queue:
+            n = queue.popleft()
+            for p in n.pipes:
+                if p.closed:
+                    continue
+                other = p.endNode if n.name == p.startNode else p.startNode
+                j = index[other]
+                if np.isnan(H[j]):
+                    H[j] = H[index[n.name]] - p.getFlowHeadLoss(n.name, p.ff)  # Head drops along the flow
+                    queue.append(self.nodes[j])
+
+        z = np.array([n.elevation for n in self.nodes], dtype=float)
+        P = self.Fluid.rho * g * (H - z)
+        for i, n in enumerate(self.nodes):
+            n.head = H[i]
+            n.pressure = P[i]
+        return H, P
+
     def getNodeFlowRates(self):
         """
         Computes the net flow rate at each node.
@@ -116,6 +363,55 @@ class PipeNetwork:
             if not self.nodeBuilt(p.endNode):
                 self.nodes.append(Node(p.endNode, self.getNodePipes(p.endNode)))
 
+    def buildLoops(self):
+        """
+        Automatically creates a set of independent loops (a fundamental cycle basis). A breadth-first
+        spanning tree is grown over the nodes; each pipe not in the tree closes exactly one loop,
+        made of that pipe and the tree paths from its ends to their common ancestor.
+        The pipes of each loop are listed in traversal order, as Loop requires. Nodes must be built.
+        """
+        nodeByName = {n.name: n for n in self.nodes}
+        parentPipe = {}  # Node name -> pipe to its parent in the spanning tree (None for roots)
+        depth = {}
+        treePipes = set()
+        for root in self.nodes:
+            if root.name in depth:
+                continue
+            parentPipe[root.name] = None
+            depth[root.name] = 0
+            queue = deque([root])
+            while queue:
+                n = queue.popleft()
+                for p in n.pipes:
+                    other = p.endNode if n.name == p.startNode else p.startNode
+                    if other not in depth:
+                        parentPipe[other] = p
+                        depth[other] = depth[n.name] + 1
+                        treePipes.add(id(p))
+                        queue.append(nodeByName[other])
+
+        def up(p, n):
+            # The node at the other end of the tree pipe p from n
+            return p.endNode if n == p.startNode else p.startNode
+
+        for chord in self.pipes:
+            if id(chord) in treePipes or chord.startNode == chord.endNode:
+                continue
+            s, e = chord.startNode, chord.endNode
+            fromE, fromS = [], []  # Tree pipes walked up from e and from s
+            while depth[e] > depth[s]:
+                fromE.append(parentPipe[e])
+                e = up(parentPipe[e], e)
+            while depth[s] > depth[e]:
+                fromS.append(parentPipe[s])
+                s = up(parentPipe[s], s)
+            while s != e:
+                fromE.append(parentPipe[e])
+                e = up(parentPipe[e], e)
+                fromS.append(parentPipe[s])
+                s = up(parentPipe[s], s)
+            self.loops.append(Loop(f'L{len(self.loops) + 1}', [chord] + fromE + fromS[::-1]))
+
     def printPipeFlowRates(self):
         """
         Prints flow rates for all pipes in the network.
@@ -130,6 +426,13 @@ class PipeNetwork:
         for n in self.nodes:
             print(f'Net flow into node {n.name} is {n.getNetFlowRate():.2f} L/s')
 
+    def printNodeHeads(self):
+        """
+        Prints the head and pressure at each node.
+        """
+        for n in self.nodes:
+            print(f'Head at node {n.name} is {n.head:.2f} m, pressure is {n.pressure / 1000:.2f} kPa')
+
     def printLoopHeadLoss(self):
         """
         Prints head loss values for each loop to verify energy conservation.
@@ -0,0 +1,106 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from HeadSolver import partition, pipeHeadLosses
+
+
+class DemandSensitivity:
+    """
+    Linear sensitivity of a converged network solution to the external flows at its nodes.
+    Linearizing the head-based equations at the solution gives
+
+        D dQ + A12 dH = 0   (energy along each pipe, D = dh/dQ)
+        A21 dQ + dq = 0     (mass at each node with unknown head)
+
+    so dH = M^-1 dq and dQ = -D^-1 A12 M^-1 dq with M = A21 D^-1 A12. M is factored once and
+    every node's column of the sensitivity matrices is then a pair of triangular solves, done in
+    batches. Extra inflow at a node is balanced by the fixed-head nodes, or by the reference node
+    when the network has no fixed heads.
+    """
+
+    def __init__(self, net, sol, table=None, refHead=0.0):
+        """
+        Factors the reduced Jacobian at a converged solution.
+
+        :param net: NetworkArrays that was solved.
+        :param sol: Converged HeadSolution of net.
+        :param table: FrictionFactorTable used for the solve, if any.
+        :param refHead: Reference head used for the solve.
+        """
+        self.net = net
+        fixed, Hfix, active, unknown, dead = partition(net, refHead)
+        self.active = active  # Pipes that carry flow
+        self.unknown = np.flatnonzero(unknown)  # Nodes with unknown heads; the only nodes with non-zero columns
+        A12 = net.incidence()[active][:, unknown].tocsc()
+        Qm3 = sol.Q[active] * 0.001
+        Qfloor = 1e-6 * np.pi / 4.0 * net.d[active] ** 2
+        D = pipeHeadLosses(net, np.where(np.abs(Qm3) < Qfloor, Qfloor, Qm3), table, pipes=active)[1]
+        self.DinvA12 = (sparse.diags(1.0 / D) @ A12).tocsr()  # D^-1 A12
+        # Factor M once; M is symmetric positive definite, so a symmetric fill-reducing ordering suits it
+        M = (A12.T @ self.DinvA12).tocsc()
+        self.lu = splu(M, permc_spec='MMD_AT_PLUS_A', options=dict(SymmetricMode=True)) if M.shape[0] else None
+
+    def columns(self, nodes):
+        """
+        Sensitivities to the external flow at a batch of nodes.
+
+        :param nodes: Node indices.
+        :return: (dQ, dH) dense arrays of shape (nPipes, len(nodes)) and (nNodes, len(nodes)), with
+                 dQ in L/s per L/s and dH in m per L/s.
+        """
+        nodes = np.asarray(nodes)
+        net = self.net
+        pos = np.full(net.nNodes, -1)
+        pos[self.unknown] = np.arange(len(self.unknown))
+        cols = pos[nodes]
+        rhs = np.zeros((len(self.unknown), len(nodes)))
+        has = np.flatnonzero(cols >= 0)  # Fixed-head and dead nodes have zero sensitivity
+        rhs[cols[has], has] = 1.0
+        dHu = self.lu.solve(rhs) if self.lu is not None else rhs
+        dH = np.zeros((net.nNodes, len(nodes)))
+        dH[self.unknown] = dHu * 0.001  # q is in m³/s inside the solver, extFlow in L/s
+        dQ = np.zeros((net.nPipes, len(nodes)))
+        dQ[self.active] = -(self.DinvA12 @ dHu)
+        return dQ, dH
+
+    def iterColumns(self, blockSize=256):
+        """
+        Streams the sensitivities for every node in blocks, so they never all have to be in memory.
+
+        :param blockSize: Number of nodes per block (right-hand sides per batched solve).
+        :return: Generator of (node indices, dQ, dH) as returned by columns.
+        """
+        for i in range(0, self.net.nNodes, blockSize):
+            nodes = np.arange(i, min(i + blockSize, self.net.nNodes))
+            yield (nodes,) + self.columns(nodes)
+
+    def dense(self):
+        """
+        Full sensitivity matrices, for small networks.
+
+        :return: (dQ/dq of shape (nPipes, nNodes), dH/dq of shape (nNodes, nNodes)).
+        """
+        return self.columns(np.arange(self.net.nNodes))
+
+    def topK(self, k=10, which='flow', blockSize=256):
+        """
+        Keeps only the k largest sensitivities (by magnitude) for each node, streaming over the nodes.
+
+        :param k: Entries kept per node.
+        :param which: 'flow' for dQ/dq (pipes) or 'head' for dH/dq (nodes).
+        :param blockSize: Number of nodes per batched solve.
+        :return: Sparse CSC matrix of shape (nPipes or nNodes, nNodes) with at most k entries per column.
+        """
+        rows, cols, vals = [], [], []
+        for nodes, dQ, dH in self.iterColumns(blockSize):
+            S = dQ if which == 'flow' else dH
+            kk = min(k, S.shape[0])
+            top = np.argpartition(-np.abs(S), kk - 1, axis=0)[:kk]  # Row indices of the largest entries
+            v = np.take_along_axis(S, top, axis=0)
+            keep = v != 0
+            rows.append(top[keep])
+            cols.append(np.broadcast_to(nodes, top.shape)[keep])
+            vals.append(v[keep])
+        nRows = self.net.nPipes if which == 'flow' else self.net.nNodes
+        return sparse.csc_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(nRows, self.net.nNodes))
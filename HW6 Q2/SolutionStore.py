@@ -0,0 +1,107 @@
+import hashlib
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def topologyHash(net):
+    """
+    Fingerprint of the network layout: node names and the end nodes of every pipe, in index order.
+    Pipe sizes, demands and closed states do not change it.
+
+    :param net: NetworkArrays.
+    :return: Hex digest string.
+    """
+    h = hashlib.sha256()
+    h.update('\0'.join(net.nodeNames).encode())
+    h.update(np.ascontiguousarray(net.start, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(net.end, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+class StoredSolution:
+    """
+    A converged head-based solution read back from disk, with the node names and pipe end names
+    needed to map it onto a network that has changed since it was saved.
+    """
+
+    def __init__(self, Q, H, f, nodeNames, pipeStart, pipeEnd, topology):
+        """
+        :param Q: Flow rate in each pipe in L/s.
+        :param H: Total head at each node in m.
+        :param f: Friction factor of each pipe.
+        :param nodeNames: Node names in index order.
+        :param pipeStart: Start node name of each pipe.
+        :param pipeEnd: End node name of each pipe.
+        :param topology: topologyHash of the network that was solved.
+        """
+        self.Q = Q
+        self.H = H
+        self.f = f
+        self.nodeNames = nodeNames
+        self.pipeStart = pipeStart
+        self.pipeEnd = pipeEnd
+        self.topology = topology
+
+    def warmStart(self, net):
+        """
+        Maps the stored solution onto a network. With the same topology hash the stored arrays are used
+        as they are; otherwise pipes are matched by their end node names (in either direction, flipping
+        the flow sign) and nodes by name, and anything new is left unknown. Parallel pipes between the
+        same two nodes are matched in the order they appear in each network.
+
+        :param net: NetworkArrays to solve.
+        :return: (Q0, H0, f0, matched): initial flows in L/s, heads in m and friction factors for solveHeads,
+                 NaN where there is no stored value, and the number of pipes that got a stored flow.
+        """
+        if topologyHash(net) == self.topology:
+            return self.Q.copy(), self.H.copy(), self.f.copy(), net.nPipes
+        nodeIndex = {n: i for i, n in enumerate(self.nodeNames.tolist())}
+        H0 = np.array([self.H[nodeIndex[n]] if n in nodeIndex else np.nan for n in net.nodeNames])
+        pipeIndex = {}  # (lower node name, higher node name) -> list of (stored pipe index, orientation)
+        for k, (a, b) in enumerate(zip(self.pipeStart.tolist(), self.pipeEnd.tolist())):
+            pipeIndex.setdefault((min(a, b), max(a, b)), []).append((k, 1.0 if a <= b else -1.0))
+        names = net.nodeNames
+        Q0 = np.full(net.nPipes, np.nan)
+        f0 = np.full(net.nPipes, np.nan)
+        used = {}  # Node pair -> number of its stored pipes already matched
+        for i, (a, b) in enumerate(zip(net.start.tolist(), net.end.tolist())):
+            a, b = names[a], names[b]
+            pair = (min(a, b), max(a, b))
+            stored = pipeIndex.get(pair, ())
+            n = used.get(pair, 0)
+            if n < len(stored):
+                k, sign = stored[n]
+                used[pair] = n + 1
+                Q0[i] = sign * (1.0 if a <= b else -1.0) * self.Q[k]
+                f0[i] = self.f[k]
+        return Q0, H0, f0, int(np.count_nonzero(~np.isnan(Q0)))
+
+
+def saveSolution(filename, net, sol):
+    """
+    Saves a converged head-based solution in NumPy's compressed .npz format.
+
+    :param filename: Path of the file to write (NumPy adds .npz if it is missing).
+    :param net: NetworkArrays that was solved.
+    :param sol: HeadSolution for net (e.g. from solveHeads or PipeNetwork.findHeads).
+    """
+    if not sol.converged:
+        raise ValueError('Only converged solutions can be saved')
+    names = np.array(net.nodeNames)
+    np.savez_compressed(filename, version=FORMAT_VERSION, Q=sol.Q, H=sol.H, f=sol.f, nodeNames=names,
+                        pipeStart=names[net.start], pipeEnd=names[net.end], topology=topologyHash(net))
+
+
+def loadSolution(filename):
+    """
+    Reads a solution written by saveSolution.
+
+    :param filename: Path of the .npz file.
+    :return: A StoredSolution.
+    """
+    with np.load(filename, allow_pickle=False) as data:
+        if int(data['version']) != FORMAT_VERSION:
+            raise ValueError(f'{filename}: unsupported solution file version {int(data["version"])}')
+        return StoredSolution(data['Q'], data['H'], data['f'], data['nodeNames'], data['pipeStart'],
+                              data['pipeEnd'], str(data['topology']))
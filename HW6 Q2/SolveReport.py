@@ -0,0 +1,62 @@
+class SolveReport:
+    """
+    Telemetry collected during a network solve: convergence, work counts, residual history,
+    timing and the worst remaining mass/energy imbalance.
+    """
+
+    def __init__(self, solver='', tol=1e-6):
+        """
+        Initializes an empty report.
+
+        :param solver: Name of the solver that produced the report.
+        :param tol: Tolerance used to judge the final node and loop imbalances.
+        """
+        self.solver = solver  # Solver name
+        self.tol = tol  # Imbalance tolerance
+        self.converged = False  # Solver's own convergence flag
+        self.message = ''  # Solver's termination message
+        self.iterations = 0  # Newton iterations (None for fsolve, which does not report them)
+        self.residualEvaluations = 0  # Number of residual evaluations
+        self.colebrookSolves = 0  # Number of pipe-level Colebrook solves
+        self.residualNorms = []  # Residual 2-norm after each iteration
+        self.frictionTime = 0.0  # Wall time spent evaluating friction factors and head losses (s)
+        self.linearSolveTime = 0.0  # Wall time spent in the linear algebra (s); head-based solvers only
+        self.solverOverheadTime = 0.0  # Wall time inside fsolve outside the residual function (s); fsolve only
+        self.totalTime = 0.0  # Total wall time of the solve (s)
+        self.worstNode = (None, 0.0)  # (node name, net flow in L/s) with the largest mass imbalance
+        self.worstLoop = (None, 0.0)  # (loop name, head loss in m) with the largest energy imbalance
+        self.worstPipe = (None, 0.0)  # (pipe name, head mismatch in m) with the largest energy imbalance
+        self.parts = []  # Reports of the independent parts when the network was solved by component
+
+    def balanced(self):
+        """
+        Checks the final solution against the mass and energy balance tolerance.
+
+        :return: True if every node, loop and pipe imbalance is within tol.
+        """
+        return max(abs(self.worstNode[1]), abs(self.worstLoop[1]), abs(self.worstPipe[1])) <= self.tol
+
+    def printReport(self):
+        """
+        Prints a summary of the solve.
+        """
+        print(f'Solver: {self.solver}, converged: {self.converged} {self.message}'.rstrip())
+        if self.iterations is None:
+            print(f'Residual evaluations: {self.residualEvaluations}, Colebrook solves: {self.colebrookSolves}')
+        else:
+            print(f'Iterations: {self.iterations}, residual evaluations: {self.residualEvaluations}, '
+                  f'Colebrook solves: {self.colebrookSolves}')
+        if self.residualNorms:
+            print(f'Final residual norm: {self.residualNorms[-1]:.3e}')
+        if self.iterations is None:
+            other = f'{self.solverOverheadTime:.4f} s solver overhead'
+        else:
+            other = f'{self.linearSolveTime:.4f} s linear solve'
+        print(f'Time: {self.totalTime:.4f} s total, {self.frictionTime:.4f} s friction, {other}')
+        if self.worstNode[0] is not None:
+            print(f'Worst node imbalance: {self.worstNode[1]:.3e} L/s at node {self.worstNode[0]}')
+        if self.worstLoop[0] is not None:
+            print(f'Worst loop imbalance: {self.worstLoop[1]:.3e} m in loop {self.worstLoop[0]}')
+        if self.worstPipe[0] is not None:
+            print(f'Worst pipe imbalance: {self.worstPipe[1]:.3e} m in pipe {self.worstPipe[0]}')
+        print(f'Balanced to {self.tol}: {self.balanced()}')
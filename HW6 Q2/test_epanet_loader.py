@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from EpanetLoader import loadInp
+
+INP = """[TITLE]
+Two loops fed from one reservoir
+
+[JUNCTIONS]
+;ID  Elev  Demand  Pattern
+ J1   10    0
+ J2   8     20      P1
+ J3   6     15
+ J4   5     0
+
+[RESERVOIRS]
+ R1   60
+
+[PIPES]
+;ID  Node1  Node2  Length  Diameter  Roughness  MinorLoss  Status
+ P1   R1     J1     500     300       0.25       0          Open
+ P2   J1     J2     300     200       0.25       0          Open
+ P3   J1     J3     300     200       0.25       0          Open
+ P4   J2     J4     200     150       0.25       0          Open
+ P5   J3     J4     200     150       0.25       0          Closed
+
+[DEMANDS]
+ J4   10
+ J4   2.5
+
+[PATTERNS]
+ P1   1.0  1.5
+ P1   0.5
+
+[OPTIONS]
+ Units     LPS
+ Headloss  D-W
+
+[END]
+"""
+
+
+def writeInp(tmp_path, text):
+    filename = tmp_path / 'net.inp'
+    filename.write_text(text)
+    return str(filename)
+
+
+def test_load_small_network(tmp_path):
+    net, PN = loadInp(writeInp(tmp_path, INP), buildObjects=True)
+    assert net.nodeNames == ['J1', 'J2', 'J3', 'J4', 'R1']
+    assert net.pipeNames == ['P1', 'P2', 'P3', 'P4', 'P5']
+    assert net.closed.tolist() == [False, False, False, False, True]
+    assert np.allclose(net.d, [0.3, 0.2, 0.2, 0.15, 0.15])
+    assert np.allclose(net.rough, 0.00025)
+    assert np.allclose(net.extFlow, [0.0, -20.0, -15.0, -12.5, 0.0])
+    assert net.fixedHead[4] == 60.0 and np.all(np.isnan(net.fixedHead[:4]))
+    assert list(net.patterns) == ['P1'] and net.patterns['P1'].tolist() == [1.0, 1.5, 0.5]
+
+    sol = PN.findHeads()
+    assert sol.converged
+    assert sol.Q[0] == pytest.approx(-47.5, abs=1e-6)  # All the demand comes from R1 (P1 runs J1 -> R1)
+    assert sol.Q[4] == 0.0
+
+
+def test_demand_pattern_step(tmp_path):
+    net = loadInp(writeInp(tmp_path, INP), patternStep=1)
+    assert np.allclose(net.extFlow, [0.0, -30.0, -15.0, -12.5, 0.0])
+
+
+@pytest.mark.parametrize('old, new, message', [
+    (' J3   6     15\n', ' J3   6     15\n J2   7     0\n', "node 'J2' is already defined on line 7"),
+    (' R1   60\n', ' R1   60\n J4   50\n', "node 'J4' is already defined on line 9"),
+    (' P5   J3', ' P4   J3', "pipe 'P4' is already defined on line 19"),
+    ('0          Closed', '0          CV', 'check valves are not modelled'),
+])
+def test_invalid_records_raise(tmp_path, old, new, message):
+    with pytest.raises(ValueError, match=message):
+        loadInp(writeInp(tmp_path, INP.replace(old, new)))
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from Fluid import FLUIDS, Fluid, FluidRegistry, WATER, defaultFluid
+from HeadSolver import pipeHeadLosses
+from NetworkGenerators import gridNetwork
+from test_pipe_network import buildNetwork
+
+
+def test_fluids_are_interned():
+    registry = FluidRegistry()
+    fluids, index = registry.lookup([20.0, 40.0, 20.0, 40.0])
+    assert len(fluids) == 2 and index.tolist() == [0, 1, 0, 1]
+    assert registry.get(40.0) is fluids[1]
+    assert registry.intern(Fluid(0.001, 998.0)) is registry.intern(Fluid(0.001, 998.0))
+    assert defaultFluid() is defaultFluid()
+
+
+def test_table_interpolation():
+    water = FLUIDS.get(40.0)
+    assert water.mu == pytest.approx(0.653e-3) and water.rho == pytest.approx(992.22)
+    assert FLUIDS.get(22.5).mu == pytest.approx(np.sqrt(1.002e-3 * 0.890e-3))  # Linear in log(mu)
+    with pytest.raises(ValueError):
+        WATER.properties(120.0)
+
+
+def test_with_temperatures_shares_fluids_and_changes_head_loss():
+    net = gridNetwork(200)
+    warm = net.withTemperatures(60.0, pipes=np.arange(0, net.nPipes, 2))
+    assert net.fluidIndex.max() == 0  # The original network is unchanged
+    sixty = FLUIDS.get(60.0)
+    assert all(warm.fluids[k] is sixty for k in warm.fluidIndex[::2])
+    assert np.all(warm.mu[::2] == sixty.mu) and np.all(warm.mu[1::2] == net.mu[1::2])
+
+    Qm3 = np.pi / 4.0 * net.d ** 2  # 1 m/s in every pipe, turbulent
+    h = pipeHeadLosses(net, Qm3)[0]
+    hWarm = pipeHeadLosses(warm, Qm3)[0]
+    assert np.all(hWarm[::2] < h[::2])  # Lower viscosity, higher Re, lower friction factor
+    assert np.array_equal(hWarm[1::2], h[1::2])
+
+
+def test_set_temperatures_on_pipes():
+    PN = buildNetwork()
+    PN.setTemperatures(10.0, names=['a-b', 'c-d'])
+    ab, cd, ac = PN.getPipe('a-b'), PN.getPipe('c-d'), PN.getPipe('a-c')
+    assert ab.fluid is cd.fluid is FLUIDS.get(10.0)
+    assert ac.fluid.mu == pytest.approx(0.00089)
+
+    ab.Q = 30.0
+    cold = ab.frictionHeadLoss()
+    PN.setTemperatures(80.0, names=['a-b'])
+    assert ab.frictionHeadLoss() < cold
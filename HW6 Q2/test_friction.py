@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from scipy.optimize import fsolve
+from FrictionFactor import colebrook, frictionFactors, FrictionFactorTable
+
+
+def scalarColebrook(Re, rr):
+    """
+    Reference friction factor: the Colebrook equation solved on its own with fsolve, as Pipe.FrictionFactor does.
+    """
+    cb = lambda f: 1 / (f ** 0.5) + 2.0 * np.log10(rr / 3.7 + 2.51 / (Re * f ** 0.5))
+    return fsolve(cb, 0.01)[0]
+
+
+def test_laminar_regime():
+    Re = np.array([10.0, 500.0, 1999.0])
+    assert np.allclose(frictionFactors(Re, 1e-4), 64.0 / Re, rtol=1e-12)
+
+
+@pytest.mark.parametrize('Re', [4000.0, 1e4, 2.5e5, 1e7])
+@pytest.mark.parametrize('rr', [1e-6, 1e-4, 1e-2])
+def test_turbulent_regime_matches_scalar_colebrook(Re, rr):
+    f = frictionFactors(np.array([Re]), rr)[0]
+    assert f == pytest.approx(scalarColebrook(Re, rr), rel=1e-7)
+
+
+def test_transitional_regime_is_the_blend():
+    Re, rr = 3000.0, 1e-3
+    expected = 0.5 * 64.0 / Re + 0.5 * scalarColebrook(Re, rr)
+    assert frictionFactors(np.array([Re]), rr)[0] == pytest.approx(expected, rel=1e-7)
+
+
+def test_colebrook_vectorized_matches_scalar():
+    rng = np.random.default_rng(0)
+    Re = 10 ** rng.uniform(3.6, 8.0, 50)
+    rr = 10 ** rng.uniform(-6.0, -1.5, 50)
+    expected = np.array([scalarColebrook(a, b) for a, b in zip(Re, rr)])
+    assert np.allclose(colebrook(Re, rr), expected, rtol=1e-7)
+
+
+def test_table_within_error_bound():
+    table = FrictionFactorTable(tol=1e-3)
+    rng = np.random.default_rng(1)
+    Re = 10 ** rng.uniform(np.log10(table.ReMin), np.log10(table.ReMax), 20000)
+    rr = 10 ** rng.uniform(np.log10(table.rrMin), np.log10(table.rrMax), 20000)
+    exact = colebrook(Re, rr)
+    error = np.abs(table.lookup(Re, rr) - exact) / exact
+    assert table.maxError <= table.tol
+    assert error.max() <= table.tol
+    assert table.hitRate() == 1.0
+
+
+def test_table_falls_back_to_colebrook_outside_the_grid():
+    table = FrictionFactorTable(tol=1e-3)
+    Re, rr = np.array([2e8]), np.array([1e-4])
+    assert table.lookup(Re, rr)[0] == pytest.approx(colebrook(Re, rr)[0], rel=1e-12)
+    assert table.misses == 1
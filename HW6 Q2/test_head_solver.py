@@ -0,0 +1,27 @@
+import copy
+import numpy as np
+from FrictionFactor import FrictionFactorTable
+from HeadSolver import solveHeads, solveMany
+from NetworkGenerators import gridNetwork
+
+
+def test_solve_many_matches_separate_solves():
+    base = gridNetwork(300)
+    nets = []
+    for scale in np.linspace(0.5, 1.5, 8):
+        net = copy.copy(base)
+        net.extFlow = base.extFlow * scale
+        nets.append(net)
+    table = FrictionFactorTable()
+    expected = [solveHeads(net, table) for net in nets]
+    lookups = table.hits + table.misses
+    assert lookups > 0
+    table.resetCounters()
+
+    sols = solveMany(nets, table, maxWorkers=4)
+    assert len(sols) == len(nets)
+    for sol, ref in zip(sols, expected):
+        assert sol.converged and sol.iterations == ref.iterations
+        assert np.allclose(sol.Q, ref.Q, rtol=0.0, atol=1e-12)
+        assert np.allclose(sol.H, ref.H, rtol=0.0, atol=1e-12)
+    assert table.hits + table.misses == lookups  # No counter update lost between the threads
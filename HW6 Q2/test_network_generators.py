@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from HeadSolver import solveHeads
+from NetworkGenerators import GENERATORS
+
+
+@pytest.mark.parametrize('name', list(GENERATORS))
+@pytest.mark.parametrize('size', [10, 500])
+def test_generated_network_is_connected_and_balanced(name, size):
+    net = GENERATORS[name](size)
+    graph = coo_matrix((np.ones(net.nPipes), (net.start, net.end)), shape=(net.nNodes, net.nNodes))
+    assert connected_components(graph, directed=False)[0] == 1
+    assert np.all(net.start != net.end)
+    assert len(set(zip(net.start.tolist(), net.end.tolist()))) == net.nPipes  # No parallel pipes
+    assert abs(net.extFlow.sum()) < 1e-9
+    assert net.extFlow[0] > 0.0 and np.all(net.extFlow[1:] < 0.0)  # One supply, every other node a demand
+    assert solveHeads(net).converged
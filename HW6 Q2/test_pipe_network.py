@@ -0,0 +1,135 @@
+import copy
+import numpy as np
+import pytest
+import HW6_2
+from Fluid import Fluid
+from Pipe import Pipe
+from Loop import Loop
+from PipeNetwork import PipeNetwork
+from HeadSolver import solveHeads
+
+# Reference flows of HW6_2.py in L/s
+REFERENCE_FLOWS = {'a-b': 28.58, 'a-c': 31.42, 'b-e': 28.58, 'c-d': 19.25, 'c-f': 12.17,
+                   'd-e': -17.24, 'd-g': 6.50, 'e-h': 11.33, 'f-g': -2.83, 'g-h': 3.67}
+
+# Pipes of the HW6_2 network as (start, end, length in m, diameter in mm), and the external flows in L/s
+PIPES = [('a', 'b', 250, 300), ('a', 'c', 100, 200), ('b', 'e', 100, 200), ('c', 'd', 125, 200), ('c', 'f', 100, 150),
+         ('d', 'e', 125, 200), ('d', 'g', 100, 150), ('e', 'h', 100, 150), ('f', 'g', 125, 250), ('g', 'h', 125, 250)]
+EXT_FLOWS = {'a': 60, 'd': -30, 'f': -15, 'h': -15}
+
+
+def buildNetwork(changes=None):
+    """
+    The HW6_2 network: eight nodes, ten pipes and three loops.
+
+    :param changes: Optional dictionary of pipe name -> dict(D=..., r=..., closed=...) overriding its data.
+    """
+    water = Fluid()
+    PN = PipeNetwork()
+    changes = {} if changes is None else changes
+    for a, b, L, D in PIPES:
+        change = changes.get(f'{a}-{b}', {})
+        PN.pipes.append(Pipe(a, b, L, change.get('D', D), change.get('r', 0.00025), water))
+        PN.pipes[-1].closed = change.get('closed', False)
+    PN.buildNodes()
+    for name, Q in EXT_FLOWS.items():
+        PN.getNode(name).extFlow = Q
+    for name, pipes in [('A', ['a-b', 'b-e', 'd-e', 'c-d', 'a-c']), ('B', ['c-d', 'd-g', 'f-g', 'c-f']),
+                        ('C', ['d-e', 'e-h', 'g-h', 'd-g'])]:
+        PN.loops.append(Loop(name, [PN.getPipe(p) for p in pipes]))
+    return PN
+
+
+def test_hw6_2_reference_flows(capsys):
+    HW6_2.main()
+    out = capsys.readouterr().out
+    for name, Q in REFERENCE_FLOWS.items():
+        assert f'The flow in segment {name} is {Q:.2f} L/s' in out
+
+
+def test_find_flow_rates_matches_find_heads():
+    PN = buildNetwork()
+    FR, report = PN.findFlowRates(fullOutput=True)
+    assert report.iterations is None  # fsolve reports residual evaluations only
+    assert report.residualEvaluations > 0 and report.linearSolveTime == 0.0
+    assert 0.0 <= report.solverOverheadTime <= report.totalTime
+    loopQ = np.array([p.Q for p in PN.pipes])
+    sol = PN.findHeads()
+    assert np.allclose(sol.Q, loopQ, atol=1e-4)
+    assert np.allclose(loopQ, [REFERENCE_FLOWS[p.Name()] for p in PN.pipes], atol=0.005)
+
+
+def test_node_heads_match_find_heads_and_repeat():
+    PN = buildNetwork()
+    sol = PN.findHeads(refHead=50.0)
+    H, P = PN.getNodeHeads(refNode='a', refHead=50.0)
+    assert np.allclose(H, sol.H, atol=1e-6)
+    assert np.array_equal(PN.getNodeHeads(refNode='a', refHead=50.0)[0], H)
+
+
+def test_node_heads_skip_closed_pipes():
+    PN = buildNetwork()
+    PN.getPipe('c-d').closed = True
+    PN.getPipe('c-d').Q = 5.0  # A stale flow must not be walked through
+    sol = PN.findHeads(refHead=50.0)
+    H, P = PN.getNodeHeads(refNode='a', refHead=50.0)
+    assert sol.Q[PN.pipes.index(PN.getPipe('c-d'))] == 0.0
+    assert np.allclose(H, sol.H, atol=1e-6)
+
+
+@pytest.mark.parametrize('change', [dict(closed=True), dict(D=250.0), dict(r=0.001)])
+def test_resolve_with_pipe_change_matches_full_solve(change):
+    PN = buildNetwork()
+    base = PN.findHeads(refHead=50.0)
+    Q, H, ff = base.Q.copy(), base.H.copy(), [p.ff for p in PN.pipes]
+    sol = PN.resolveWithPipeChange('c-d', refHead=50.0, **change)
+
+    full = buildNetwork({'c-d': change}).findHeads(refHead=50.0)
+    assert sol.converged
+    assert np.allclose(sol.Q, full.Q, atol=1e-5)
+    assert np.allclose(sol.H, full.H, atol=1e-5)
+
+    # The base network and its solution are left as they were
+    assert PN.lastSolution is base
+    assert np.array_equal(base.Q, Q) and np.array_equal(base.H, H)
+    assert [p.Q for p in PN.pipes] == Q.tolist() and [p.ff for p in PN.pipes] == ff
+    assert not PN.getPipe('c-d').closed and PN.getPipe('c-d').d == 0.2
+    assert np.array_equal(PN.findHeads(refHead=50.0).Q, Q)
+
+
+def test_demand_sensitivity_matches_finite_differences():
+    PN = buildNetwork()
+    PN.findHeads(tol=1e-10)
+    dQ, dH = PN.demandSensitivity().dense()
+    net, eps = PN.lastArrays, 0.01
+    for k in range(net.nNodes):
+        sols = []
+        for step in (eps, -eps):
+            changed = copy.copy(net)
+            changed.extFlow = net.extFlow.copy()
+            changed.extFlow[k] += step
+            changed.extFlow[0] -= step  # Balanced at the reference node, as the sensitivity assumes
+            sols.append(solveHeads(changed, tol=1e-12, maxIter=200))
+        assert np.allclose((sols[0].Q - sols[1].Q) / (2 * eps), dQ[:, k], atol=1e-6)
+        assert np.allclose((sols[0].H - sols[1].H) / (2 * eps), dH[:, k], atol=1e-6)
+
+
+def test_decomposed_solves_match_monolithic():
+    # Two disconnected copies of the HW6_2 network, the second with half the demand and a closed pipe
+    water = Fluid()
+    PN = PipeNetwork()
+    for prefix in ('', 'z'):
+        for a, b, L, D in PIPES:
+            PN.pipes.append(Pipe(prefix + a, prefix + b, L, D, 0.00025, water))
+    PN.getPipe('zc-zd').closed = True
+    PN.buildNodes()
+    for name, Q in EXT_FLOWS.items():
+        PN.getNode(name).extFlow = Q
+        PN.getNode('z' + name).extFlow = Q / 2
+    full = PN.findHeads(refHead=50.0, tol=1e-9)
+    assert full.converged
+    for executor in (None, 'thread'):
+        sol = PN.findHeads(refHead=50.0, tol=1e-9, decompose=True, executor=executor, maxWorkers=2)
+        assert sol.converged and len(sol.report.parts) == 2
+        assert np.allclose(sol.Q, full.Q, atol=1e-6)
+        assert np.allclose(sol.H, full.H, atol=1e-6)
@@ -0,0 +1,78 @@
+import copy
+import numpy as np
+import pytest
+from Fluid import Fluid
+from NetworkArrays import NetworkArrays
+from NetworkGenerators import gridNetwork
+from HeadSolver import solveHeads
+from SolutionStore import saveSolution, loadSolution
+
+
+def smallNetwork(pipes):
+    """
+    Reservoir a feeding nodes b and c.
+
+    :param pipes: List of (start name, end name, diameter in m).
+    """
+    names = ['a', 'b', 'c']
+    return NetworkArrays(names, [names.index(p[0]) for p in pipes], [names.index(p[1]) for p in pipes],
+                         np.full(len(pipes), 100.0), [p[2] for p in pipes], np.full(len(pipes), 0.00025),
+                         None, None, extFlow=[0.0, -20.0, -30.0], fixedHead=[50.0, np.nan, np.nan],
+                         fluids=[Fluid()], fluidIndex=np.zeros(len(pipes), dtype=np.int64))
+
+
+def roundTrip(tmp_path, net, sol):
+    saveSolution(str(tmp_path / 'base'), net, sol)
+    return loadSolution(str(tmp_path / 'base.npz'))
+
+
+def test_same_topology_needs_no_newton_step(tmp_path):
+    net = gridNetwork(2000)
+    base = solveHeads(net)
+    stored = roundTrip(tmp_path, net, base)
+    Q0, H0, f0, matched = stored.warmStart(net)
+    assert matched == net.nPipes
+    assert np.array_equal(Q0, base.Q) and np.array_equal(H0, base.H) and np.array_equal(f0, base.f)
+    sol = solveHeads(net, Q0=Q0, H0=H0, f0=f0)
+    assert sol.converged and sol.iterations == 0
+    assert np.allclose(sol.Q, base.Q, atol=1e-9)
+
+
+def test_small_demand_change_takes_few_iterations(tmp_path):
+    net = gridNetwork(2000)
+    stored = roundTrip(tmp_path, net, solveHeads(net))
+    changed = copy.copy(net)
+    changed.extFlow = net.extFlow * 1.001
+    Q0, H0, f0, matched = stored.warmStart(changed)
+    sol = solveHeads(changed, Q0=Q0, H0=H0, f0=f0)
+    cold = solveHeads(changed)
+    assert sol.converged and sol.iterations <= 2 < cold.iterations
+    assert np.allclose(sol.Q, cold.Q, atol=1e-5)
+
+
+def test_added_and_parallel_pipes(tmp_path):
+    net = smallNetwork([('a', 'b', 0.2), ('a', 'b', 0.1), ('b', 'c', 0.15), ('a', 'c', 0.15)])
+    base = solveHeads(net)
+    stored = roundTrip(tmp_path, net, base)
+    assert base.Q[0] > 2.0 * base.Q[1] > 0.0  # The parallel pipes carry different flows
+
+    # The second a-b pipe is entered as b-a, and a second b-c pipe is added
+    changed = smallNetwork([('a', 'b', 0.2), ('b', 'a', 0.1), ('b', 'c', 0.15), ('a', 'c', 0.15), ('b', 'c', 0.1)])
+    Q0, H0, f0, matched = stored.warmStart(changed)
+    assert matched == 4
+    assert Q0[:4].tolist() == [base.Q[0], -base.Q[1], base.Q[2], base.Q[3]]
+    assert f0[:4].tolist() == base.f.tolist()
+    assert np.isnan(Q0[4]) and np.isnan(f0[4])
+    assert np.array_equal(H0, base.H)
+
+    sol = solveHeads(changed, Q0=Q0, H0=H0, f0=f0)
+    cold = solveHeads(changed)
+    assert sol.converged
+    assert np.allclose(sol.Q, cold.Q, atol=1e-6)
+    assert np.allclose(sol.H, cold.H, atol=1e-6)
+
+
+def test_unconverged_solution_is_not_saved(tmp_path):
+    net = gridNetwork(200)
+    with pytest.raises(ValueError):
+        saveSolution(str(tmp_path / 'base'), net, solveHeads(net, maxIter=1))